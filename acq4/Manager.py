@@ -24,11 +24,12 @@ from pyqtgraph.util.mutex import Mutex
 from . import __version__
 from . import devices, modules
 from .Interfaces import InterfaceDirectory
-from .devices.Device import Device, DeviceTask
+from .devices.Device import Device, DeviceTask, borrowReservations
 from .logging_config import get_logger, setup_logging, HistoricLogRecord
-from .util import DataManager, ptime, Qt
+from .util import DataManager, executor as _executor, ptime, Qt
 from .util.DataManager import DirHandle
 from .util.HelpfulException import HelpfulException
+from .util.future import Future
 from .util.LogWindow import get_log_window, get_error_dialog
 
 TEMP_LOG = "temp_log.json"
@@ -207,6 +208,15 @@ class Manager(Qt.QObject):
         else:
             return os.path.expanduser('~/.local/acq4')
 
+    def userCacheDir(self):
+        """Return the per-user directory for data that can be regenerated (it may not exist yet)."""
+        if sys.platform == 'win32':
+            return os.path.join(os.environ.get('LOCALAPPDATA', os.environ['APPDATA']), 'acq4', 'cache')
+        elif sys.platform == 'darwin':
+            return os.path.expanduser('~/Library/Caches/acq4')
+        else:
+            return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'acq4')
+
     def readConfig(self, configFile):
         """Read configuration file, create device objects, add devices to list"""
         logger.info(f"============= Starting Manager configuration from {configFile} =================")
@@ -836,6 +846,12 @@ class Manager(Qt.QObject):
 
                     dlg.setValue(lm + ld - len(devs))
 
+                logger.debug("Compacting index files..")
+                try:
+                    DataManager.flushIndexes()
+                except:
+                    logger.exception("Error while compacting index files.")
+
                 logger.debug("Closing windows..")
                 Qt.QApplication.instance().closeAllWindows()
                 Qt.QApplication.instance().processEvents()
@@ -912,6 +928,10 @@ class Task:
         self.stopped = False
         self.abortRequested = False
         self._done = False
+        self._configured = False
+        self._rearmed = False
+        self._wake = threading.Event()  # set to interrupt wait()
+        self.configureTimes = {}  # device name: seconds spent in configure() / rearm() during the last execute()
 
         # self.reserved = False
         try:
@@ -948,11 +968,12 @@ class Task:
         elif isinstance(obj, DeviceTask):
             return obj.dev.name()
 
-    def getConfigOrder(self):
-        ## determine the order in which tasks must be configured
-        ## This is determined by tasks having called Task.addConfigDependency()
-        ## when they were initialized.
+    def getConfigDependencies(self):
+        """Return (deps, cost) describing the configuration dependency graph.
 
+        *deps* maps each device name to the list of devices that must be configured before it, as declared by
+        DeviceTask.getConfigOrder(), and *cost* maps device names to DeviceTask.getPrepTimeEstimate().
+        """
         # request config order dependencies from devices
         deps = {devName: set() for devName in self.devNames}
         for devName, task in self.tasks.items():
@@ -967,10 +988,79 @@ class Task:
 
         # convert sets to lists
         deps = dict([(k, list(deps[k])) for k in deps.keys()])
+        return deps, cost
 
-        # return sorted order
-        order = self.toposort(deps, cost)
-        return order
+    def getConfigOrder(self):
+        ## determine the order in which tasks must be configured
+        ## This is determined by tasks having called Task.addConfigDependency()
+        ## when they were initialized.
+        deps, cost = self.getConfigDependencies()
+        return self.toposort(deps, cost)
+
+    def _configureDevices(self, rearm):
+        """Configure (or re-arm) all device tasks.
+
+        Tasks are started in getConfigOrder() order as soon as the devices they depend on are configured.
+        Tasks that allow it (see DeviceTask.canConfigureConcurrently) are configured on the 'io' executor
+        pool; the rest are configured in this thread. The time spent configuring each device is stored in
+        self.configureTimes.
+        """
+        deps, cost = self.getConfigDependencies()
+        pending = [devName for devName in self.toposort(deps, cost) if devName in self.tasks]
+        deps = {devName: set(deps[devName]) & set(pending) for devName in pending}
+        devices = [self.devs[devName] for devName in pending]  # reserved by this thread in reserveDevices()
+        finished = set()
+        running = set()
+        errors = []
+        cond = threading.Condition()
+        self.configureTimes = {}
+
+        def configure(devName):
+            task = self.tasks[devName]
+            start = time.perf_counter()
+            try:
+                with borrowReservations(devices):
+                    if rearm:
+                        task.rearm()
+                    else:
+                        task.configure()
+            except Exception as exc:
+                with cond:
+                    errors.append(exc)
+            finally:
+                with cond:
+                    self.configureTimes[devName] = time.perf_counter() - start
+                    running.discard(devName)
+                    finished.add(devName)
+                    cond.notify_all()
+
+        with cond:
+            while (pending or running) and not errors:
+                ready = [devName for devName in pending if deps[devName] <= finished]
+                inline = None
+                for devName in ready:
+                    if self.tasks[devName].canConfigureConcurrently():
+                        pending.remove(devName)
+                        running.add(devName)
+                        _executor.submit('io', configure, (devName,))
+                    elif inline is None:
+                        pending.remove(devName)
+                        inline = devName
+                if inline is not None:
+                    cond.release()
+                    try:
+                        configure(inline)
+                    finally:
+                        cond.acquire()
+                elif not ready:
+                    with _executor.blocking():
+                        cond.wait()
+            # let concurrent configuration finish before the caller cleans up
+            while running:
+                with _executor.blocking():
+                    cond.wait()
+        if errors:
+            raise errors[0]
 
     def getStartOrder(self):
         ## determine the order in which tasks must be started
@@ -998,12 +1088,14 @@ class Task:
 
         If block is true, then the function blocks until the task is complete.
         if processEvents is true, then Qt events are processed while waiting for the task to complete.
+        Otherwise, use wait() or asFuture() to find out when the task is complete.
         """
         with self.taskLock:
             self.startedDevs = []
             self.stopped = False  # whether sub-tasks have been stopped yet
             self.abortRequested = False
             self._done = False  # cached output of isDone()
+            self._wake.clear()
 
 
             ## We need to make sure devices are stopped and unlocked properly if anything goes wrong..
@@ -1015,15 +1107,16 @@ class Task:
 
                 prof.mark('reserve')
 
-                ## Determine order of device configuration.
-                configOrder = self.getConfigOrder()
-
-                ## Configure all subtasks. Some devices may need access to other tasks, so we make all available here.
+                ## Configure all subtasks in dependency order, concurrently where possible. Some devices may need
+                ## access to other tasks, so we make all available here.
                 ## This is how we allow multiple devices to communicate and decide how to operate together.
                 ## Each task may modify the startOrder list to suit its needs.
-                for devName in configOrder:
-                    self.tasks[devName].configure()
-                    prof.mark(f'configure {devName}')
+                ## A re-armed task skips configuration; its subtasks only refresh their state.
+                rearm = self._rearmed
+                self._rearmed = False
+                self._configureDevices(rearm)
+                prof.mark('rearm' if rearm else 'configure')
+                self._configured = True
 
                 startOrder = self.getStartOrder()
 
@@ -1051,32 +1144,95 @@ class Task:
                     return
 
                 ## Wait until all tasks are done
-                lastProcess = ptime.time()
                 isGuiThread = Qt.QThread.currentThread() == Qt.QCoreApplication.instance().thread()
-                while not self.isDone():
-                    now = ptime.time()
-                    elapsed = now - self.startTime
-                    if isGuiThread:
-                        if processEvents and now - lastProcess > 20e-3:  ## only process Qt events every 20ms
-                            Qt.QApplication.processEvents()
-                            lastProcess = ptime.time()
-
-                    ## If the task duration has not elapsed yet, only wake up every 10ms, and attempt to wake up 5ms before the end
-                    if elapsed < self.cfg['duration'] - 10e-3:
-                        sleep = min(10e-3, self.cfg['duration'] - elapsed - 5e-3)
-                    else:
-                        sleep = 1.0e-3  ## afterward, wake up more quickly so we can respond as soon as the task finishes
-                    time.sleep(sleep)
+                while not self.wait(processEvents=processEvents and isGuiThread):
+                    pass
 
                 self.stop()
             except:
                 logger.exception("==========  Error in task execution:  ==============")
+                self._configured = False  # do not re-arm a task whose devices may be half-configured
                 self.abort()
                 self.releaseDevices()
                 raise
             finally:
                 prof.finish()
 
+    def wait(self, timeout=None, processEvents=False):
+        """Block until the task is done (see isDone()), *timeout* seconds elapse, or interruptWait() is called.
+
+        Returns True if the task is done. Until the requested duration has elapsed, this sleeps without
+        polling; after that it blocks in each device task's waitUntilDone(), so it returns as soon as the
+        last device finishes. If *processEvents* is True, Qt events are processed every 20 ms.
+        """
+        deadline = None if timeout is None else ptime.time() + timeout
+        # longest time to block before checking for timeouts, aborts and Qt events
+        maxBlock = 20e-3 if processEvents else 0.1
+        while not self.isDone():
+            if self._wake.is_set():
+                self._wake.clear()
+                return self.isDone()
+            now = ptime.time()
+            block = maxBlock if deadline is None else min(maxBlock, deadline - now)
+            if block <= 0:
+                return False
+            if processEvents:
+                Qt.QApplication.processEvents()
+
+            startTime = self.startTime
+            if startTime is None or now < startTime + self.cfg['duration']:
+                wakeAt = now + block if startTime is None else startTime + self.cfg['duration']
+                self._wake.wait(min(block, wakeAt - now))
+                continue
+
+            # requested duration has elapsed; wait for the devices to finish
+            taskTimeout = self.cfg.get('timeout', self.cfg['duration'] + 10.0)
+            if taskTimeout is not None:
+                block = max(0.0, min(block, startTime + taskTimeout - now))
+            for devTask in list(self.tasks.values()):
+                if not devTask.waitUntilDone(block):
+                    break
+        return True
+
+    def interruptWait(self):
+        """Make wait() return early (from any thread)."""
+        self._wake.set()
+
+    def asFuture(self) -> Future:
+        """Return a Future for this task, which must already have been started with execute(block=False).
+
+        The Future finishes with the task result as soon as the task is done; stopping the Future aborts the
+        task. This allows tasks to be chained with other Futures (for example with Future.onFinish()) without
+        polling.
+        """
+        return TaskCompletionFuture(self)
+
+    def canRearm(self):
+        """Return True if this task has been executed and all of its device tasks support re-arming
+        (see rearm())."""
+        with self.taskLock:
+            return self._configured and all(task.canRearm() for task in self.tasks.values())
+
+    def rearm(self):
+        """Prepare this task to be executed again with the same command.
+
+        The next call to execute() skips device configuration (channel creation, waveform preparation, etc.)
+        and only reserves devices, starts them, and collects new results. Returns False, leaving the task
+        unchanged, if any device cannot be re-armed; in that case a new task must be created instead.
+        """
+        with self.taskLock:
+            if not self.canRearm():
+                return False
+            if not self.stopped:
+                self.stop(abort=True)
+            self.result = None
+            self.startTime = None
+            self.stopTime = None
+            self.stopped = False
+            self._done = False
+            self._rearmed = True
+            return True
+
     def isDone(self):
         """Return True if all tasks are completed and ready to return results.
 
@@ -1145,6 +1301,7 @@ class Task:
 
             prof = Profiler("Manager.Task.stop", disabled=True)
             self.abortRequested = abort
+            self._wake.set()
             try:
                 if not self.stopped:
                     ## Stop all device tasks
@@ -1312,6 +1469,38 @@ class Task:
 DOC_ROOT = 'http://acq4.org/documentation/'
 
 
+class TaskCompletionFuture(Future):
+    """Future that finishes when a running Task is done; see Task.asFuture()."""
+
+    def __init__(self, task: Task):
+        super().__init__(name=f"Task {task.id}")
+        self.task = task
+        self.executeInThread(self._waitForResult, (), {})
+
+    def percentDone(self):
+        runTime = self.task.runTime()
+        if self.isDone():
+            return 100
+        if runTime is None or not self.task.cfg['duration']:
+            return 0
+        return min(99, 100 * runTime / self.task.cfg['duration'])
+
+    def stop(self, reason="task stop requested", wait=False):
+        super().stop(reason=reason, wait=False)
+        self.task.interruptWait()
+        if wait:
+            with contextlib.suppress(self.Stopped):
+                self.wait()
+
+    def _waitForResult(self, _future):
+        with _executor.blocking():
+            while not self.task.wait():
+                if self._stopRequested:
+                    self.task.abort()
+                    raise self.StopRequested()
+        return self.task.getResult()
+
+
 class Documentation(Qt.QObject):
     def __init__(self):
         Qt.QObject.__init__(self)
@@ -529,6 +529,30 @@ class EventFilter:
         return events
         
 
+class GroupIndex:
+    """Groups the rows of a table by the value of one of its columns (usually ProtocolDir).
+
+    The rows are sorted by group once, and the boundaries between groups are recorded, so that the rows of any
+    group can be selected with a slice of the sorted table rather than by comparing every row against the key::
+
+        index = GroupIndex(events['ProtocolDir'])
+        sortedEvents = events[index.order]
+        siteEvents = sortedEvents[index.slice(dh)]
+
+    Rows keep their original order within each group. Keys are matched by hash, as in a dict.
+    """
+    def __init__(self, keys):
+        groups = {}
+        groupIds = np.fromiter((groups.setdefault(k, len(groups)) for k in keys), dtype=int, count=len(keys))
+        self.order = np.argsort(groupIds, kind='stable')
+        bounds = np.searchsorted(groupIds[self.order], np.arange(len(groups) + 1))
+        self._slices = {k: slice(bounds[i], bounds[i + 1]) for k, i in groups.items()}
+
+    def slice(self, key):
+        """Return the slice of the sorted table that holds the rows for *key* (empty if there are none)."""
+        return self._slices.get(key, slice(0, 0))
+
+
 class SpontRateAnalyzer:
     def __init__(self, plot=None):
         self.plot = plot
@@ -574,12 +598,14 @@ class SpontRateAnalyzer:
         events = events[events['fitTime'] < stimTime]
         
         ## measure spont. rate for each handle
+        index = GroupIndex(events['ProtocolDir'])
+        amplitudes = events['fitAmplitude'][index.order]
         spontRate = []
         amps = []
         for site in sites:
-            ev = events[events['ProtocolDir'] == site['ProtocolDir']]
+            ev = amplitudes[index.slice(site['ProtocolDir'])]
             spontRate.append(len(ev) / stimTime)
-            amps.extend(ev['fitAmplitude'])
+            amps.extend(ev)
         spontRate = np.array(spontRate)
         
         self.spontRatePlot.setData(x=sites['start'], y=spontRate)
@@ -681,7 +707,15 @@ class EventStatisticsAnalyzer:
         preScores = {'PoissonScore': [], 'PoissonAmpScore': [], 'SpontZScore':[]}
         postScores = {'PoissonScore': [], 'PoissonAmpScore': [], 'ZScore': [], 'FitAmpSum': []}
         
+        ## convert events to the (time, amp) records used for scoring in a single pass, grouped
+        ## by ProtocolDir so that the events for each site are a slice of these tables
+        postIndex = GroupIndex(postEvents['ProtocolDir'])
+        postTable = self.scoringTable(postEvents[postIndex.order], stimTime)
+        preIndex = GroupIndex(preEvents['ProtocolDir'])
+        preTable = self.scoringTable(preEvents[preIndex.order], 0)
         
+        ## collect events for all sites first so that they can be scored in a single batch
+        siteData = []
         for site in map.spots:
             postSiteEvents = []
             preSiteEvents = []
@@ -691,37 +725,40 @@ class EventStatisticsAnalyzer:
             
             ## generate lists of post-stimulus events for each site
             for scan,dh in site['data']['sites']:
-                ## collect post-stim events
-                ev = postEvents[postEvents['ProtocolDir'] == dh]
-                ev2 = np.empty(len(ev), dtype=[('time', float), ('amp', float)])
-                ev2['time'] = ev['fitTime'] - stimTime
-                ev2['amp'] = ev['fitAmplitude']
-                postSiteEvents.append(ev2)
-                latencies.append(ev2['time'].min() if len(ev2) > 0 else -1)
-                nEvents.append(len(ev2))
+                ev = postTable[postIndex.slice(dh)]
+                postSiteEvents.append(ev)
+                latencies.append(ev['time'].min() if len(ev) > 0 else -1)
+                nEvents.append(len(ev))
                 
-                ## collect pre-stim events
-                ev = preEvents[preEvents['ProtocolDir'] == dh]
-                ev2 = np.empty(len(ev), dtype=[('time', float), ('amp', float)])
-                ev2['time'] = ev['fitTime']
-                ev2['amp'] = ev['fitAmplitude']
-                preSiteEvents.append(ev2)
+                preSiteEvents.append(preTable[preIndex.slice(dh)])
                 
                 rates.append(spontRate[dh]['filteredSpontRate'])
-        
+            siteData.append((postSiteEvents, preSiteEvents, rates, latencies, nEvents))
+        
+        allPost = [d[0] for d in siteData]
+        allPre = [d[1] for d in siteData]
+        allRates = [d[2] for d in siteData]
+        poisson = poissonScore.PoissonScore.score_many(allPost, allRates, tMax=postDt)
+        poissonAmp = poissonScore.PoissonAmpScore.score_many(allPost, allRates, tMax=postDt, ampMean=ampMean, ampStdev=ampStdev)
+        poissonPre = poissonScore.PoissonScore.score_many(allPre, allRates, tMax=postDt)
+        poissonAmpPre = poissonScore.PoissonAmpScore.score_many(allPre, allRates, tMax=postDt, ampMean=ampMean, ampStdev=ampStdev)
+        
+        for i, site in enumerate(map.spots):
+            postSiteEvents, preSiteEvents, rates, latencies, nEvents = siteData[i]
+            
             ## compute score for each site
             ## note that keys added to site here are ultimately passed to host.getColor via Map.recolor
             site['data']['spontaneousRates'] = rates
             site['data']['events'] = events
             site['data']['ampMean'] = ampMean
             site['data']['ampStdev'] = ampStdev
-            site['data']['PoissonScore'] = poissonScore.PoissonScore.score(postSiteEvents, rates, tMax=postDt)
-            site['data']['PoissonAmpScore'] = poissonScore.PoissonAmpScore.score(postSiteEvents, rates, tMax=postDt, ampMean=ampMean, ampStdev=ampStdev)
+            site['data']['PoissonScore'] = poisson[i]
+            site['data']['PoissonAmpScore'] = poissonAmp[i]
             postScores['PoissonScore'].append(site['data']['PoissonScore'])
             postScores['PoissonAmpScore'].append(site['data']['PoissonAmpScore'])
             
-            site['data']['PoissonScore_Pre'] = poissonScore.PoissonScore.score(preSiteEvents, rates, tMax=postDt)
-            site['data']['PoissonAmpScore_Pre'] = poissonScore.PoissonAmpScore.score(preSiteEvents, rates, tMax=postDt, ampMean=ampMean, ampStdev=ampStdev)
+            site['data']['PoissonScore_Pre'] = poissonPre[i]
+            site['data']['PoissonAmpScore_Pre'] = poissonAmpPre[i]
             preScores['PoissonScore'].append(site['data']['PoissonScore_Pre'])
             preScores['PoissonAmpScore'].append(site['data']['PoissonAmpScore_Pre'])
             
@@ -777,6 +814,14 @@ class EventStatisticsAnalyzer:
         #self.threshLine = pg.InfiniteLine(angle=90)
         #self.histogram.addItem(self.threshLine)
         #self.threshLine.setPos(self.params['Threshold'])
+
+    @staticmethod
+    def scoringTable(events, stimTime):
+        """Return *events* as the (time, amp) records expected by poissonScore, with times relative to *stimTime*."""
+        table = np.empty(len(events), dtype=[('time', float), ('amp', float)])
+        table['time'] = events['fitTime'] - stimTime
+        table['amp'] = events['fitAmplitude']
+        return table
     
 class RegionMarker(Qt.QObject):
     """Allows user to specify multiple anatomical regions for classifying cells.
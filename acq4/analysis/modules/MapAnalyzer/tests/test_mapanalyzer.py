@@ -0,0 +1,68 @@
+import numpy as np
+import pyqtgraph as pg
+
+from acq4.analysis.modules.MapAnalyzer.MapAnalyzer import EventStatisticsAnalyzer, GroupIndex
+from acq4.analysis.tools.poissonScore import PoissonScore
+
+pg.mkQApp()
+
+
+class FakeScan:
+    def getStats(self, dh):
+        return {}
+
+
+class FakeMap:
+    def __init__(self, spots):
+        self.spots = spots
+
+
+def makeEvents(nDirs=30, nEvents=2000, seed=0):
+    rng = np.random.RandomState(seed)
+    dirs = [f"protocol_{i:03d}" for i in range(nDirs)]
+    events = np.empty(nEvents, dtype=[('ProtocolDir', object), ('fitTime', float), ('fitAmplitude', float)])
+    events['ProtocolDir'] = [dirs[i] for i in rng.randint(0, nDirs - 5, nEvents)]  # some dirs have no events
+    events['fitTime'] = rng.uniform(0, 1, nEvents)
+    events['fitAmplitude'] = rng.normal(size=nEvents)
+    return dirs, events
+
+
+def test_group_index():
+    dirs, events = makeEvents()
+    index = GroupIndex(events['ProtocolDir'])
+    sortedEvents = events[index.order]
+    for dh in dirs + ['missing']:
+        assert np.array_equal(sortedEvents[index.slice(dh)], events[events['ProtocolDir'] == dh])
+
+    index = GroupIndex(events['ProtocolDir'][:0])
+    assert len(events[:0][index.order][index.slice(dirs[0])]) == 0
+
+
+def test_event_statistics():
+    dirs, events = makeEvents()
+    spontRates = np.empty(len(dirs), dtype=[('ProtocolDir', object), ('filteredSpontRate', float)])
+    spontRates['ProtocolDir'] = dirs
+    spontRates['filteredSpontRate'] = np.linspace(1, 10, len(dirs))
+    scan = FakeScan()
+    spots = [{'data': {'sites': [(scan, dh) for dh in dirs[i:i + 3]]}} for i in range(0, len(dirs), 3)]
+
+    analyzer = EventStatisticsAnalyzer(pg.PlotItem())
+    analyzer.params['Threshold Parameter'] = 'PoissonScore'
+    analyzer.process(FakeMap(spots), spontRates, events, ampMean=0.0, ampStdev=1.0)
+
+    ## compare against selecting each site's events with a mask
+    params = analyzer.params
+    post = events[(events['fitTime'] > params['Post Start']) & (events['fitTime'] < params['Post Stop'])]
+    for i, spot in enumerate(spots):
+        siteEvents = []
+        for scan, dh in spot['data']['sites']:
+            ev = post[post['ProtocolDir'] == dh]
+            ev2 = np.empty(len(ev), dtype=[('time', float), ('amp', float)])
+            ev2['time'] = ev['fitTime'] - params['Stimulus Time']
+            ev2['amp'] = ev['fitAmplitude']
+            siteEvents.append(ev2)
+        rates = list(spontRates['filteredSpontRate'][i * 3:i * 3 + 3])
+        tMax = params['Post Stop'] - params['Post Start']
+        assert spot['data']['PoissonScore'] == PoissonScore.score(siteEvents, rates, tMax=tMax)
+        assert spot['data']['NumEvents'] == np.median([len(ev) for ev in siteEvents])
+        assert spot['data']['SpontRate'] == np.median(rates)
@@ -124,6 +124,16 @@ def poissonProb(n, t, l, clip=False):
     For a poisson process, return the probability of seeing at least *n* events in *t* seconds given
     that the process has a mean rate *l*.
     """
+    if not np.isscalar(l):
+        ## per-event rates; handle zero rates the same way as the scalar case below
+        l = np.asarray(l, dtype=float)
+        with np.errstate(invalid='ignore'):
+            p = stats.poisson(l*t).sf(n)
+        p = np.where(l == 0, np.where(n==0, 1.0, 1e-25), p)
+        if clip:
+            p = np.clip(p, 0, 1.0-1e-25)
+        return p
+
     if l == 0:
         if np.isscalar(n):
             if n == 0:
@@ -153,6 +163,24 @@ def gaussProb(amps, mean, stdev):
     if len(amps) == 0:
         return 1.0
     return stats.norm(mean, stdev).sf(amps)
+
+def _countEvents(keys, times, queryKeys, queryTimes, inclusive=False):
+    """
+    For each query, return the number of events with the same key whose time is earlier than (or, if
+    *inclusive*, equal to) the query time. *keys* must be non-negative integers.
+    
+    This is a vectorized replacement for ``[(times[keys==k] < t).sum() for k,t in zip(queryKeys, queryTimes)]``
+    that runs in O(n log n): times are replaced by their integer rank so that (key, time) pairs can be
+    combined into a single sortable integer and looked up with searchsorted.
+    """
+    allTimes = np.concatenate([times, queryTimes])
+    uniq, rank = np.unique(allTimes, return_inverse=True)
+    nRanks = len(uniq) + 1
+    combined = np.sort(np.asarray(keys, dtype=np.int64) * nRanks + rank[:len(times)])
+    queryKeys = np.asarray(queryKeys, dtype=np.int64) * nRanks
+    end = np.searchsorted(combined, queryKeys + rank[len(times):], side='right' if inclusive else 'left')
+    start = np.searchsorted(combined, queryKeys, side='left')
+    return end - start
     
     
 class PoissonScore:
@@ -181,21 +209,35 @@ class PoissonScore:
         ev must be a list of record arrays. Each array describes a set of events; only required field is 'time'
         *rate* may be either a single value or a list (in which case the mean will be used)
         """
-        nSets = len(ev)
-        events = np.concatenate(ev)
+        return cls.score_many([ev], [rate], tMax=tMax, normalize=normalize, **kwds)[0]
 
-        if not np.isscalar(rate):   ### Is this valid???  I think so..
-            rate = np.mean(rate)
+    @classmethod
+    def score_many(cls, eventSets, rates, tMax=None, normalize=True, **kwds):
+        """
+        Compute poisson scores for many sites at once.
+        *eventSets* is a list with one item per site; each item is a list of event record arrays as accepted by score().
+        *rates* is a list with one rate (or list of rates) per site, or a single value to use for all sites.
         
-        if len(events) == 0:
-            score = 1.0
-        else:
-            #ev = [x['time'] for x in ev]  ## select times from event set
-            #ev = np.concatenate(ev)   ## mix events together
+        Returns an array of scores, one per site. This gives the same result as calling score() for each site,
+        but all events are processed in a single vectorized pass.
+        """
+        nSites = len(eventSets)
+        if np.isscalar(rates):
+            rates = [rates] * nSites
+        nSets = np.array([len(ev) for ev in eventSets])
+        rates = np.array([r if np.isscalar(r) else np.mean(r) for r in rates], dtype=float)   ### Is this valid???  I think so..
+        
+        arrays = [arr for ev in eventSets for arr in ev]
+        counts = np.array([sum(len(arr) for arr in ev) for ev in eventSets], dtype=int)
+        score = np.ones(nSites)
+        if counts.sum() > 0:
+            events = np.concatenate(arrays)  ## mix events together; sites remain contiguous
+            site = np.repeat(np.arange(nSites), counts)
             ev = events['time']
             
-            nVals = np.array([(ev<=t).sum()-1 for t in ev]) ## looks like arange, but consider what happens if two events occur at the same time.
-            pi = poissonProb(nVals, ev, rate*nSets)  ## note that by using n=0 to len(ev)-1, we correct for the fact that the time window always ends at the last event
+            ## number of earlier events in the same site. This looks like arange, but consider what happens if two events occur at the same time.
+            nVals = _countEvents(site, ev, site, ev, inclusive=True) - 1
+            pi = poissonProb(nVals, ev, (rates*nSets)[site])  ## note that by using n=0 to len(ev)-1, we correct for the fact that the time window always ends at the last event
             pi = 1.0 / pi
             
             ## apply extra score for uncommonly large amplitudes
@@ -203,23 +245,15 @@ class PoissonScore:
             ampScore = cls.amplitudeScore(events, **kwds)
             pi *= ampScore
             
-            mp = pi.max()
-            #mpp = min(cls.maxPoissonProb(ev, rate*nSets), 1.0-1e-12)  ## don't allow returning inf
-            #mpp = min(mp, 1.0-1e-12)
+            hasEvents = counts > 0
+            starts = np.cumsum(counts) - counts
+            score[hasEvents] = np.maximum.reduceat(pi, starts[hasEvents])
             
-            score = mp
-            #score =  1.0 / (1.0 - mpp)
-            
-            
-        #n = len(ev)
         if normalize:
-            ret = cls.mapScore(score, rate*tMax*nSets)
+            ret = np.array([cls.mapScore(score[i], rates[i]*tMax*nSets[i]) for i in range(nSites)])
         else:
             ret = score
-        if np.isscalar(ret):
-            assert not np.isnan(ret)
-        else:
-            assert not any(np.isnan(ret))
+        assert not any(np.isnan(ret))
         
         return ret
 
@@ -434,7 +468,7 @@ class PoissonScore:
     
     @classmethod
     def poissonScoreBlame(cls, ev, rate):
-        nVals = np.array([(ev<=t).sum()-1 for t in ev]) 
+        nVals = np.searchsorted(np.sort(ev), ev, side='right') - 1
         pp1 = 1.0 /   (1.0 - poissonProb(nVals, ev, rate, clip=True))
         pp2 = 1.0 /   (1.0 - poissonProb(nVals-1, ev, rate, clip=True))
         diff = pp1 / pp2
@@ -551,50 +585,69 @@ class PoissonRepeatScore:
         *rate* must have the same length as *ev*.
         Extra keyword arguments are passed to amplitudeScore
         """
-        events = ev
-        nSets = len(ev)
-        ev = [x['time'] for x in ev]  ## select times from event set
+        return cls.score_many([ev], [rate], tMax=tMax, normalize=normalize, **kwds)[0]
+
+    @classmethod
+    def score_many(cls, eventSets, rates, tMax=None, normalize=True, **kwds):
+        """
+        Compute scores for many sites at once.
+        *eventSets* is a list with one item per site; each item is a list of event record arrays (one per trial)
+        as accepted by score(). *rates* is a list with one item per site (a single value or one value per trial),
+        or a single value to use for all trials of all sites.
         
-        if np.isscalar(rate):
-            rate = [rate] * nSets
+        Returns an array of scores, one per site. This gives the same result as calling score() for each site,
+        but the event counting for all sites is vectorized.
+        """
+        nSites = len(eventSets)
+        if np.isscalar(rates):
+            rates = [rates] * nSites
+        nSets = np.array([len(ev) for ev in eventSets], dtype=int)
+        rates = [[r] * n if np.isscalar(r) else list(r) for r, n in zip(rates, nSets)]
         
-        ev2 = []
-        for i in range(len(ev)):
-            arr = np.zeros(len(ev[i]), dtype=[('trial', int), ('time', float)])
-            arr['time'] = ev[i]
-            arr['trial'] = i
-            ev2.append(arr)
-        ev2 = np.sort(np.concatenate(ev2), order=['time', 'trial'])
-        if len(ev2) == 0:
-            return 1.0
+        ## flatten all trials of all sites; trials are numbered globally
+        trialRate = np.array([r for siteRates in rates for r in siteRates], dtype=float)
+        firstTrial = np.cumsum(nSets) - nSets
+        trialCounts = np.array([len(arr) for ev in eventSets for arr in ev], dtype=int)
+        counts = np.array([sum(len(arr) for arr in ev) for ev in eventSets], dtype=int)
         
-        ev = list(map(np.sort, ev))
-        pp = np.empty((len(ev), len(ev2)))
-        for i, trial in enumerate(ev):
-            nVals = []
-            for j in range(len(ev2)):
-                n = (trial<ev2[j]['time']).sum()
-                if any(trial == ev2[j]['time']) and ev2[j]['trial'] > i:  ## need to correct for the case where two events in separate trials happen to have exactly the same time.
-                    n += 1
-                nVals.append(n)
+        score = np.ones(nSites)
+        hasEvents = counts > 0
+        if hasEvents.any():
+            times = np.concatenate([arr['time'] for ev in eventSets for arr in ev])
+            trial = np.repeat(np.arange(len(trialCounts)), trialCounts)
+            site = np.repeat(np.arange(nSites), counts)
+            localTrial = trial - firstTrial[site]
+            starts = np.cumsum(counts) - counts
             
-            pp[i] = 1.0 / (1.0 - poissonProb(np.array(nVals), ev2['time'], rate[i]))
-           
-            ## apply extra score for uncommonly large amplitudes
-            ## (note: by default this has no effect; see amplitudeScore)
-            pp[i] *= cls.amplitudeScore(events[i], ev2['time'], **kwds)
+            pp = np.ones(len(times))
+            for i in range(nSets.max()):
+                ## compare every event in each site against trial i of the same site
+                mask = nSets[site] > i
+                qTrial = firstTrial[site[mask]] + i
+                qTimes = times[mask]
+                n = _countEvents(trial, times, qTrial, qTimes)
+                ## need to correct for the case where two events in separate trials happen to have exactly the same time.
+                same = _countEvents(trial, times, qTrial, qTimes, inclusive=True) > n
+                n += same & (localTrial[mask] > i)
                 
+                p = np.ones(len(times))
+                p[mask] = 1.0 / (1.0 - poissonProb(n, qTimes, trialRate[qTrial]))
                 
+                ## apply extra score for uncommonly large amplitudes
+                ## (note: by default this has no effect; see amplitudeScore)
+                for j in np.argwhere(hasEvents & (nSets > i))[:, 0]:
+                    sl = slice(starts[j], starts[j] + counts[j])
+                    p[sl] *= cls.amplitudeScore(eventSets[j][i], times[sl], **kwds)
                 
-        score = pp.prod(axis=0).max() ##** (1.0 / len(ev))  ## normalize by number of trials [disabled--we WANT to see the significance that comes from multiple trials.]
+                pp *= p
+            
+            score[hasEvents] = np.maximum.reduceat(pp, starts[hasEvents])  ##** (1.0 / len(ev))  ## normalize by number of trials [disabled--we WANT to see the significance that comes from multiple trials.]
+        
+        ret = score.copy()
         if normalize:
-            ret = cls.mapScore(score, np.mean(rate)*tMax, nSets)
-        else:
-            ret = score
-        if np.isscalar(ret):
-            assert not np.isnan(ret)
-        else:
-            assert not any(np.isnan(ret))
+            for i in np.argwhere(hasEvents)[:, 0]:  ## sites with no events always score 1.0
+                ret[i] = cls.mapScore(score[i], np.mean(rates[i])*tMax, nSets[i])
+        assert not any(np.isnan(ret))
             
         return ret
         
@@ -0,0 +1,65 @@
+import numpy as np
+
+from acq4.analysis.tools.poissonScore import PoissonScore, PoissonAmpScore, PoissonRepeatScore, poissonProb
+
+
+def makeSites(nSites=40, reps=3, seed=0):
+    np.random.seed(seed)
+    sites = [PoissonScore.generateRandom(rate, 0.5, reps) for rate in np.random.uniform(1, 40, nSites)]
+    # events that occur at exactly the same time, within and across trials
+    for ev in sites[0]:
+        ev['time'] = np.round(ev['time'], 1) + 0.05
+    sites.append(PoissonScore.generateRandom(1.0, 0.0, reps))  # no events
+    rates = [list(np.random.uniform(1, 10, reps)) for s in sites]
+    return sites, rates
+
+
+def referenceScore(ev, rate):
+    """Per-event loop formerly used by PoissonScore.score"""
+    events = np.concatenate(ev)
+    if len(events) == 0:
+        return 1.0
+    t = events['time']
+    nVals = np.array([(t <= x).sum() - 1 for x in t])
+    return (1.0 / poissonProb(nVals, t, np.mean(rate) * len(ev))).max()
+
+
+def referenceRepeatScore(ev, rate):
+    """Per-event loop formerly used by PoissonRepeatScore.score"""
+    ev2 = np.sort(np.concatenate([
+        np.array([(i, t) for t in x['time']], dtype=[('trial', int), ('time', float)]) for i, x in enumerate(ev)
+    ]), order=['time', 'trial'])
+    if len(ev2) == 0:
+        return 1.0
+    pp = np.empty((len(ev), len(ev2)))
+    for i, trial in enumerate(ev):
+        trial = trial['time']
+        nVals = [(trial < e['time']).sum() + int(any(trial == e['time']) and e['trial'] > i) for e in ev2]
+        pp[i] = 1.0 / (1.0 - poissonProb(np.array(nVals), ev2['time'], rate[i]))
+    return pp.prod(axis=0).max()
+
+
+def test_score_many_matches_reference():
+    sites, rates = makeSites()
+    scores = PoissonScore.score_many(sites, rates, normalize=False)
+    assert np.allclose(scores, [referenceScore(ev, r) for ev, r in zip(sites, rates)], rtol=1e-12)
+    assert scores[-1] == 1.0
+
+    scores = PoissonRepeatScore.score_many(sites, rates, normalize=False)
+    assert np.allclose(scores, [referenceRepeatScore(ev, r) for ev, r in zip(sites, rates)], rtol=1e-12)
+    assert scores[-1] == 1.0
+
+
+def test_score_many_matches_score():
+    sites, rates = makeSites(nSites=10)
+    for cls, kwds in [(PoissonScore, {}), (PoissonAmpScore, {'ampMean': 0.5, 'ampStdev': 1.0}), (PoissonRepeatScore, {})]:
+        batch = cls.score_many(sites, rates, tMax=0.5, **kwds)
+        single = [cls.score(ev, r, tMax=0.5, **kwds) for ev, r in zip(sites, rates)]
+        assert np.array_equal(batch, single)
+
+
+def test_amplitude_score():
+    ev = np.array([(0.1, 0.0), (0.2, 5.0)], dtype=[('time', float), ('amp', float)])
+    plain = PoissonScore.score([ev], 2.0, normalize=False)
+    assert PoissonAmpScore.score([ev], 2.0, normalize=False, ampMean=0.0, ampStdev=0.0) == plain
+    assert PoissonAmpScore.score([ev], 2.0, normalize=False, ampMean=0.0, ampStdev=1.0) > plain
@@ -134,6 +134,8 @@ class AxoPatch200(DAQGeneric):
     sigHideModeDialog = Qt.Signal()
     #sigHoldingChanged = Qt.Signal(object)  ## provided by DAQGeneric
     sigModeChanged = Qt.Signal(object)
+    # AxoPatch200Task reconfigures the secondary channel for the clamp mode when it is created
+    allowEarlyTaskCreation = False
 
     def __init__(self, dm, config, name):
         
@@ -471,6 +473,8 @@ class AxoPatch200(DAQGeneric):
                 self.reconfigureChannel('secondary', self.config['SecondaryICSignal'])
         
 class AxoPatch200Task(DAQGenericTask):
+    allowRearm = False  # configure() does more than DAQGenericTask.rearm() would repeat
+
     def __init__(self, dev, cmd, parentTask):
         ## make a few changes for compatibility with multiclamp        
         if 'daqProtocol' not in cmd:
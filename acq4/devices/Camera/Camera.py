@@ -26,6 +26,8 @@ from pyqtgraph import Vector, SRTTransform3D
 from pyqtgraph.debug import Profiler
 from .CameraInterface import CameraInterface
 from .deviceGUI import CameraDeviceGui
+from .frame_pool import FramePool, FrameQueue
+from .frame_processing import FrameProcessorGraph
 from .taskGUI import CameraTaskGui
 from ...logging_config import get_logger
 
@@ -57,6 +59,10 @@ class Camera(DAQGeneric, OptomechDevice):
         params:
             GAIN_INDEX: 2
             CLEAR_MODE: 'CLEAR_PRE_SEQUENCE'  # Overlap mode for QuantEM
+        framePoolSize: 16  # number of preallocated frame buffers offered to the driver (see getFrameBuffer)
+        frameQueueSize: 100  # maximum number of frames waiting for processing
+        frameQueuePolicy: 'block'  # or 'drop-oldest'; what to do when the processing queue is full
+        frameProcessingThreads: 4  # number of worker threads that run frame processors
     """
 
     sigCameraStopped = Qt.Signal()
@@ -118,7 +124,12 @@ class Camera(DAQGeneric, OptomechDevice):
         self.acqThread.started.connect(self.acqThreadStarted, type=Qt.Qt.DirectConnection)
         self.acqThread.sigShowMessage.connect(self.showMessage, type=Qt.Qt.DirectConnection)
 
-        self._processingThread = FrameProcessingThread()
+        self._framePool = FramePool(config.get("framePoolSize", 16))
+        self._processingThread = FrameProcessingThread(
+            maxQueueSize=config.get("frameQueueSize", 100),
+            queuePolicy=config.get("frameQueuePolicy", "block"),
+            maxWorkers=config.get("frameProcessingThreads", 4),
+        )
         self._processingThread.sigFrameFullyProcessed.connect(
             self.sigNewFrame, type=Qt.Qt.DirectConnection
         )
@@ -255,12 +266,33 @@ class Camera(DAQGeneric, OptomechDevice):
         """Returns a list of all new frames that have arrived since the last call. The list looks like:
             [{'id': 0, 'data': array, 'time': 1234678.3213}, ...]
         id is a unique integer representing the frame number since the start of the program.
-        data should be a permanent copy of the image (ie, not directly from a circular buffer)
+        data should be a permanent copy of the image (ie, not directly from a circular buffer). Drivers
+            can avoid allocating a new array for every frame by copying into getFrameBuffer() instead.
         time is the time of arrival of the frame. Optionally, 'exposeStartTime' and 'exposeDoneTime'
             may be specified if they are available.
         """
         raise NotImplementedError("Function must be reimplemented in subclass.")
 
+    def getFrameBuffer(self, shape, dtype) -> np.ndarray:
+        """Return an array from this camera's preallocated frame pool that newFrames() may fill in place and
+        return as frame data. The buffer is not reused until all references to the frame have been released.
+        """
+        return self._framePool.getBuffer(shape, dtype)
+
+    def frameStats(self) -> dict:
+        """Return counters describing the flow of frames through this camera:
+
+        * queued: frames waiting to be processed
+        * received: frames delivered for processing since the camera was created
+        * dropped: frames discarded because processing fell behind
+        * poolInUse: preallocated frame buffers currently held by frames
+        * poolExhausted: times a frame buffer had to be allocated because the pool was empty
+        """
+        stats = self._processingThread.queueStats()
+        stats["poolInUse"] = self._framePool.inUse()
+        stats["poolExhausted"] = self._framePool.exhausted
+        return stats
+
     def startCamera(self):
         """Calls the camera driver to start the camera's acquisition. Call start instead of this to actually record frames."""
         raise NotImplementedError("Function must be reimplemented in subclass.")
@@ -585,8 +617,25 @@ class Camera(DAQGeneric, OptomechDevice):
     def showMessage(self, msg):
         self.sigShowMessage.emit(msg)
 
-    def addFrameProcessor(self, processor: Callable[[Frame], None], final: bool = False):
-        self._processingThread.addFrameProcessor(processor, final)
+    def addFrameProcessor(
+        self,
+        processor: Callable[[Frame], None],
+        final: bool = False,
+        dependencies: Optional[list] = None,
+        mayDropFrames: bool = False,
+    ):
+        """Register a callable to be invoked with each new Frame before it is emitted via sigNewFrame.
+
+        Processors run concurrently on a worker pool. By default a processor runs after all lossless processors
+        added before it; pass *dependencies* (a list of previously added processors) to let it run as soon as
+        those are done. Processors that set *mayDropFrames* skip to the newest frame whenever they fall behind,
+        and sigNewFrame does not wait for them. Every processor runs after addFrameInfo.
+        """
+        if dependencies is not None and self.addFrameInfo not in dependencies:
+            dependencies = [self.addFrameInfo] + list(dependencies)
+        self._processingThread.addFrameProcessor(
+            processor, final=final, dependencies=dependencies, mayDropFrames=mayDropFrames
+        )
 
     def removeFrameProcessor(self, processor: Callable[[Frame], None]):
         self._processingThread.removeFrameProcessor(processor)
@@ -599,6 +648,8 @@ class Camera(DAQGeneric, OptomechDevice):
 
 
 class CameraTask(DAQGenericTask):
+    allowRearm = False  # configure() does more than DAQGenericTask.rearm() would repeat
+
     def __init__(self, dev: Camera, cmd, parentTask):
         daqCmd = {}
         if "channels" in cmd:
@@ -910,53 +961,64 @@ class CameraTaskResult:
 
 
 class FrameProcessingThread(Thread):
+    """Takes raw frames from the processing queue and passes them through the registered frame processors.
+
+    Processors run on a pool of *maxWorkers* threads (see FrameProcessorGraph); at most *maxFramesInFlight*
+    frames are handed to the pool at once, so a slow lossless processor backs up into the frame queue, where
+    *queuePolicy* applies.
+    """
     sigFrameFullyProcessed = Qt.Signal(object)  # Frame
 
-    def __init__(self):
+    def __init__(self, maxQueueSize=100, queuePolicy='block', maxWorkers=4, maxFramesInFlight=8):
         super().__init__(name="FrameProcessingThread")
         self._stop = False
-        self._processors = []
-        self._final_processor = None
-        self._queue = queue.Queue()
+        self._queue = FrameQueue(maxQueueSize, queuePolicy)
+        self._graph = FrameProcessorGraph(self.sigFrameFullyProcessed.emit, maxWorkers=maxWorkers)
+        self.maxFramesInFlight = maxFramesInFlight
+        self._lastDropWarning = 0
 
-    def addFrameProcessor(self, processor: Callable[[Frame], None], final=False):
-        if final:
-            if self._final_processor is not None:
-                raise RuntimeError("Only one `final` processor can be added.")
-            self._final_processor = processor
-        else:
-            self._processors.append(processor)
+    def addFrameProcessor(
+        self, processor: Callable[[Frame], None], final=False, dependencies=None, mayDropFrames=False
+    ):
+        self._graph.addProcessor(processor, final=final, dependencies=dependencies, mayDropFrames=mayDropFrames)
 
     def removeFrameProcessor(self, processor: Callable[[Frame], None]):
-        if processor in self._processors:
-            self._processors.remove(processor)
-        if processor == self._final_processor:
-            self._final_processor = None
+        self._graph.removeProcessor(processor)
 
     def stop(self):
         self._stop = True
+        self._queue.close()
+
+    def queueStats(self) -> dict:
+        stats = self._queue.stats()
+        stats['inFlight'] = self._graph.inFlight()
+        return stats
 
     @property
     def processors(self):
-        if self._final_processor is not None:
-            return self._processors + [self._final_processor]
-        return self._processors
+        return self._graph.processors
 
     def handleNewRawFrame(self, frame):
-        self._queue.put(frame)
+        if not self._queue.put(frame) and not self._stop:
+            now = ptime.time()
+            if now - self._lastDropWarning > 10:
+                self._lastDropWarning = now
+                generic_logger.warning(
+                    f"Frame processing is falling behind; {self._queue.dropped} frames dropped so far"
+                )
 
     def run(self):
-        while not self._stop:
-            try:
-                frame = self._queue.get(timeout=0.1)
-            except queue.Empty:
-                continue
-            for callback in self.processors:
+        try:
+            while not self._stop:
+                if not self._graph.waitForCapacity(self.maxFramesInFlight, timeout=0.1):
+                    continue
                 try:
-                    callback(frame)
-                except Exception:
-                    generic_logger.exception("Frame processing callback failed")
-            self.sigFrameFullyProcessed.emit(frame)
+                    frame = self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                self._graph.submit(frame)
+        finally:
+            self._graph.shutdown(wait=True)
 
 
 class AcquireThread(Thread):
@@ -1026,9 +1088,8 @@ class AcquireThread(Thread):
                         info["fps"] = None
 
                     for frame in frames:
-                        frameInfo = info.copy()
                         data = frame.pop("data")
-                        frameInfo.update(frame)  # copies 'time' key supplied by camera
+                        frameInfo = {**info, **frame}  # copies 'time' key supplied by camera
                         f = Frame(data, frameInfo)
                         self.dev._processingThread.handleNewRawFrame(f)
 
@@ -111,10 +111,14 @@ class CameraInterface(CameraModuleInterface):
         self.binningComboProxy = SignalProxy(self.ui.binningCombo.currentIndexChanged, slot=self.binningComboChanged)
         self.ui.spinExposure.valueChanged.connect(self.setExposure)  # note that this signal (from acq4.util.SpinBox) is delayed.
 
-        # We get new frames by adding a processing step to the camera.
-        # This allows us to attach metadata (background+contrast info) to the frames before
-        # they are consumed by anyone else
-        self.cam.addFrameProcessor(self.newFrame, final=True)
+        # We get new frames by adding processing steps to the camera.
+        # Annotating attaches metadata (background+contrast info) to every frame before it is recorded or
+        # emitted via sigNewFrame; drawing only needs the newest frame, so it may skip frames when it falls behind.
+        self.cam.addFrameProcessor(self.frameDisplay.annotateFrame, dependencies=[])
+        self.cam.addFrameProcessor(self.imagingCtrl.recordFrame, dependencies=[self.frameDisplay.annotateFrame])
+        self.cam.addFrameProcessor(
+            self.imagingCtrl.displayFrame, dependencies=[self.frameDisplay.annotateFrame], mayDropFrames=True
+        )
 
         # Signals from Camera device
         self.cam.sigCameraStopped.connect(self.cameraStopped)
@@ -135,9 +139,6 @@ class CameraInterface(CameraModuleInterface):
             dev = Manager.getManager().getDevice(key['device'])
             dev.addKeyCallback(key['key'], self.hotkeyPressed, (action,))
 
-    def newFrame(self, frame):
-        self.imagingCtrl.newFrame(frame)
-
     def handleNewFrame(self, frame):
         self.sigNewFrame.emit(self, frame)
 
@@ -226,7 +227,9 @@ class CameraInterface(CameraModuleInterface):
             return
 
         with contextlib.suppress(TypeError):
-            self.cam.removeFrameProcessor(self.newFrame)
+            self.cam.removeFrameProcessor(self.imagingCtrl.displayFrame)
+            self.cam.removeFrameProcessor(self.imagingCtrl.recordFrame)
+            self.cam.removeFrameProcessor(self.frameDisplay.annotateFrame)
             self.cam.sigCameraStopped.disconnect(self.cameraStopped)
             self.cam.sigCameraStarted.disconnect(self.cameraStarted)
             self.cam.sigShowMessage.disconnect(self.showMessage)
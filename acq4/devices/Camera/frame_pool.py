@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import queue
+import sys
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class FramePool:
+    """A fixed set of preallocated image buffers that camera drivers can fill in place, rather than allocating
+    a new array for every frame.
+
+    Buffers are handed out in ring order. A buffer is reused only when nothing outside the pool refers to it
+    any more; the Frame it was delivered in and any views of its data must be gone. Frames kept by consumers
+    are therefore never overwritten. If every buffer is still in use, a new array is allocated and counted in
+    ``exhausted``.
+
+    Parameters
+    ----------
+    size : int
+        Number of buffers to preallocate. If 0, getBuffer() always allocates a new array.
+    """
+
+    def __init__(self, size: int = 16):
+        self.size = size
+        self.exhausted = 0
+        self._lock = threading.Lock()
+        self._buffers = []
+        self._key = None
+        self._next = 0
+        self._freeRefCount = None
+
+    def getBuffer(self, shape, dtype) -> np.ndarray:
+        """Return an uninitialized array of the requested shape and dtype that the caller may fill."""
+        key = (tuple(shape), np.dtype(dtype))
+        with self._lock:
+            if self.size == 0:
+                return np.empty(*key)
+            if key != self._key:
+                # frame size changed; buffers still in use by consumers are simply left to them
+                self._buffers = [np.empty(*key) for _ in range(self.size)]
+                self._key = key
+                self._next = 0
+                self._freeRefCount = sys.getrefcount(self._buffers[0])
+
+            for i in range(self.size):
+                j = (self._next + i) % self.size
+                if sys.getrefcount(self._buffers[j]) <= self._freeRefCount:
+                    self._next = (j + 1) % self.size
+                    return self._buffers[j]
+
+            self.exhausted += 1
+            return np.empty(*key)
+
+    def inUse(self) -> int:
+        """Return the number of pooled buffers that are currently referenced outside the pool."""
+        with self._lock:
+            # (index rather than iterate, so that the loop variable does not add a reference)
+            return sum(sys.getrefcount(self._buffers[i]) > self._freeRefCount for i in range(len(self._buffers)))
+
+
+class FrameQueue:
+    """Bounded FIFO of frames waiting to be processed.
+
+    When the queue is full, put() either waits for space (policy 'block') or discards the oldest queued frame
+    (policy 'drop-oldest'). The number of frames received and dropped is counted.
+
+    Parameters
+    ----------
+    maxSize : int
+        Maximum number of frames held in the queue.
+    policy : str
+        'block' or 'drop-oldest'.
+    """
+
+    policies = ('block', 'drop-oldest')
+
+    def __init__(self, maxSize: int = 100, policy: str = 'block'):
+        if policy not in self.policies:
+            raise ValueError(f"Unknown frame queue policy {policy!r}; must be one of {self.policies}")
+        if maxSize < 1:
+            raise ValueError("Frame queue size must be at least 1")
+        self.maxSize = maxSize
+        self.policy = policy
+        self.received = 0
+        self.dropped = 0
+        self._frames = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._frames)
+
+    def put(self, frame) -> bool:
+        """Add a frame to the queue. Returns False if a frame had to be dropped to make room (or, after close(),
+        if *frame* itself was dropped)."""
+        with self._cond:
+            self.received += 1
+            if self._closed:
+                self.dropped += 1
+                return False
+            ok = True
+            if self.policy == 'block':
+                while len(self._frames) >= self.maxSize and not self._closed:
+                    self._cond.wait(0.1)
+                if self._closed:
+                    self.dropped += 1
+                    return False
+            elif len(self._frames) >= self.maxSize:
+                self._frames.popleft()
+                self.dropped += 1
+                ok = False
+            self._frames.append(frame)
+            self._cond.notify_all()
+            return ok
+
+    def get(self, timeout=None):
+        """Remove and return the oldest frame. Raises queue.Empty if no frame arrives within *timeout*."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._frames) > 0, timeout):
+                raise queue.Empty()
+            frame = self._frames.popleft()
+            self._cond.notify_all()
+            return frame
+
+    def close(self):
+        """Discard queued frames and stop accepting new ones; releases any callers blocked in put()."""
+        with self._cond:
+            self._closed = True
+            self.dropped += len(self._frames)
+            self._frames.clear()
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        return {'queued': len(self._frames), 'received': self.received, 'dropped': self.dropped}
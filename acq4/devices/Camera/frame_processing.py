@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from ...logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class _ProcessorNode:
+    """One registered processor, plus its scheduling state. At most one call to a processor is running at any
+    time, and frames are handed to it in the order they arrived."""
+
+    def __init__(self, processor, dependencies, mayDropFrames, final):
+        self.processor = processor
+        self.dependencies = dependencies
+        self.mayDropFrames = mayDropFrames
+        self.final = final
+        self.pending = deque()  # jobs whose dependencies are all done, waiting for this processor
+        self.busy = False
+
+
+class _GraphSnapshot:
+    """Immutable view of the processor graph. Each frame keeps the snapshot that was current when it arrived,
+    so that adding or removing processors never strands a frame that is already being processed."""
+
+    def __init__(self, nodes, finalNode):
+        deps = {node: [d for d in node.dependencies if d in nodes] for node in nodes}
+        if finalNode is not None:
+            deps[finalNode] = [n for n in nodes if not n.mayDropFrames]
+            nodes = nodes + [finalNode]
+        self.nodes = nodes
+        self.dependencies = deps
+        self.dependents = {node: [] for node in nodes}
+        for node in nodes:
+            for dep in deps[node]:
+                self.dependents[dep].append(node)
+        self.roots = [node for node in nodes if not deps[node]]
+        self.lossless = {node for node in nodes if not node.mayDropFrames}
+
+
+class _FrameJob:
+    def __init__(self, frame, graph: _GraphSnapshot):
+        self.frame = frame
+        self.graph = graph
+        self.remaining = {node: len(graph.dependencies[node]) for node in graph.nodes}
+        self.unresolved = set(graph.nodes)
+        self.losslessRemaining = len(graph.lossless)
+
+
+class FrameProcessorGraph:
+    """Runs frame processors on a pool of worker threads.
+
+    Each processor may declare the processors it depends on; it is called for a frame only after all of its
+    dependencies have finished with that frame. Independent processors run concurrently, and successive frames
+    are pipelined through the graph. Each processor sees frames one at a time and in order.
+
+    A processor that *mayDropFrames* (for example a display) skips straight to the most recent frame whenever it
+    falls behind. Processors that depend on it skip the same frames, so only lossy processors may depend on a
+    lossy processor. Every other processor (for example recording) is called for every frame.
+
+    A frame is finished once every lossless processor has been called for it; finished frames are passed to
+    *onFinished* in the order they arrived, from one of the worker threads.
+
+    Parameters
+    ----------
+    onFinished : callable
+        Called with each frame after all lossless processors are done with it.
+    maxWorkers : int
+        Number of worker threads.
+    """
+
+    def __init__(self, onFinished: Callable, maxWorkers: int = 4):
+        self._onFinished = onFinished
+        self._nodes = []
+        self._finalNode = None
+        self._graph = _GraphSnapshot([], None)
+        self._cond = threading.Condition()
+        self._finished = deque()
+        self._emitLock = threading.Lock()
+        self._inFlight = 0
+        self._shutdown = False
+        self._executor = ThreadPoolExecutor(max_workers=maxWorkers, thread_name_prefix="FrameProcessor")
+
+    def addProcessor(self, processor: Callable, final=False, dependencies=None, mayDropFrames=False):
+        """Register a processor.
+
+        If *dependencies* is None, the processor depends on every lossless processor registered before it, which
+        preserves the order in which processors were added. Otherwise it is a list of previously registered
+        processors that must finish with each frame before this one is called. The single *final* processor
+        runs after all other lossless processors.
+        """
+        with self._cond:
+            if final and self._finalNode is not None:
+                raise RuntimeError("Only one `final` processor can be added.")
+            if dependencies is None:
+                deps = [] if final else [n for n in self._nodes if not n.mayDropFrames]
+            else:
+                deps = [self._findNode(p) for p in dependencies]
+            if not mayDropFrames and any(d.mayDropFrames for d in deps):
+                raise ValueError("A processor that needs every frame cannot depend on one that may drop frames.")
+            node = _ProcessorNode(processor, deps, mayDropFrames, final)
+            if final:
+                self._finalNode = node
+            else:
+                self._nodes.append(node)
+            self._updateGraph()
+
+    def removeProcessor(self, processor: Callable):
+        with self._cond:
+            if self._finalNode is not None and self._finalNode.processor == processor:
+                self._finalNode = None
+            self._nodes = [n for n in self._nodes if n.processor != processor]
+            self._updateGraph()
+
+    def _findNode(self, processor):
+        for node in self._nodes:
+            if node.processor == processor:
+                return node
+        raise ValueError(f"Processor {processor!r} must be added before processors that depend on it.")
+
+    def _updateGraph(self):
+        self._graph = _GraphSnapshot(list(self._nodes), self._finalNode)
+
+    @property
+    def processors(self) -> list:
+        return [node.processor for node in self._graph.nodes]
+
+    def inFlight(self) -> int:
+        """Number of frames that have been submitted but not finished."""
+        return self._inFlight
+
+    def waitForCapacity(self, maxInFlight: int, timeout=None) -> bool:
+        """Wait until fewer than *maxInFlight* frames are being processed. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._inFlight < maxInFlight, timeout)
+
+    def submit(self, frame):
+        """Start processing *frame*."""
+        with self._cond:
+            job = _FrameJob(frame, self._graph)
+            self._inFlight += 1
+            if job.losslessRemaining == 0:
+                self._finish(job)
+            for node in job.graph.roots:
+                self._makeReady(node, job)
+        self._emitFinished()
+
+    def shutdown(self, wait=True):
+        with self._cond:
+            self._shutdown = True
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    # the methods below are called with self._cond held
+
+    def _makeReady(self, node, job):
+        node.pending.append(job)
+        if not node.busy:
+            self._runNext(node)
+
+    def _runNext(self, node):
+        if node.mayDropFrames:
+            while len(node.pending) > 1:
+                self._skip(node, node.pending.popleft())
+        if not node.pending or self._shutdown:
+            node.busy = False
+            return
+        node.busy = True
+        self._executor.submit(self._run, node, node.pending.popleft())
+
+    def _skip(self, node, job):
+        if node not in job.unresolved:
+            return
+        job.unresolved.discard(node)
+        for dep in job.graph.dependents[node]:
+            self._skip(dep, job)
+
+    def _done(self, node, job):
+        job.unresolved.discard(node)
+        if node in job.graph.lossless:
+            job.losslessRemaining -= 1
+            if job.losslessRemaining == 0:
+                self._finish(job)
+        for dep in job.graph.dependents[node]:
+            if dep not in job.unresolved:
+                continue
+            job.remaining[dep] -= 1
+            if job.remaining[dep] == 0:
+                self._makeReady(dep, job)
+
+    def _finish(self, job):
+        self._finished.append(job.frame)
+        self._inFlight -= 1
+        self._cond.notify_all()
+
+    def _run(self, node, job):
+        try:
+            node.processor(job.frame)
+        except Exception:
+            logger.exception("Frame processing callback failed")
+        with self._cond:
+            self._done(node, job)
+            self._runNext(node)
+        self._emitFinished()
+
+    def _emitFinished(self):
+        # finished frames are queued in order under self._cond; the emit lock keeps them in order on the way out
+        with self._emitLock:
+            while True:
+                with self._cond:
+                    if not self._finished:
+                        return
+                    frame = self._finished.popleft()
+                try:
+                    self._onFinished(frame)
+                except Exception:
+                    logger.exception("Frame completion callback failed")
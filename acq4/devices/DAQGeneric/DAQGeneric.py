@@ -271,6 +271,13 @@ class DAQGeneric(Device):
 
 
 class DAQGenericTask(DeviceTask):
+    # Subclasses whose configure() does more than set holding values and record state (for example, anything
+    # that changes the channel mapping used to scale command waveforms) should set this to False.
+    allowRearm = True
+    # Subclasses whose configure() does more than talk to the device (for example, running other tasks)
+    # should set this to False.
+    allowConcurrentConfigure = True
+
     def __init__(self, dev, cmd, parentTask):
         DeviceTask.__init__(self, dev, cmd, parentTask)
         self.daqTasks = {}
@@ -323,6 +330,22 @@ class DAQGenericTask(DeviceTask):
                 prof.mark(f'{ch} record holding')
         prof.finish()
 
+    def canConfigureConcurrently(self):
+        ## presets and holding values are written through the DAQ device, whose reservation is shared safely
+        ## with the other devices being configured
+        return self.allowConcurrentConfigure
+
+    def canRearm(self):
+        ## presets and recorded initial values are applied once per configure(); the channels
+        ## created on the DAQ task can otherwise be reused as-is
+        if not self.allowRearm:
+            return False
+        return not any('preset' in cmd or cmd.get('recordInit', False) for cmd in self._DAQCmd.values())
+
+    def rearm(self):
+        ## configure() only sets holding values and records state; it is cheap to repeat
+        self.configure()
+
     def createChannels(self, daqTask):
         self.daqTasks = {}
 
@@ -455,10 +478,12 @@ class DAQGenericTask(DeviceTask):
         info = [axis(name='Channel', cols=cols), axis(name='Time', units='s', values=timeVals)] + [
             {'DAQ': daqState}]
 
-        protInfo = self._DAQCmd.copy()  ## copy everything but the command arrays and low-level configuration info
-        for ch in protInfo:
-            protInfo[ch].pop('command', None)
-            protInfo[ch].pop('lowLevelConf', None)
+        ## copy everything but the command arrays and low-level configuration info
+        ## (without modifying the command itself, which may be used again if the task is re-armed)
+        protInfo = {
+            ch: {k: v for k, v in cmd.items() if k not in ('command', 'lowLevelConf')}
+            for ch, cmd in self._DAQCmd.items()
+        }
         info[-1]['Protocol'] = protInfo
 
         return MetaArray(arr, info=info)
@@ -8,7 +8,6 @@ from pyqtgraph import SpinBox, WidgetGroup, mkPen
 
 
 from acq4.util import Qt
-from acq4.util.SequenceRunner import runSequence
 
 AOChannelTemplate = Qt.importTemplate('.AOChannelTemplate')
 DOChannelTemplate = Qt.importTemplate('.DOChannelTemplate')
@@ -222,13 +221,7 @@ class OutputChannelGui(DaqChannelGui):
         self.clearPlots()
 
         ## display sequence waves
-        params = {}
-        ps = self.ui.waveGeneratorWidget.listSequences()
-        for k in ps:
-            params[k] = list(range(len(ps[k])))
-        waves = []
-        runSequence(lambda p: waves.append(self.getSingleWave(p)), params,
-                    list(params.keys()))  ## appends waveforms for the entire parameter space to waves
+        waves = self.getSequenceWaves()  ## waveforms for the entire parameter space
 
         autoRange = self.plot.getViewBox().autoRangeEnabled()
         self.plot.enableAutoRange(x=False, y=False)
@@ -274,6 +267,13 @@ class OutputChannelGui(DaqChannelGui):
 
         return wave
 
+    def getSequenceWaves(self):
+        h = self.getHoldingValue()
+        if h is not None:
+            self.ui.waveGeneratorWidget.setOffset(h)
+
+        return self.ui.waveGeneratorWidget.getSequence(self.rate, self.numPts)
+
     def holdingCheckChanged(self, *v):
         self.ui.holdingSpin.setEnabled(self.ui.holdingCheck.isChecked())
         self.updateHolding()
@@ -2,6 +2,8 @@
 from __future__ import annotations
 
 import os
+import threading
+import time
 import traceback
 from contextlib import contextmanager
 from typing import Optional
@@ -13,6 +15,8 @@ from acq4.util import Qt
 from acq4.util.Mutex import Mutex
 from acq4.util.optional_weakref import Weakref
 
+_borrowed = threading.local()  # devices whose reservation the current thread is using; see borrowReservations()
+
 
 class Device(InterfaceMixin, Qt.QObject):  # QObject calls super, which is disastrous if not last in the MRO
     """Abstract class defining the standard interface for Device subclasses."""
@@ -20,6 +24,11 @@ class Device(InterfaceMixin, Qt.QObject):  # QObject calls super, which is disas
     # used to ensure devices are shut down in the correct order
     _deviceCreationOrder = []
 
+    # Whether createTask() may be called while another task that uses this device is running (TaskRunner does
+    # this to prepare the next point in a sequence). Devices whose tasks change hardware or device
+    # configuration when they are created, rather than in configure(), should set this to False.
+    allowEarlyTaskCreation = True
+
     def __init__(self, deviceManager: acq4.Manager.Manager, config: dict, name: str):
         Qt.QObject.__init__(self)
 
@@ -32,6 +41,8 @@ class Device(InterfaceMixin, Qt.QObject):  # QObject calls super, which is disas
         # don't have a good solution for this problem at present..
         self._lock_ = Mutex(Qt.QMutex.Recursive)
         self._lock_tb_ = None
+        # serializes threads that borrow a reservation held by another thread (see borrowReservations)
+        self._borrowLock_ = threading.RLock()
         self.dm = deviceManager
         self.dm.declareInterface(name, ['device'], self)
         self.config = config
@@ -107,6 +118,12 @@ class Device(InterfaceMixin, Qt.QObject):  # QObject calls super, which is disas
         recommended to use Manager.reserveDevices() instead in order to avoid deadlocks.
         """
         # print("Device %s attempting lock.." % self.name())
+        if self in getattr(_borrowed, 'devices', ()):
+            if self._borrowLock_.acquire(blocking=block, timeout=-1 if timeout is None or not block else timeout):
+                return True
+            if block:
+                raise TimeoutError(f"Timed out waiting for borrowed device lock for {self.name()}")
+            return False
         if block:
             l = self._lock_.tryLock(int(timeout*1000))
             if not l:
@@ -128,6 +145,9 @@ class Device(InterfaceMixin, Qt.QObject):  # QObject calls super, which is disas
         return True
 
     def release(self):
+        if self in getattr(_borrowed, 'devices', ()):
+            self._borrowLock_.release()
+            return
         try:
             self._lock_.unlock()
             # print("Device %s unlocked" % self.name())
@@ -156,6 +176,22 @@ class Device(InterfaceMixin, Qt.QObject):  # QObject calls super, which is disas
         return f'<{self.__class__.__name__} "{self.name()}">'
 
 
+@contextmanager
+def borrowReservations(devices):
+    """Allow the current thread to use *devices*, which another thread has already reserved.
+
+    Manager.Task uses this to configure devices from worker threads while the executing thread holds the
+    reservations. Within the context, Device.reserve() and release() on these devices do not touch the global
+    reservation lock; instead they serialize the borrowing threads against each other.
+    """
+    previous = getattr(_borrowed, 'devices', ())
+    _borrowed.devices = frozenset(previous).union(devices)
+    try:
+        yield
+    finally:
+        _borrowed.devices = previous
+
+
 class DeviceTask(object):
     """
     DeviceTask handles all behavior of a single device during 
@@ -169,16 +205,23 @@ class DeviceTask(object):
         2. Controller calls getConfigOrder() and getPrepTimeEstimate() on all DeviceTasks to
            determine configuration order.
         3. Controller calls configure() on each DeviceTask in an order that satisfies the
-           dependencies declared by getConfigOrder().
+           dependencies declared by getConfigOrder(). DeviceTasks whose canConfigureConcurrently()
+           returns True are configured in worker threads, concurrently with any other tasks
+           whose dependencies are satisfied.
         4. Controller calls getStartOrder() on all DeviceTasks to determine start order.
         5. Controller calls start() on each DeviceTask in an order that satisfies the dependencies
            declared by getStartOrder().
         6. If requested, controller calls abort() (which calls stop()) on each DeviceTask.
-        7. Controller periodically calls isDone() on each DeviceTask until all return True.
+        7. Once the task duration has elapsed, controller calls waitUntilDone() on each DeviceTask
+           until all return True.
         8. Controller calls stop() on each DeviceTask.
         9. Controller calls getResult() and optionally storeResult() on each DeviceTask to collect
            and store results.
         10. Controller deletes DeviceTask instances.
+
+    A task that is executed repeatedly with an unchanged command (for example, test pulses) may instead be
+    re-armed: if canRearm() returns True for every DeviceTask, the controller calls rearm() in place of
+    configure() and then repeats steps 4-9 with the same DeviceTask instances.
     """
     def __init__(self, dev, cmd, parentTask):
         """
@@ -244,6 +287,48 @@ class DeviceTask(object):
         """
         pass
 
+    def canConfigureConcurrently(self):
+        """
+        Return True if configure() (and rearm()) may be called from a worker
+        thread, concurrently with the configuration of other devices in the task.
+
+        Only dependencies declared by getConfigOrder() are guaranteed to have
+        finished configuring first. While configuring, the worker thread may
+        reserve devices that the parent task has reserved; such reservations
+        are exclusive only among the threads configuring the task. configure()
+        must not touch Qt widgets.
+
+        The default implementation returns False, which configures this task in
+        the thread that executes the parent task.
+        """
+        return False
+
+    def canRearm(self):
+        """
+        Return True if this DeviceTask can be executed again with its current
+        command by calling rearm() instead of configure().
+
+        This is only asked after the task has been configured and run at least
+        once. DeviceTasks that opt in must be able to reuse everything they
+        (and the channels they created on other devices) prepared in configure(),
+        and should return False if device state has changed in a way that would
+        invalidate it.
+
+        The default implementation returns False.
+        """
+        return False
+
+    def rearm(self):
+        """
+        Prepare this DeviceTask to run again with the same command. Called
+        instead of configure() (in the same order) when the parent task is
+        re-executed, and only if canRearm() returned True.
+
+        Implementations should redo only the inexpensive parts of configure(),
+        such as setting holding values and recording device state.
+        """
+        raise NotImplementedError()
+
     def getStartOrder(self):
         """
         This method is called by the parent task before starting any devices.
@@ -272,6 +357,25 @@ class DeviceTask(object):
         The default implementation returns True.
         """
         return True
+
+    def waitUntilDone(self, timeout):
+        """
+        Block until this DeviceTask has completed or *timeout* seconds have
+        elapsed, and return isDone().
+
+        The parent task calls this instead of repeatedly polling isDone(), so
+        that it can respond as soon as the device finishes. The default
+        implementation checks isDone() every millisecond; DeviceTasks that can
+        block on their hardware driver or on a completion event should
+        reimplement it.
+        """
+        deadline = time.perf_counter() + timeout
+        while not self.isDone():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return False
+            time.sleep(min(1e-3, remaining))
+        return True
     
     def stop(self, abort=False):
         """
@@ -725,6 +725,9 @@ class LaserTask(DAQGenericTask):
     }
     
     """
+    allowRearm = False  # configure() does more than DAQGenericTask.rearm() would repeat
+    allowConcurrentConfigure = False  # power checks may run tasks of their own
+
     def __init__(self, dev, cmd, parentTask):
         self.cmd = cmd
         self.dev = dev ## this happens in DAQGeneric initialization, but we need it here too since it is used in making the waveforms that go into DaqGeneric.__init__
@@ -297,7 +297,9 @@ class MockCamera(Camera):
             data = fn.downsample(data, bin[0], axis=0)
         if bin[1] > 1:
             data = fn.downsample(data, bin[1], axis=1)
-        data = data.astype(np.uint16)
+        frameData = self.getFrameBuffer(data.shape, np.uint16)
+        np.copyto(frameData, data, casting="unsafe")
+        data = frameData
         prof()
 
         self.frameId += 1
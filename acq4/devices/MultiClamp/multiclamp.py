@@ -504,6 +504,21 @@ class MultiClampTask(DeviceTask):
         
         #prof.mark('    Multiclamp: set holding')
                 
+    def canConfigureConcurrently(self):
+        ## configure() only talks to the commander and sets holding values on the DAQ
+        return True
+
+    def canRearm(self):
+        ## the command waveform written to the DAQ was scaled by the external command sensitivity
+        return self.dev.extCmdScale(self.cmd['mode']) == self.state.get('extCmdScale')
+
+    def rearm(self):
+        ## the clamp state is set and recorded again; the DAQ channels are reused
+        scale = self.state.get('extCmdScale')
+        self.configure()
+        if 'command' in self.cmd and self.state.get('extCmdScale') != scale:
+            raise RuntimeError("MultiClamp external command sensitivity changed; task must be recreated.")
+
     def getUsedChannels(self):
         """Return a list of the channels this task uses"""
         if self.usedChannels is None:
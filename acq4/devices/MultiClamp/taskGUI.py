@@ -5,7 +5,6 @@ from pyqtgraph import mkPen, disconnect
 from acq4.devices.Device import TaskGui
 from pyqtgraph.WidgetGroup import WidgetGroup
 from acq4.util import Qt
-from acq4.util.SequenceRunner import runSequence
 
 
 Ui_Form = Qt.importTemplate('.TaskTemplate')
@@ -146,12 +145,7 @@ class MultiClampTaskGui(TaskGui):
         self.clearCmdPlots()
         
         ## compute sequence waves
-        params = {}
-        ps = self.ui.waveGeneratorWidget.listSequences()
-        for k in ps:
-            params[k] = list(range(len(ps[k])))
-        waves = []
-        runSequence(lambda p: waves.append(self.getSingleWave(p)), params, list(params.keys()))
+        waves = self.getSequenceWaves()
 
         # Plot all waves but disable auto-range first to improve performance.
         autoRange = self.ui.bottomPlotWidget.getViewBox().autoRangeEnabled()
@@ -240,6 +234,11 @@ class MultiClampTaskGui(TaskGui):
         if wave is None:
             return None
         return wave
+
+    def getSequenceWaves(self):
+        state = self.stateGroup.state()
+        self.ui.waveGeneratorWidget.setOffset(state['holdingSpin'])
+        return self.ui.waveGeneratorWidget.getSequence(self.rate, self.numPts)
         
         
     def getMode(self):
@@ -1,3 +1,5 @@
+import functools
+
 import numpy
 import scipy.ndimage
 import scipy.signal
@@ -7,6 +9,26 @@ from acq4.devices.Device import Device, DeviceTask
 from acq4.devices.NiDAQ.taskGUI import NiDAQTask
 
 
+@functools.lru_cache(maxsize=64)
+def _lowpassSOS(filter, cutoff, order, stopCutoff, gpass, gstop):
+    """Design (and cache) a lowpass filter in second-order sections; see NiDAQ.lowpass."""
+    if filter == 'bessel':
+        return scipy.signal.bessel(order, cutoff, btype='low', output='sos')
+    elif filter == 'butterworth':
+        if stopCutoff is None:
+            stopCutoff = cutoff * 2.0
+        ord, Wn = scipy.signal.buttord(cutoff, stopCutoff, gpass, gstop)
+        return scipy.signal.butter(ord, Wn, btype='low', output='sos')
+    else:
+        raise ValueError(f'Unknown filter type "{filter}"')
+
+
+@functools.lru_cache(maxsize=64)
+def _decimationFIR(ds):
+    """Design (and cache) the anti-aliasing FIR used for polyphase decimation by *ds*."""
+    return scipy.signal.firwin(20 * ds + 1, 1.0 / ds, window=('kaiser', 8.0))
+
+
 class NiDAQ(Device):
     """
     National Instruments DAQ device for multi-channel analog/digital I/O operations.
@@ -163,22 +185,28 @@ class NiDAQ(Device):
 
     @staticmethod
     def downsample(data, ds, method, **kargs):
+        """Reduce the sample rate of *data* by the integer factor *ds*.
+
+        Methods:
+
+        * 'subsample': keep every ds-th sample (no anti-aliasing)
+        * 'mean': average each group of ds samples (folds high-frequency noise down rather than removing it)
+        * 'fourier': anti-aliasing FIR lowpass evaluated in polyphase form (only the output samples are computed)
+        * 'bessel_mean', 'butterworth_mean': zero-phase IIR lowpass, then average
+        * 'lowpass_mean': lowpass with the arguments given in *kargs* (see lowpass()), then average
+
+        Filter designs are cached, so repeated calls with the same parameters do not redesign the filter.
+        """
         if method == 'subsample':
             data = data[::ds].copy()
 
         elif method == 'mean':
-            # MC: broken code, commented out.
-            raise ValueError("Mean resampling not implemented.")
-            # decimate by averaging points together (does not remove HF noise, just folds it down.)
-            # if res['info']['type'] in ['di', 'do']:
-            #     data = NiDAQ.meanResample(data, ds, binary=True)
-            # else:
-            #     data = NiDAQ.meanResample(data, ds)
+            data = NiDAQ.meanResample(data, ds)
 
         elif method == 'fourier':
-            # Decimate using fourier resampling -- causes ringing artifacts, very slow to compute (possibly uses butterworth filter?)
+            # Decimate with a kaiser-windowed (beta=8) FIR lowpass
             newLen = int(data.shape[0] / ds)
-            data = scipy.signal.resample(data, newLen, window=8)  # Use a kaiser window with beta=8
+            data = scipy.signal.resample_poly(data, 1, ds, window=_decimationFIR(ds), padtype='line')[:newLen]
 
         elif method == 'bessel_mean':
             # Lowpass, then average. Bessel filter has less efficient lowpass characteristics and filters some of the passband as well.
@@ -195,14 +223,16 @@ class NiDAQ(Device):
             data = NiDAQ.lowpass(data, **kargs)
             data = NiDAQ.meanResample(data, ds)
 
+        else:
+            raise ValueError(f'Unknown downsampling method "{method}"')
+
         return data
 
     @staticmethod
     def meanResample(data, ds, binary=False):
         """Resample data by taking mean of ds samples at a time"""
-        newLen = int(data.shape[0] / ds) * ds
-        data = data[:newLen]
-        data.shape = (int(data.shape[0] / ds), ds)
+        newLen = int(data.shape[0] / ds)
+        data = data[:newLen * ds].reshape(newLen, ds)
         if binary:
             return data.mean(axis=1).round().astype(numpy.byte)
         else:
@@ -217,33 +247,17 @@ class NiDAQ(Device):
             if stopCutoff is not None:
                 stopCutoff /= 0.5 * samplerate
 
-        if filter == 'bessel':
-            ## How do we compute Wn?
-            ### function determining magnitude transfer of 4th-order bessel filter
-            # from scipy.optimize import fsolve
-
-            # def m(w):
-            # return 105. / (w**8 + 10*w**6 + 135*w**4 + 1575*w**2 + 11025.)**0.5
-            # v = fsolve(lambda x: m(x)-limit, 1.0)
-            # Wn = cutoff / (sampr*v)
-            b, a = scipy.signal.bessel(order, cutoff, btype='low')
-        elif filter == 'butterworth':
-            if stopCutoff is None:
-                stopCutoff = cutoff * 2.0
-            ord, Wn = scipy.signal.buttord(cutoff, stopCutoff, gpass, gstop)
-            b, a = scipy.signal.butter(ord, Wn, btype='low')
-        else:
-            raise ValueError(f'Unknown filter type "{filter}"')
-
-        padded = numpy.hstack(
-            [data[:100], data, data[-100:]])  ## can we intelligently decide how many samples to pad with?
+        sos = _lowpassSOS(filter, float(cutoff), order, None if stopCutoff is None else float(stopCutoff),
+                          float(gpass), float(gstop))
 
         if bidir:
-            data = scipy.signal.lfilter(b, a, scipy.signal.lfilter(b, a, padded)[::-1])[::-1][
-                   100:-100]  ## filter twice; once forward, once reversed. (This eliminates phase changes)
+            ## filter twice; once forward, once reversed. (This eliminates phase changes)
+            ## Edges are handled by odd extension inside sosfiltfilt rather than by padding a copy of the data.
+            return scipy.signal.sosfiltfilt(sos, data, padlen=min(100, data.shape[0] - 1))
         else:
-            data = scipy.signal.lfilter(b, a, padded)[100:-100]
-        return data
+            ## start from the steady state for the first sample to avoid a startup transient
+            zi = scipy.signal.sosfilt_zi(sos) * data[0]
+            return scipy.signal.sosfilt(sos, data, zi=zi)[0]
 
     @staticmethod
     def denoise(data, radius=2, threshold=4):
@@ -307,6 +321,13 @@ class Task(DeviceTask):
             assert triggerChan is not None, f"Task requests for {tDevName} to trigger {self.dev.name()}, but no trigger channel is configured between these devices."
             self.st.setTrigger(triggerChan)
 
+    def canRearm(self):
+        ## Channels, clock and trigger configuration all remain valid on the DAQmx tasks.
+        return True
+
+    def rearm(self):
+        self.st.rearm()
+
     def getStartOrder(self):
         before = []
         after = []
@@ -340,6 +361,12 @@ class Task(DeviceTask):
         else:
             return True
 
+    def waitUntilDone(self, timeout):
+        if self.st.hasTasks():
+            return self.st.waitUntilDone(timeout)
+        else:
+            return True
+
     def stop(self, wait=False, abort=False):
         if self.st.hasTasks():
             self.st.stop(wait=wait, abort=abort)
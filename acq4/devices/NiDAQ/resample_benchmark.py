@@ -0,0 +1,64 @@
+"""Compare the speed of NiDAQ.downsample against the implementation it replaced.
+
+Run with::
+
+    python -m acq4.devices.NiDAQ.resample_benchmark [ds] [nSamples]
+
+The default is a 500 kHz, 0.2 s trace downsampled 20x, similar to a fast test pulse channel.
+"""
+import sys
+import timeit
+
+import numpy as np
+import scipy.signal
+
+from .nidaq import NiDAQ
+
+
+def legacyLowpass(data, cutoff, order=4, bidir=True, filter='bessel', stopCutoff=None, gpass=2., gstop=20.):
+    if filter == 'bessel':
+        b, a = scipy.signal.bessel(order, cutoff, btype='low')
+    else:
+        if stopCutoff is None:
+            stopCutoff = cutoff * 2.0
+        ord, Wn = scipy.signal.buttord(cutoff, stopCutoff, gpass, gstop)
+        b, a = scipy.signal.butter(ord, Wn, btype='low')
+    padded = np.hstack([data[:100], data, data[-100:]])
+    if bidir:
+        return scipy.signal.lfilter(b, a, scipy.signal.lfilter(b, a, padded)[::-1])[::-1][100:-100]
+    return scipy.signal.lfilter(b, a, padded)[100:-100]
+
+
+def legacyMeanResample(data, ds):
+    newLen = int(data.shape[0] / ds) * ds
+    data = data[:newLen]
+    data.shape = (int(data.shape[0] / ds), ds)
+    return data.mean(axis=1)
+
+
+def legacyDownsample(data, ds, method):
+    if method == 'subsample':
+        return data[::ds].copy()
+    elif method == 'mean':
+        return legacyMeanResample(data, ds)
+    elif method == 'fourier':
+        return scipy.signal.resample(data, int(data.shape[0] / ds), window=8)
+    elif method == 'bessel_mean':
+        return legacyMeanResample(legacyLowpass(data, 2.0 / ds, filter='bessel', order=4, bidir=True), ds)
+    elif method == 'butterworth_mean':
+        return legacyMeanResample(legacyLowpass(data, 1.0 / ds, bidir=True, filter='butterworth'), ds)
+
+
+def main(ds=20, nSamples=100000, repeat=5):
+    data = np.random.normal(size=nSamples)
+    print(f"Downsampling {nSamples} samples by {ds} (best of {repeat}):")
+    print(f"{'method':>18s} {'old (ms)':>10s} {'new (ms)':>10s} {'speedup':>8s}")
+    for method in ['subsample', 'mean', 'fourier', 'bessel_mean', 'butterworth_mean']:
+        old = min(timeit.repeat(lambda: legacyDownsample(data.copy(), ds, method), number=1, repeat=repeat))
+        new = min(timeit.repeat(lambda: NiDAQ.downsample(data.copy(), ds, method), number=1, repeat=repeat))
+        print(f"{method:>18s} {old * 1e3:10.2f} {new * 1e3:10.2f} {old / new:7.1f}x")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -55,6 +55,7 @@ class TestPulseThread(QtThread):
         }
         self._params.update(self._clampDev.testPulseConfig)
         self._lastTask = None
+        self._lastTaskKey = None
 
         self._daqName = self._clampDev.getDAQName("primary")
         self._clampName = self._clampDev.name()
@@ -141,18 +142,17 @@ class TestPulseThread(QtThread):
         params = self._params
         runMode = currentMode if params['clampMode'] is None else params['clampMode']
 
-        # Can't reuse tasks yet; remove this when we can.
-        self._lastTask = None
-
-        if self._lastTask is None or self._lastTask._paramIndex != params['_index'] or self._lastTask._clampMode != runMode:
+        # The previous task is re-armed (rather than rebuilt and reconfigured) as long as it would produce the
+        # same command: same parameters, clamp mode and holding level (auto bias changes the holding in IC).
+        taskKey = (params['_index'], runMode, self._clampDev.getHolding(runMode))
+        if self._lastTask is not None and self._lastTaskKey == taskKey and self._lastTask.rearm():
+            task = self._lastTask
+        else:
             taskParams = self.paramsForMode(runMode)
             task = self.createTask(taskParams)
-            task._paramIndex = params['_index']
-            task._clampMode = runMode
             self._lastTask = task
+            self._lastTaskKey = taskKey
             self._lastTaskParams = taskParams
-        else:
-            task = self._lastTask
 
         # if clamp mode changed while we were fiddling around, then abort.
         task.reserveDevices()
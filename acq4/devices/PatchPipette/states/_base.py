@@ -10,7 +10,7 @@ from typing import Any, Optional, Iterable
 import numpy as np
 
 from acq4 import getManager
-from acq4.util import Qt
+from acq4.util import Qt, executor
 from acq4.util.debug import log_and_ignore_exception
 from acq4.util.future import Future, future_wrap
 from neuroanalysis.test_pulse import PatchClampTestPulse
@@ -157,7 +157,8 @@ class PatchPipetteState(Future):
         """Start a background thread that executes this state. This should only be called by the state manager.
         
         When runJob completes, self.sigFinished will be emitted."""
-        self.executeInThread(self.runJob, args=(), kwds={})
+        # states run until they are told to stop, so they get a thread of their own
+        self.executeInThread(self.runJob, args=(), kwds={}, executor=executor.DEDICATED)
 
     def setResult(self, *args, **kwargs):
         if 'error' in kwargs:
@@ -1,6 +1,7 @@
 import scipy.ndimage
 import numpy as np
-from acq4.util.image_registration import iterativeImageTemplateMatch
+from acq4.util import executor
+from acq4.util.image_registration import TemplateMatcher, downsamplePyramid
 import pyqtgraph as pg
 
 
@@ -12,6 +13,10 @@ class PipetteDetector(object):
     def getReference(self):
         return self.tracker.getReference()
 
+    @property
+    def reference(self):
+        return self.getReference()
+
     def findPipette(self, frame, bg_frame=None, minImgPos=None, maxImgPos=None, expectedPos=None):
         """Detect the pipette tip in *frame* and return the physical location.
 
@@ -87,23 +92,54 @@ class PipetteDetector(object):
 
 
 class TemplateMatchPipetteDetector(PipetteDetector):
+    """Detects the pipette tip by template matching against the tracker's stack of reference frames.
+
+    The filtered reference frames (and a TemplateMatcher for each) are cached and reused for as long as the tracker
+    returns the same reference; call clearCache() if the reference data is modified in place.
+    """
+    # downsampling factors used for iterative template matching
+    dsVals = (4, 2, 1)
+
     def __init__(self, *args, **kwds):
         PipetteDetector.__init__(self, *args, **kwds)
+        self.clearCache()
+
+    def clearCache(self):
+        self._cachedRef = None
         self._filtered_ref = None
-        
+        self._ref_matchers = None
+
+    def _checkCache(self):
+        reference = self.getReference()
+        if reference is not self._cachedRef:
+            self.clearCache()
+            self._cachedRef = reference
+        return reference
+
     @property
     def filtered_ref(self):
         """The reference image data passed through the preprocessing filter.
         """
+        reference = self._checkCache()
         if self._filtered_ref is None:
-            self._filtered_ref = [self.filterImage(f) for f in self.reference['frames']]
+            self._filtered_ref = [self.filterImage(f) for f in reference['frames']]
         return self._filtered_ref
 
+    @property
+    def ref_matchers(self):
+        """A TemplateMatcher for each filtered reference frame.
+        """
+        filtered = self.filtered_ref
+        if self._ref_matchers is None:
+            self._ref_matchers = [TemplateMatcher(f, self.dsVals) for f in filtered]
+        return self._ref_matchers
+
     def estimateOffset(self, img, show=False):
         reference = self.getReference()
 
-        # run template match against all template frames
-        match = [iterativeImageTemplateMatch(img, t) for t in self.filtered_ref]
+        # run template match against all template frames in parallel, sharing one image pyramid
+        imgPyramid = downsamplePyramid(img, self.dsVals)
+        match = executor.parallelMap('compute', lambda m: m.match(None, imgPyramid=imgPyramid), self.ref_matchers)
 
         if show:
             pg.plot([m[0][0] for m in match], title='x match vs z')
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import os
+import threading
 from typing import TYPE_CHECKING, Union
 
 import pyqtgraph as pg
 from acq4.util.future import future_wrap
 from coorx import SRT3DTransform
 from ... import getManager
-from ...util.geometry import GeometryMotionPlanner, Plane
+from ...util.geometry import GeometryMotionPlanner, Plane, VolumeDiskCache
 
 if TYPE_CHECKING:
     from .pipette import Pipette
@@ -203,6 +205,29 @@ class PipettePathGenerator:
         return self.pip.mapToGlobal(safePos)
 
 
+_geometryCacheLock = threading.Lock()
+
+
+def configureGeometryDiskCache(man):
+    """Set up the on-disk cache of convolved obstacles from the 'geometryCache' option in the 'misc' section of the
+    manager config. The cache is disabled unless this option is given::
+
+        geometryCache:
+            path: 'geometry_cache'     # absolute, or relative to the per-user cache directory (Manager.userCacheDir)
+            maxSize: 2e9               # bytes; least recently used entries are removed beyond this
+
+    The cache is shared by all pipettes and is only configured once.
+    """
+    with _geometryCacheLock:
+        if GeometryMotionPlanner.disk_cache is not None:
+            return
+        config = man.config.get("misc", {}).get("geometryCache")
+        if config is None:
+            return
+        path = os.path.join(man.userCacheDir(), config.get("path", "geometry_cache"))
+        GeometryMotionPlanner.set_disk_cache(VolumeDiskCache(path, config.get("maxSize", 2 * 2**30)))
+
+
 class GeometryAwarePathGenerator(PipettePathGenerator):
     def __init__(self, pip: Pipette):
         super().__init__(pip)
@@ -235,7 +260,7 @@ class GeometryAwarePathGenerator(PipettePathGenerator):
         )
         return planner, from_pip_to_global
 
-    @future_wrap
+    @future_wrap(executor='compute')
     def _primeCaches(self, _future):
         try:
             man = getManager()
@@ -245,6 +270,7 @@ class GeometryAwarePathGenerator(PipettePathGenerator):
             while not mod.isReady.wait(0.05):
                 _future.checkStop()
             viz = mod.window().pathPlanVisualizer(self.pip)
+            configureGeometryDiskCache(man)
             planner, from_pip_to_global = self._getPlanningContext()
             planner.make_convolved_obstacles(self.pip.getGeometry(), from_pip_to_global, viz)
             print(f"cache primed for {self.pip.name()}")
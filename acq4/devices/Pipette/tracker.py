@@ -98,6 +98,7 @@ class CorrelationPipetteTracker(PipetteTracker):
 
     def __init__(self, pipette):
         PipetteTracker.__init__(self, pipette)
+        self._detector = None
         fileName = self.pipette.configFileName("ref_frames.pk")
         try:
             with open(fileName, "rb") as fh:
@@ -243,6 +244,8 @@ class CorrelationPipetteTracker(PipetteTracker):
         maxInd = np.argmax([imageTemplateMatch(f, center)[1] for f in frames])
 
         key = imager.getDeviceStateKey()
+        if self._detector is not None:
+            self._detector.clearCache()
         self.reference[key] = {
             "frames": frames - bg_frames.mean(axis=0),
             "zStep": zStep,
@@ -290,7 +293,7 @@ class CorrelationPipetteTracker(PipetteTracker):
 
         If movePipette, then take two frames with the pipette moved away for the second frame to allow background subtraction
         """
-        detector = self.detectorClass(tracker=self, pipette=self.pipette)
+        detector = self.getDetector()
 
         tipLength = detector.suggestTipLength()
         if padding is None:
@@ -332,6 +335,15 @@ class CorrelationPipetteTracker(PipetteTracker):
         measuredTipPos, corr = self.measureTipPosition(frame, padding, threshold, pos=pos, movePipette=movePipette)
         return tuple([measuredTipPos[i] - expectedTipPos[i] for i in (0, 1, 2)])
 
+    def getDetector(self):
+        """Return the detector used by measureTipPosition().
+
+        The same detector is reused for every measurement so that its preprocessed reference frames are cached.
+        """
+        if self._detector is None:
+            self._detector = self.detectorClass(tracker=self, pipette=self.pipette)
+        return self._detector
+
     def getReference(self):
         key = self._getImager().getDeviceStateKey()
         try:
@@ -8,7 +8,7 @@ import numpy as np
 import pyqtgraph as pg
 from acq4.drivers.sensapex import UMP, version_info
 from acq4.util import Qt
-from acq4.util import ptime
+from acq4.util import executor, ptime
 from pyqtgraph import Transform3D, solve3DTransform
 from .Stage import Stage, MoveFuture, ManipulatorAxesCalibrationWindow, StageAxesCalibrationWindow
 
@@ -280,16 +280,16 @@ class SensapexMoveFuture(MoveFuture):
 
         if self.speed >= 1e-6:
             self._moveReq = self.dev.dev.goto_pos(pos, self.speed * 1e6, simultaneous=linear, linear=linear)
-            self._monitorThread = threading.Thread(target=self._watchForFinish, daemon=True, name=f"{name} sensapex monitor")
+            executor.submit('io', self._watchForFinish, threadName=f"{name} sensapex monitor")
         else:
             # uMp has trouble with very slow speeds, so we do this manually by looping over small steps
             self._moveReq = None
-            self._monitorThread = threading.Thread(target=self._stepwiseMove, daemon=True, name=f"{name} sensapex stepwise move")
-        self._monitorThread.start()
+            executor.submit(executor.DEDICATED, self._stepwiseMove, threadName=f"{name} sensapex stepwise move")
 
     def _watchForFinish(self):
         moveReq = self._moveReq
-        moveReq.finished_event.wait()
+        with executor.blocking():
+            moveReq.finished_event.wait()
         self._taskDone(
             interrupted=moveReq.interrupted,
             error=self._generateErrorMessage(),
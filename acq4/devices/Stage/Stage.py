@@ -2,13 +2,12 @@ from __future__ import annotations
 
 import contextlib
 import functools
-import threading
 from typing import Tuple, List
 
 import numpy as np
 
 import pyqtgraph as pg
-from acq4.util import Qt, ptime
+from acq4.util import Qt, executor, ptime
 from acq4.util.Mutex import Mutex
 from coorx import AffineTransform
 from pyqtgraph import siFormat
@@ -826,10 +825,7 @@ class MovePathFuture(MoveFuture):
                     f"Cannot move {dev.name()} to path step {i}/{len(self.path)}: {step}"
                 ) from exc
 
-        self._moveThread = threading.Thread(
-            target=self._movePath, name=f'{self.dev.name()} : {name}'
-        )
-        self._moveThread.start()
+        executor.submit('io', self._movePath, threadName=f'{self.dev.name()} : {name}')
 
     def percentDone(self):
         fut = self._currentFuture
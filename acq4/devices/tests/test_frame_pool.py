@@ -0,0 +1,72 @@
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from acq4.devices.Camera.frame_pool import FramePool, FrameQueue
+
+
+def test_pool_reuses_released_buffers():
+    pool = FramePool(size=2)
+    a = pool.getBuffer((4, 5), np.uint16)
+    b = pool.getBuffer((4, 5), np.uint16)
+    assert a is not b
+    assert pool.inUse() == 2
+
+    # both buffers are held; a new array is allocated
+    c = pool.getBuffer((4, 5), np.uint16)
+    assert c is not a and c is not b
+    assert pool.exhausted == 1
+
+    # a view keeps its buffer from being reused
+    view = a[1:]
+    del a
+    assert pool.inUse() == 2
+    del view
+    assert pool.inUse() == 1
+    d = pool.getBuffer((4, 5), np.uint16)
+    assert d.shape == (4, 5) and d.dtype == np.uint16
+    assert pool.inUse() == 2
+
+    # changing the frame shape replaces the pool
+    e = pool.getBuffer((2, 2), np.float32)
+    assert e.shape == (2, 2) and e.dtype == np.float32
+    assert pool.inUse() == 1
+
+
+def test_queue_drop_oldest():
+    q = FrameQueue(maxSize=3, policy='drop-oldest')
+    results = [q.put(i) for i in range(5)]
+    assert results == [True, True, True, False, False]
+    assert [q.get(timeout=0) for _ in range(3)] == [2, 3, 4]
+    assert q.stats() == {'queued': 0, 'received': 5, 'dropped': 2}
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0)
+
+
+def test_queue_block():
+    q = FrameQueue(maxSize=2, policy='block')
+    q.put(0)
+    q.put(1)
+    received = []
+
+    def consume():
+        time.sleep(0.1)
+        for _ in range(3):
+            received.append(q.get(timeout=1))
+
+    thread = threading.Thread(target=consume)
+    thread.start()
+    assert q.put(2)  # blocks until the consumer makes room
+    thread.join()
+    assert received == [0, 1, 2]
+    assert q.dropped == 0
+
+    # closing releases blocked producers
+    q.put(3)
+    q.put(4)
+    threading.Timer(0.1, q.close).start()
+    assert not q.put(5)
+    assert q.dropped == 3
@@ -0,0 +1,185 @@
+import threading
+import time
+
+import pyqtgraph as pg
+import pytest
+
+from acq4.devices.Camera.Camera import Camera, FrameProcessingThread
+from acq4.devices.Camera.frame_processing import FrameProcessorGraph
+
+
+class Recorder:
+    def __init__(self, name, log, delay=0.0, lock=None):
+        self.name = name
+        self.log = log
+        self.delay = delay
+        self.frames = []
+        self.lock = lock or threading.Lock()
+
+    def __call__(self, frame):
+        time.sleep(self.delay)
+        with self.lock:
+            self.frames.append(frame)
+            self.log.append((self.name, frame))
+
+
+def run_frames(graph, frames, finished, timeout=5.0):
+    for f in frames:
+        graph.submit(f)
+    start = time.time()
+    while len(finished) < len(frames):
+        assert time.time() - start < timeout, "frames were not finished in time"
+        time.sleep(0.005)
+
+
+def test_default_order_and_completion():
+    log = []
+    finished = []
+    graph = FrameProcessorGraph(finished.append)
+    a = Recorder('a', log)
+    b = Recorder('b', log)
+    final = Recorder('final', log)
+    graph.addProcessor(final, final=True)
+    graph.addProcessor(a)
+    graph.addProcessor(b)
+    try:
+        run_frames(graph, range(20), finished)
+    finally:
+        graph.shutdown()
+
+    assert finished == list(range(20))
+    for proc in (a, b, final):
+        assert proc.frames == list(range(20))
+    # with no declared dependencies, processors run in the order they were added, final last
+    for i in range(20):
+        order = [name for name, frame in log if frame == i]
+        assert order == ['a', 'b', 'final']
+
+
+def test_independent_processors_run_concurrently():
+    finished = []
+    graph = FrameProcessorGraph(finished.append, maxWorkers=4)
+    running = []
+    overlap = threading.Event()
+
+    def slow(frame):
+        running.append(frame)
+        if len(running) > 1:
+            overlap.set()
+        time.sleep(0.05)
+        running.remove(frame)
+
+    def slow2(frame):
+        slow(frame)
+
+    graph.addProcessor(slow, dependencies=[])
+    graph.addProcessor(slow2, dependencies=[])
+    try:
+        run_frames(graph, range(3), finished)
+    finally:
+        graph.shutdown()
+    assert overlap.is_set()
+    assert finished == [0, 1, 2]
+
+
+def test_lossy_processor_skips_to_latest():
+    log = []
+    finished = []
+    graph = FrameProcessorGraph(finished.append)
+    record = Recorder('record', log)
+    display = Recorder('display', log, delay=0.05)
+    overlay = Recorder('overlay', log)
+    graph.addProcessor(record, dependencies=[])
+    graph.addProcessor(display, dependencies=[], mayDropFrames=True)
+    graph.addProcessor(overlay, dependencies=[display], mayDropFrames=True)
+    with pytest.raises(ValueError):
+        graph.addProcessor(Recorder('bad', log), dependencies=[display])
+    try:
+        # completion does not wait for the lossy processors
+        run_frames(graph, range(10), finished, timeout=0.4)
+        time.sleep(0.2)
+    finally:
+        graph.shutdown()
+
+    assert record.frames == list(range(10))
+    assert display.frames[0] == 0 and display.frames[-1] == 9
+    assert len(display.frames) < 10
+    assert display.frames == sorted(display.frames)
+    # dependents of a lossy processor skip the same frames
+    assert overlay.frames == display.frames
+
+
+def test_remove_processor():
+    log = []
+    finished = []
+    graph = FrameProcessorGraph(finished.append)
+    a = Recorder('a', log)
+    b = Recorder('b', log)
+    graph.addProcessor(a)
+    graph.addProcessor(b, dependencies=[a])
+    graph.removeProcessor(a)
+    assert graph.processors == [b]
+    try:
+        run_frames(graph, range(3), finished)
+    finally:
+        graph.shutdown()
+    assert b.frames == [0, 1, 2]
+    assert a.frames == []
+
+
+class CameraStandIn:
+    """Just enough of a Camera to register processors through Camera.addFrameProcessor."""
+    addFrameProcessor = Camera.addFrameProcessor
+    removeFrameProcessor = Camera.removeFrameProcessor
+
+    def __init__(self, log):
+        self.log = log
+        self._processingThread = FrameProcessingThread()
+        self._processingThread.addFrameProcessor(self.addFrameInfo)
+
+    def addFrameInfo(self, frame):
+        self.log.append(('info', frame))
+
+
+def test_camera_processors():
+    pg.mkQApp()
+    log = []
+    finished = []
+    cam = CameraStandIn(log)
+    lock = threading.Lock()
+    # the same layout CameraInterface uses: annotate and record every frame, draw only the newest
+    annotate = Recorder('annotate', log, lock=lock)
+    record = Recorder('record', log, lock=lock)
+    display = Recorder('display', log, delay=0.05, lock=lock)
+    cam.addFrameProcessor(annotate, dependencies=[])
+    cam.addFrameProcessor(record, dependencies=[annotate])
+    cam.addFrameProcessor(display, dependencies=[annotate], mayDropFrames=True)
+    thread = cam._processingThread
+    thread.sigFrameFullyProcessed.connect(finished.append)
+    thread.start()
+    try:
+        for i in range(10):
+            thread.handleNewRawFrame(i)
+        start = time.time()
+        while len(finished) < 10:
+            assert time.time() - start < 0.4, "frames waited for the lossy display processor"
+            pg.QtWidgets.QApplication.processEvents()
+            time.sleep(0.005)
+        time.sleep(0.2)
+    finally:
+        thread.stop()
+        thread.wait()
+        pg.disconnect(thread.sigFrameFullyProcessed, finished.append)
+
+    assert finished == list(range(10))
+    assert annotate.frames == record.frames == list(range(10))
+    assert len(display.frames) < 10
+    assert display.frames[-1] == 9
+    for i in range(10):
+        order = [name for name, frame in log if frame == i]
+        # explicit dependencies still run after addFrameInfo
+        assert order[:2] == ['info', 'annotate']
+        assert order.index('record') > 1
+
+    cam.removeFrameProcessor(display)
+    assert display not in thread.processors
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+import scipy.signal
+
+from acq4.devices.NiDAQ.nidaq import NiDAQ
+
+methods = ['subsample', 'mean', 'fourier', 'bessel_mean', 'butterworth_mean']
+
+
+@pytest.mark.parametrize('method', methods)
+def test_downsample_length_and_dc(method):
+    data = np.full(10010, 3.0)
+    out = NiDAQ.downsample(data.copy(), 20, method)
+    assert len(out) in (500, 501)
+    # a constant signal passes through unchanged, including at the edges
+    assert np.allclose(out, 3.0, atol=1e-6)
+
+
+def test_fourier_removes_aliases():
+    sr = 500e3
+    t = np.arange(50000) / sr
+    slow = np.sin(2 * np.pi * 1e3 * t)
+    fast = np.sin(2 * np.pi * 100e3 * t)  # far above the new nyquist frequency (12.5 kHz)
+    out = NiDAQ.downsample(slow + fast, 20, 'fourier')
+    expected = slow[::20]
+    assert np.abs(out - expected)[20:-20].max() < 0.01
+
+
+def test_lowpass_matches_lfilter():
+    data = np.random.normal(size=5000)
+    b, a = scipy.signal.bessel(4, 0.1, btype='low')
+    expected = scipy.signal.filtfilt(b, a, data)
+    out = NiDAQ.lowpass(data, 0.1)
+    # edge handling differs; the interior must agree
+    assert np.allclose(out[200:-200], expected[200:-200], atol=1e-6)
+    assert NiDAQ.lowpass(data, 0.1, bidir=False).shape == data.shape
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        NiDAQ.downsample(np.zeros(100), 2, 'nonsense')
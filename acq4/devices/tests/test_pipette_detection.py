@@ -0,0 +1,69 @@
+import numpy as np
+import scipy.ndimage
+
+from acq4.devices.Pipette.pipette_detection import TemplateMatchPipetteDetector
+from acq4.util.image_registration import iterativeImageTemplateMatch
+
+
+class FakeTracker:
+    def __init__(self, reference):
+        self.ref = reference
+
+    def getReference(self):
+        return self.ref
+
+
+class CountingDetector(TemplateMatchPipetteDetector):
+    nFiltered = 0
+
+    def filterImage(self, img):
+        self.nFiltered += 1
+        return TemplateMatchPipetteDetector.filterImage(self, img)
+
+
+def makeReference(nFrames=9, shape=(64, 48), seed=0):
+    """Generate a z-stack of a random pattern that becomes more blurred with each frame."""
+    rng = np.random.RandomState(seed)
+    pattern = rng.normal(size=shape)
+    frames = np.stack([scipy.ndimage.gaussian_filter(pattern, 0.5 + 0.5 * i) for i in range(nFrames)])
+    return {'frames': frames, 'zStep': 1e-6, 'centerInd': nFrames // 2, 'centerPos': (0, 0), 'pixelSize': (1e-6, 1e-6)}
+
+
+def test_estimate_offset():
+    ref = makeReference()
+    detector = CountingDetector(FakeTracker(ref), pipette=None)
+
+    # place the frame two steps before the center frame into a larger image
+    img = np.random.RandomState(1).normal(size=(128, 128)) * 0.01
+    img[20:84, 40:88] += ref['frames'][2]
+    img = detector.filterImage(img)
+
+    xyOffset, zErr, performance = detector.estimateOffset(img)
+    assert tuple(xyOffset) == (20, 40)
+    assert np.isclose(zErr, -2e-6)
+    assert performance > 0.9
+
+    # same result as matching each reference frame serially
+    match = [iterativeImageTemplateMatch(img, detector.filterImage(f)) for f in ref['frames']]
+    best = match[np.argmax([m[1] for m in match])]
+    assert tuple(best[0]) == tuple(xyOffset) and np.isclose(best[1], performance)
+
+
+def test_reference_cache():
+    ref = makeReference()
+    tracker = FakeTracker(ref)
+    detector = CountingDetector(tracker, pipette=None)
+    img = detector.filterImage(np.pad(ref['frames'][4], 10))
+    detector.nFiltered = 0
+
+    detector.estimateOffset(img)
+    detector.estimateOffset(img)
+    assert detector.nFiltered == len(ref['frames'])
+
+    # new reference frames are filtered again
+    tracker.ref = makeReference(nFrames=5, seed=1)
+    detector.estimateOffset(img)
+    assert detector.nFiltered == len(ref['frames']) + 5
+    detector.clearCache()
+    detector.estimateOffset(img)
+    assert detector.nFiltered == len(ref['frames']) + 10
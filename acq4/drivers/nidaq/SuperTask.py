@@ -163,16 +163,29 @@ class SuperTask:
                     raise
                 self.taskInfo[k]["dataWritten"] = True
 
+    def rearm(self):
+        """Prepare to run again with the same channels, clocks and waveforms. Output waveforms are rewritten
+        from the cached task data when the tasks are next started."""
+        for info in self.taskInfo.values():
+            info["dataWritten"] = False
+        self.result = None
+
     def hasTasks(self):
         return len(self.tasks) > 0
 
-    def configureClocks(self, rate, nPts):
-        """Configure sample clock and triggering for all tasks"""
+    def configureClocks(self, rate, nPts, continuous=False):
+        """Configure sample clock and triggering for all tasks.
+
+        If *continuous* is True, the tasks sample until stopped and *nPts* only sets the size of the driver's
+        buffer; use startStream() to read from them.
+        """
         if len(self.tasks) == 0:
             raise Exception("No tasks to configure.")
         keys = list(self.tasks.keys())
         self.numPts = nPts
         self.rate = rate
+        self.continuous = continuous
+        sampleMode = self.daq.Val_ContSamps if continuous else self.daq.Val_FiniteSamps
 
         # Make sure we're only using 1 DAQ device (not sure how to tie 2 together yet)
         # ndevs = len(set([k[0] for k in keys]))
@@ -219,10 +232,10 @@ class SuperTask:
             if k[1] != clkSource:
                 # print "%s CfgSampClkTiming(%s, %f, Val_Rising, Val_FiniteSamps, %d)" % (str(k), clk, rate, nPts)
 
-                self.tasks[k].CfgSampClkTiming(clk, rate, self.daq.Val_Rising, self.daq.Val_FiniteSamps, nPts)
+                self.tasks[k].CfgSampClkTiming(clk, rate, self.daq.Val_Rising, sampleMode, nPts)
             else:
                 # print "%s CfgSampClkTiming('', %f, Val_Rising, Val_FiniteSamps, %d)" % (str(k), rate, nPts)
-                self.tasks[k].CfgSampClkTiming("", rate, self.daq.Val_Rising, self.daq.Val_FiniteSamps, nPts)
+                self.tasks[k].CfgSampClkTiming("", rate, self.daq.Val_Rising, sampleMode, nPts)
 
     def setTrigger(self, trig):
         # self.tasks[self.clockSource].CfgDigEdgeStartTrig(trig, Val_Rising)
@@ -268,6 +281,22 @@ class SuperTask:
             # Set up callback to record time when trigger starts
             pass
 
+    def startStream(self, blockSize, bufferSize=None, fileName=None):
+        """Start a continuous acquisition (see configureClocks) and return a DataStream that reads *blockSize*
+        samples at a time from all input tasks in a background thread.
+
+        The most recent *bufferSize* samples are kept in memory; if *fileName* is given, all samples are also
+        written to that HDF5 file. Use DataStream.subscribe() to receive blocks as they arrive, and
+        DataStream.stop() to end the acquisition.
+        """
+        if not getattr(self, "continuous", False):
+            raise Exception("Streaming requires clocks configured with continuous=True.")
+        from .stream import DataStream
+
+        stream = DataStream(self, blockSize, bufferSize=bufferSize, fileName=fileName)
+        stream.start()
+        return stream
+
     def isDone(self):
         for t in self.tasks:
             if not self.tasks[t].isDone():
@@ -275,6 +304,18 @@ class SuperTask:
                 return False
         return True
 
+    def waitUntilDone(self, timeout=None):
+        """Block until all tasks are done or *timeout* seconds elapse (None waits forever).
+
+        Return True if all tasks are done.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        for t in self.tasks:
+            remaining = None if deadline is None else max(0.0, deadline - time.time())
+            if not self.tasks[t].waitUntilDone(remaining):
+                return False
+        return True
+
     def read(self):
         data = {}
         for t in self.tasks:
@@ -288,9 +329,7 @@ class SuperTask:
         # need to be very careful about stopping and unreserving all hardware, even if there is a failure at some point.
         try:
             if wait:
-                while not self.isDone():
-                    # print "Sleeping..", time.time()
-                    time.sleep(10e-6)
+                self.waitUntilDone()
 
             if not abort and self.isDone():
                 # data must be read before stopping the task,
@@ -28,6 +28,7 @@ class MockNIDAQ:
         self.Val_Cfg_Default = -1
         self.Val_ChanForAllLines = 1
         self.Val_ChanPerLine = 0
+        self.Val_ContSamps = 10123
         self.Val_Diff = 10106
         self.Val_FiniteSamps = 10178
         self.Val_NRSE = 10078
@@ -173,6 +174,9 @@ class Task:
         self.nativeClock = None
         self.data = None
         self.mode = None
+        self.sampleMode = None
+        self.startTime = None
+        self.samplesRead = 0
 
     # def __getattr__(self, attr):
     #     return lambda *args: self
@@ -197,7 +201,7 @@ class Task:
         self.chOpts.append(kargs)
         self.mode = 'do'
 
-    def CfgSampClkTiming(self, clock, rate, b, c, nPts):
+    def CfgSampClkTiming(self, clock, rate, b, sampleMode, nPts):
         if 'ai' in self.chans[0]:
             self.nativeClock = self.device() + '/ai/SampleClock'
         elif 'ao' in self.chans[0]:
@@ -208,8 +212,12 @@ class Task:
         self.clock = clock
         self.rate = rate
         self.nPts = nPts
+        self.sampleMode = sampleMode
         # print self.chans, self.clock
 
+    def isContinuous(self):
+        return self.sampleMode == self.nd.Val_ContSamps
+
     def GetSampClkMaxRate(self):
         return 2e6
 
@@ -227,39 +235,68 @@ class Task:
 
         return len(data)
 
-    def read(self):
-        dur = self.nPts / self.rate
-        tVals = np.linspace(0, dur, self.nPts)
+    def read(self, samples=None, timeout=10.0, dtype=None, relativeToStart=True):
+        if samples is None:
+            samples = self.nPts
+        if self.isContinuous():
+            # wait until the simulated sample clock has produced the requested samples
+            if not relativeToStart:
+                self.samplesRead += samples
+            wait = self.startTime + self.samplesRead / self.rate - time.time()
+            if wait > timeout:
+                raise Exception("Timed out waiting for %d samples" % samples)
+            if wait > 0:
+                time.sleep(wait)
         if 'd' in self.mode:
-            data = np.empty((len(self.chans), self.nPts), dtype=np.int32)
+            data = np.empty((len(self.chans), samples), dtype=np.int32)
         else:
-            data = np.empty((len(self.chans), self.nPts))
+            data = np.empty((len(self.chans), samples))
 
         for i in range(len(self.chOpts)):
             if 'mockFunc' in self.chOpts[i]:
-                data[i] = self.chOpts[i]['mockFunc'](self.nPts, self.rate)
+                data[i] = self.chOpts[i]['mockFunc'](samples, self.rate)
             else:
                 data[i] = 0
-        return (data, self.nPts)
+        return (data, samples)
 
     def start(self):
+        self.startTime = time.time()
+        self.samplesRead = 0
+        if self.isContinuous():
+            return
         # only start clock if it matches the native clock for this channel
         if self.clock is None or self.clock == self.nativeClock:
             dur = self.nPts / self.rate
             self.nd.startClock(self.nativeClock, dur)
 
     def stop(self):
+        if self.isContinuous():
+            return
         if self.clock is None:
             self.nd.stopClock(self.nativeClock)
         else:
             self.nd.stopClock(self.clock)
 
     def isDone(self):
+        if self.isContinuous():
+            return False
         if self.clock is None:
             return self.nd.checkClock(self.nativeClock)
         else:
             return self.nd.checkClock(self.clock)
 
+    def waitUntilDone(self, timeout=None):
+        if self.isContinuous():
+            remaining = float('inf')
+        else:
+            start, dur = self.nd.clocks[self.nativeClock if self.clock is None else self.clock]
+            remaining = start + dur - time.time()
+        if timeout is not None:
+            remaining = min(remaining, timeout)
+        if remaining > 0:
+            time.sleep(remaining)
+        return self.isDone()
+
     def GetTaskNumChans(self):
         return len(self.chans)
 
@@ -266,7 +266,23 @@ class Task:
     def isDone(self):
         return self.IsTaskDone()
 
-    def read(self, samples=None, timeout=10.0, dtype=None):
+    def waitUntilDone(self, timeout=None):
+        """Block until the task is done or *timeout* seconds elapse (None waits forever).
+
+        Return True if the task is done.
+        """
+        try:
+            self.WaitUntilTaskDone(-1.0 if timeout is None else timeout)
+        except PyDAQmx.DAQError as exc:
+            if getattr(exc, 'code', None) != PyDAQmx.DAQmxErrorWaitUntilDoneDoesNotIndicateDone:
+                raise
+            return False
+        return True
+
+    def read(self, samples=None, timeout=10.0, dtype=None, relativeToStart=True):
+        """Read *samples* samples per channel. By default, reading starts from the first sample acquired; with
+        *relativeToStart* False it continues from the current read position, as needed for continuous tasks.
+        """
         # reqSamps = samples
         # if samples is None:
         #    samples = self.GetSampQuantSampPerChan()
@@ -317,8 +333,11 @@ class Task:
 
         fName += dataTypeConversions[np.dtype(dtype).descr[0][1]]
 
-        self.SetReadRelativeTo(PyDAQmx.Val_FirstSample)
-        self.SetReadOffset(0)
+        if relativeToStart:
+            self.SetReadRelativeTo(PyDAQmx.Val_FirstSample)
+            self.SetReadOffset(0)
+        else:
+            self.SetReadRelativeTo(PyDAQmx.Val_CurrReadPos)
 
         nPts = getattr(self, fName)(reqSamps, timeout, PyDAQmx.Val_GroupByChannel, buf, buf.size, None)
         return buf, nPts
@@ -0,0 +1,231 @@
+import queue
+import threading
+
+import numpy as np
+
+from acq4.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class StreamBlock:
+    """One block of samples read from the input tasks of a streaming SuperTask.
+
+    Attributes
+    ----------
+    index : int
+        Index of the first sample in the block, counted from the start of the stream.
+    time : float
+        Time of the first sample.
+    data : dict
+        Maps each input task key (dev, typ) to an array of shape (nChannels, nSamples).
+    """
+
+    def __init__(self, superTask, index, time, data):
+        self.superTask = superTask
+        self.index = index
+        self.time = time
+        self.data = data
+
+    def __len__(self):
+        return next(iter(self.data.values())).shape[1] if self.data else 0
+
+    def channel(self, chan):
+        """Return the samples for a single channel."""
+        info = self.superTask.channelInfo[self.superTask.absChanName(chan)]
+        return self.data[info["task"]][info["index"]]
+
+
+class StreamSubscription:
+    """Iterable of the StreamBlocks delivered by a DataStream, as returned by DataStream.subscribe().
+
+    If the subscriber does not keep up, the oldest unread blocks are discarded and counted in ``dropped``.
+    Iteration ends when the stream stops or the subscription is closed.
+    """
+
+    _END = object()
+
+    def __init__(self, stream, maxBlocks):
+        self.stream = stream
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=maxBlocks)
+        self._closed = False
+
+    def _put(self, block):
+        while True:
+            try:
+                self._queue.put_nowait(block)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    if block is not self._END:
+                        self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Return the next block, or None if the stream has ended. Raises queue.Empty on timeout."""
+        if self._closed:
+            return None
+        block = self._queue.get(timeout=timeout)
+        if block is self._END:
+            self._closed = True
+            return None
+        return block
+
+    def __iter__(self):
+        while True:
+            block = self.get()
+            if block is None:
+                return
+            yield block
+
+    def close(self):
+        self.stream._unsubscribe(self)
+        self._put(self._END)
+
+
+class DataStream:
+    """Continuous acquisition from a SuperTask, as returned by SuperTask.startStream().
+
+    A background thread reads *blockSize* samples at a time from every input task. Each block is stored in a
+    ring buffer holding the most recent *bufferSize* samples (see latest()), delivered to all subscribers (see
+    subscribe()), and optionally appended to an HDF5 file with one dataset per input task.
+    """
+
+    def __init__(self, superTask, blockSize, bufferSize=None, fileName=None, timeout=10.0):
+        self.superTask = superTask
+        self.blockSize = int(blockSize)
+        self.bufferSize = int(bufferSize or 100 * self.blockSize)
+        if self.bufferSize < self.blockSize:
+            raise ValueError("Stream buffer must hold at least one block.")
+        self.fileName = fileName
+        self.timeout = timeout
+        self.samplesRead = 0
+        self.error = None
+        self.startTime = None
+
+        self._keys = [k for k, t in superTask.tasks.items() if t.isInputTask()]
+        if len(self._keys) == 0:
+            raise Exception("No input tasks to stream from.")
+        self._buffers = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stopEvent = threading.Event()
+        self._file = None
+        self._datasets = {}
+        self._thread = threading.Thread(target=self._run, name="NiDAQStream", daemon=True)
+
+    def start(self):
+        if self.fileName is not None:
+            self._openFile()
+        self.superTask.start()
+        self.startTime = self.superTask.startTime
+        self._thread.start()
+
+    def isRunning(self):
+        return self._thread.is_alive()
+
+    def subscribe(self, maxBlocks=100) -> StreamSubscription:
+        """Return a new subscription that receives every block read from now on."""
+        sub = StreamSubscription(self, maxBlocks)
+        with self._lock:
+            if self._thread.ident is not None and not self._thread.is_alive():
+                sub._put(sub._END)
+            else:
+                self._subscribers.append(sub)
+        return sub
+
+    def _unsubscribe(self, sub):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def latest(self, nSamples=None):
+        """Return the most recent *nSamples* (default: all buffered samples) from the ring buffer as a dict
+        mapping task keys to arrays of shape (nChannels, n)."""
+        with self._lock:
+            n = min(self.samplesRead, self.bufferSize)
+            if nSamples is not None:
+                n = min(n, nSamples)
+            end = self.samplesRead % self.bufferSize
+            idx = np.arange(end - n, end) % self.bufferSize
+            return {k: buf[:, idx] for k, buf in self._buffers.items()}
+
+    def stop(self):
+        """Stop acquisition and wait for the reader thread to exit. Returns the file name, if any."""
+        self._stopEvent.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        return self.fileName
+
+    def _openFile(self):
+        import h5py
+
+        self._file = h5py.File(self.fileName, "w")
+        self._file.attrs["rate"] = self.superTask.rate
+        for key in self._keys:
+            chans = self.superTask.taskInfo[key]["chans"]
+            name = "%s_%s" % key
+            ds = self._file.create_dataset(
+                name, shape=(len(chans), 0), maxshape=(len(chans), None), chunks=(len(chans), self.blockSize),
+                dtype=self._dtype(key),
+            )
+            ds.attrs["channels"] = chans
+            self._datasets[key] = ds
+
+    def _dtype(self, key):
+        return np.float64 if key[1] == "ai" else np.uint32
+
+    def _run(self):
+        try:
+            while not self._stopEvent.is_set():
+                data = {}
+                for key in self._keys:
+                    d, n = self.superTask.tasks[key].read(self.blockSize, timeout=self.timeout, relativeToStart=False)
+                    data[key] = d[:, :n]
+                self._store(data)
+        except Exception as exc:
+            self.error = exc
+            logger.exception("Error while streaming from DAQ")
+        finally:
+            try:
+                self.superTask.stop(abort=True)
+            finally:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                with self._lock:
+                    subs, self._subscribers = self._subscribers, []
+                for sub in subs:
+                    sub._put(sub._END)
+
+    def _store(self, data):
+        n = min(d.shape[1] for d in data.values())
+        if n == 0:
+            return
+        with self._lock:
+            index = self.samplesRead
+            for key, d in data.items():
+                buf = self._buffers.get(key)
+                if buf is None:
+                    buf = np.empty((d.shape[0], self.bufferSize), dtype=d.dtype)
+                    self._buffers[key] = buf
+                start = index % self.bufferSize
+                first = min(n, self.bufferSize - start)
+                buf[:, start:start + first] = d[:, :first]
+                buf[:, :n - first] = d[:, first:n]
+            self.samplesRead += n
+            subs = list(self._subscribers)
+
+        for key, ds in self._datasets.items():
+            ds.resize(index + n, axis=1)
+            ds[:, index:index + n] = data[key][:, :n]
+
+        block = StreamBlock(
+            self.superTask, index, self.startTime + index / self.superTask.rate,
+            {k: d[:, :n] for k, d in data.items()},
+        )
+        for sub in subs:
+            sub._put(block)
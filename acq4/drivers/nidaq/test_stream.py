@@ -0,0 +1,78 @@
+import h5py
+import numpy as np
+import pytest
+
+from acq4.drivers.nidaq.mock import MockNIDAQ
+
+
+def ramp(nPts, rate):
+    ramp.count += nPts
+    return np.arange(ramp.count - nPts, ramp.count, dtype=float)
+
+
+def make_stream_task():
+    daq = MockNIDAQ()
+    st = daq.createSuperTask()
+    ramp.count = 0
+    st.addChannel("/Dev1/ai0", "ai", mockFunc=ramp)
+    st.addChannel("/Dev1/ai1", "ai")
+    return st
+
+
+def test_stream_blocks_and_ring_buffer(tmp_path):
+    st = make_stream_task()
+    st.configureClocks(20000.0, 1000)
+    with pytest.raises(Exception):
+        st.startStream(100)
+    st.configureClocks(20000.0, 1000, continuous=True)
+
+    fileName = str(tmp_path / "stream.h5")
+    stream = st.startStream(100, bufferSize=250, fileName=fileName)
+    sub = stream.subscribe()
+    blocks = []
+    for block in sub:
+        blocks.append(block)
+        if len(blocks) == 5:
+            break
+    stream.stop()
+    assert not stream.isRunning()
+    assert stream.error is None
+
+    for block in blocks:
+        assert len(block) == 100
+        assert block.index % 100 == 0
+        assert np.all(block.channel("/Dev1/ai0") == np.arange(block.index, block.index + 100))
+        assert np.all(block.channel("ai1") == 0)
+    assert [b.index for b in blocks] == sorted(b.index for b in blocks)
+
+    # the ring buffer holds the most recent samples, in order
+    total = stream.samplesRead
+    latest = stream.latest()[("Dev1", "ai")]
+    assert latest.shape == (2, 250)
+    assert np.all(latest[0] == np.arange(total - 250, total))
+    assert np.all(stream.latest(10)[("Dev1", "ai")][0] == np.arange(total - 10, total))
+
+    # all samples were written to disk
+    with h5py.File(fileName, "r") as f:
+        data = f["Dev1_ai"][:]
+        assert data.shape == (2, total)
+        assert np.all(data[0] == np.arange(total))
+        assert f.attrs["rate"] == 20000.0
+
+    # the subscription ends once the stream has stopped
+    assert all(b.index > blocks[-1].index for b in list(sub))
+    assert stream.subscribe().get(timeout=1) is None
+
+
+def test_slow_subscriber_drops_oldest():
+    st = make_stream_task()
+    st.configureClocks(100000.0, 1000, continuous=True)
+    stream = st.startStream(100)
+    sub = stream.subscribe(maxBlocks=2)
+    fast = stream.subscribe()
+    blocks = [fast.get(timeout=1) for _ in range(6)]
+    stream.stop()
+    assert [b.index for b in blocks] == [i * 100 for i in range(6)]
+    assert sub.dropped > 0
+    remaining = list(sub)
+    assert len(remaining) <= 2
@@ -3,6 +3,7 @@ from __future__ import annotations
 import json
 import os
 import re
+from collections.abc import Mapping
 from typing import Any
 
 import h5py
@@ -11,12 +12,15 @@ import numpy as np
 import pyqtgraph as pg
 from pyqtgraph.units import GΩ, MΩ
 from acq4.filetypes.FileType import FileType
+from acq4.logging_config import get_logger
 from acq4.util import Qt
 from acq4.util.functions import plottable_booleans
 from acq4.util.target import Target
 from neuroanalysis.test_pulse import PatchClampTestPulse
 from neuroanalysis.test_pulse_stack import H5BackedTestPulseStack
 
+logger = get_logger(__name__)
+
 TEST_PULSE_METAARRAY_INFO = [
     {'name': 'event_time', 'type': 'float', 'units': 's'},
     {'name': 'baseline_potential', 'type': 'float', 'units': 'V'},
@@ -54,13 +58,15 @@ for info in TEST_PULSE_METAARRAY_INFO:
 class IrregularTimeSeries(object):
     """An irregularly-sampled time series.
 
-    Allows efficient retrieval of the series value at any time using a lookup table.
-    Intended for cases where the lookup table would be reasonably-sized (for example,
-    an hour of events indexed at 1-second resolution). For larger data sets, a
-    b-tree would be a more reasonable approach.
+    Times and values are stored in numpy arrays that grow by doubling, and lookups use a binary search,
+    so both appending and retrieving values take (amortized) constant or logarithmic time. Many times
+    can be looked up at once with values_at().
 
     If enabled, values are interpolated linearly. Values may be of any type,
     but only scalar, array, and tuple-of-scalar types may be interpolated.
+    Values are returned as they were given (rows of an array passed to extendArrays() become tuples).
+    Numeric values (scalars, or sequences of scalars that all have the same length) are also kept in a
+    float array so that values_at() and interpolation can work on all of them at once.
 
     Example::
 
@@ -76,16 +82,22 @@ class IrregularTimeSeries(object):
         series[5.0]   # returns None because the series begins at 10.0
         series[14.0]  # returns 0.6; interpolated between 2nd and 3rd timepoints
         series[50]    # returns 1.2; the last value in the time series
+
+        # Look up many times at once
+        series.values_at([5.0, 14.0, 50])  # returns array([nan, 0.6, 1.2])
     """
 
     def __init__(self, data=None, interpolate=False, resolution=1.0):
         self.interpolate = interpolate
+        # no longer used; lookups do not need an index table
         self._resolution = resolution
 
-        self.events = []
-        # each value maps a time in seconds to the index of the value recorded immediately after the time
-        self.index = []
-        self._startTime = None
+        self._len = 0
+        self._times = np.empty(0, dtype=float)
+        self._objects = []  # the values as given
+        # float copy of the values (1D for scalars, 2D for sequences); None once a non-numeric value is added
+        self._values = None
+        self._numeric = True
 
         if data is not None:
             self.extend(data)
@@ -96,59 +108,130 @@ class IrregularTimeSeries(object):
         Points in the series must be added in increasing chronological order.
         It is allowed to add multiple values for the same time point.
         """
-        if len(self.events) > 0 and time < self.events[-1][0]:
+        self.extendArrays([time], [value])
+
+    def extend(self, data):
+        data = list(data)
+        if len(data) == 0:
+            return
+        times, values = zip(*data)
+        self.extendArrays(times, values)
+
+    def extendArrays(self, times, values):
+        """Append the values in *values* at the corresponding *times*.
+
+        *values* may be a sequence of values or an array whose first axis matches *times*.
+        """
+        times = np.asarray(times, dtype=float).reshape(-1)
+        if len(times) == 0:
+            return
+        if len(times) != len(values):
+            raise ValueError("times and values must have the same length.")
+        if np.any(np.diff(times) < 0) or (self._len > 0 and times[0] < self._times[self._len - 1]):
             raise ValueError("Time points must be added in increasing order.")
 
-        if self._startTime is None:
-            self._startTime = time
-        i = self._getIndex(time)
+        numeric = self._asNumeric(values)
+        if numeric is None:
+            # no longer purely numeric; only the values as given are kept
+            self._numeric = False
+            self._values = None
+        elif self._values is None:
+            self._values = np.empty((0,) + numeric.shape[1:], dtype=float)
+
+        n = self._len + len(times)
+        if n > len(self._times):
+            capacity = max(n, 2 * len(self._times), 16)
+            self._times = self._grow(self._times, capacity)
+            if isinstance(self._values, np.ndarray):
+                self._values = self._grow(self._values, capacity)
+        self._times[self._len:n] = times
+        if self._numeric:
+            self._values[self._len:n] = numeric
+        if isinstance(values, np.ndarray):
+            self._objects.extend(values.tolist() if values.ndim == 1 else map(tuple, values.tolist()))
+        else:
+            self._objects.extend(values)
+        self._len = n
 
-        # Extend index
-        dif = i + 1 - len(self.index)
-        if dif > 0:
-            self.index.extend([len(self.events)] * dif)
-        self.index[i] = len(self.events)
+    def _asNumeric(self, values):
+        """Return *values* as a float array matching the existing storage, or None if that is not possible."""
+        if not self._numeric:
+            return None
+        if isinstance(values, np.ndarray) and values.dtype.kind not in 'biuf':
+            return None
+        if not isinstance(values, np.ndarray) and any(isinstance(v, (str, bytes)) or v is None for v in values):
+            return None
+        try:
+            arr = np.asarray(values, dtype=float)
+        except (TypeError, ValueError):
+            return None
+        if arr.ndim not in (1, 2):
+            return None
+        if self._values is not None and arr.shape[1:] != self._values.shape[1:]:
+            return None
+        return arr
 
-        self.events.append((float(time), value))
+    @staticmethod
+    def _grow(arr, capacity):
+        grown = np.empty((capacity,) + arr.shape[1:], dtype=arr.dtype)
+        grown[:len(arr)] = arr
+        return grown
 
-    def extend(self, data):
-        for t, v in data:
-            self[t] = v
+    def _value(self, i):
+        return self._objects[i]
 
     def __getitem__(self, time):
         """Return the value of this series at the given time.
         """
-        events = self.events
-        if len(events) == 0:
+        n = self._len
+        if n == 0:
             return None
-        if time <= self._startTime:
+        times = self._times
+        if time <= times[0]:
             return None
-        if time >= events[-1][0]:
-            return events[-1][1]
-
-        # Use index to find a nearby event
-        i = self.index[min(self._getIndex(time), len(self.index) - 1)]
-
-        if events[i][0] > time:
-            # walk backward to the requested event
-            while self.events[i][0] > time:
-                i -= 1
-        elif events[i][0] < time:
-            # walk forward to the requested event
-            while i + 1 < len(self.events) and self.events[i + 1][0] <= time:
-                i += 1
-        else:
-            return events[i][1]
+        if time >= times[n - 1]:
+            return self._value(n - 1)
+
+        # index of the last event at or before the requested time
+        i = int(np.searchsorted(times[:n], time, side='right')) - 1
 
         # interpolate if requested
-        if not self.interpolate:
-            return events[i][1]
-        t1, v1 = events[i]
-        t2, v2 = events[i + 1]
-        return self._interpolate(time, v1, v2, t1, t2)
+        if not self.interpolate or times[i] == time:
+            return self._value(i)
+        return self._interpolate(time, self._value(i), self._value(i + 1), times[i], times[i + 1])
+
+    def values_at(self, times):
+        """Return the values of this series at each of *times*, as with ``series[t]``.
 
-    def _getIndex(self, t):
-        return int((t - self._startTime) / self._resolution)
+        For numeric series, the result is a float array with one row per time (NaN where the series has no
+        value); otherwise it is a list with None where the series has no value.
+        """
+        times = np.asarray(times, dtype=float)
+        n = self._len
+        if n == 0:
+            return [None] * times.size
+        seriesTimes = self._times[:n]
+        before = times <= seriesTimes[0]
+        i = np.clip(np.searchsorted(seriesTimes, times, side='right') - 1, 0, n - 1)
+
+        if not self._numeric:
+            if self.interpolate:
+                return [self[t] for t in times.tolist()]
+            return [None if b else self._objects[j] for b, j in zip(before.tolist(), i.tolist())]
+
+        values = self._values[:n]
+        out = values[i]
+        if self.interpolate:
+            j = np.minimum(i + 1, n - 1)
+            t1 = seriesTimes[i]
+            t2 = seriesTimes[j]
+            mask = (t1 != times) & (t2 != t1)
+            s = (times[mask] - t1[mask]) / (t2[mask] - t1[mask])
+            if out.ndim > 1:
+                s = s[:, np.newaxis]
+            out[mask] = values[i[mask]] * (1.0 - s) + values[j[mask]] * s
+        out[before] = np.nan
+        return out
 
     @staticmethod
     def _interpolate(t, v1, v2, t1, t2):
@@ -159,123 +242,423 @@ class IrregularTimeSeries(object):
         else:
             return v1 * (1.0 - s) + v2 * s
 
+    @property
+    def events(self):
+        """List of the (time, value) pairs in the series."""
+        return [(float(self._times[i]), self._value(i)) for i in range(self._len)]
+
     def times(self):
-        """Return a list of the time points in the series.
+        """Return an array of the time points in the series.
         """
-        return [ev[0] for ev in self.events]
+        return self._times[:self._len].copy()
 
     def values(self):
         """Return a list of the values at each point in the series.
         """
-        return [ev[1] for ev in self.events]
+        return list(self._objects)
 
     def firstValue(self):
-        if len(self.events) == 0:
+        if self._len == 0:
             return None
         else:
-            return self.events[0][1]
+            return self._value(0)
 
     def lastValue(self):
-        if len(self.events) == 0:
+        if self._len == 0:
             return None
         else:
-            return self.events[-1][1]
+            return self._value(self._len - 1)
 
     def firstTime(self):
-        if len(self.events) == 0:
+        if self._len == 0:
             return None
         else:
-            return self.events[0][0]
+            return float(self._times[0])
 
     def lastTime(self):
-        if len(self.events) == 0:
+        if self._len == 0:
             return None
         else:
-            return self.events[-1][0]
+            return float(self._times[self._len - 1])
+
+    def __len__(self):
+        return self._len
+
+
+_INDEX_MAGIC = b"ACQ4-MPLOG-INDEX\n"
+_INDEX_VERSION = 1
+_INDEX_ALIGN = 64
+_BOOL_FIELDS = ('clean', 'broken', 'active', 'enabled')
+_EVENT_DTYPE = [('time', float), ('event', 'U32'), ('bool', 'bool')]
+_PRESSURE_DTYPE = [('time', float), ('pressure', float), ('source', 'U32')]
+# column holding the event time for each indexed array, used for time-range queries
+_TIME_COLUMNS = {
+    'event': 'time',
+    'event_offset': None,  # aligned with 'event'
+    'position': 0,
+    'pressure': 'time',
+    'state': 'time',
+    'auto_bias_change': 0,
+    'target': 0,
+    'test_pulse': 'event_time',
+    'full_test_pulse': None,  # aligned with 'test_pulse'
+}
+
+
+def indexFileName(filename: str) -> str:
+    """Return the name of the (hidden) index file that accompanies the log file *filename*."""
+    dirname, basename = os.path.split(filename)
+    return os.path.join(dirname, f".{basename}.idx")
+
+
+def _possibleUsesForType(event_type: str) -> list[str]:
+    uses = ['event']
+    if event_type in {'pipette_transform_changed', 'move_start', 'move_stop'}:
+        uses.append('position')
+    if event_type in {'pressure_changed'}:
+        uses.append('pressure')
+    if event_type in {'state_change', 'state_event'}:
+        uses.append('state')
+    if event_type in {'auto_bias_change'}:
+        uses.append('auto_bias_change')
+    if event_type in {'target_changed'}:
+        uses.append('target')
+    # currently ignored:
+    # if event_type in {'move_requested'}:
+    #     uses.append('move_request')
+    if event_type in {'test_pulse'}:
+        uses += ['test_pulse', 'full_test_pulse']
+    return uses
+
+
+def _stringDtype(values, kind='U', minLength=1):
+    return f"{kind}{max([len(v) for v in values] + [minLength])}"
+
+
+def _buildIndex(filename: str) -> tuple[dict, dict[str, dict[str, np.ndarray]]]:
+    """Parse a MultiPatch log one line at a time and return (info, arrays).
+
+    *arrays* maps each device to its per-use columnar arrays, stably sorted by event time. Only the fields
+    needed for each use are kept while parsing, so memory use is proportional to the size of the arrays
+    rather than the size of the parsed JSON.
+    """
+    rows: dict[str, dict[str, list]] = {}
+    minTime = maxTime = None
+    with open(filename, 'rb') as fh:
+        offset = 0
+        for line in fh:
+            lineOffset = offset
+            offset += len(line)
+            line = line.rstrip(b',\r\n')
+            if not line:
+                continue
+            event = json.loads(line)
+            event_time = float(event['event_time'])
+            minTime = event_time if minTime is None else min(minTime, event_time)
+            maxTime = event_time if maxTime is None else max(maxTime, event_time)
+            devRows = rows.setdefault(event['device'], {})
+            for use in _possibleUsesForType(event['event']):
+                devRows.setdefault(use, []).append(MultiPatchLogData._prepare_event_for_use(event, use))
+            devRows.setdefault('event_offset', []).append(lineOffset)
+
+    arrays = {}
+    for dev, devRows in rows.items():
+        arrays[dev] = devArrays = {}
+        for use in _TIME_COLUMNS:
+            values = devRows.get(use, [])
+            if use == 'event':
+                arr = np.array(values, dtype=_EVENT_DTYPE)
+            elif use == 'event_offset':
+                arr = np.array(values, dtype=np.int64)
+            elif use == 'pressure':
+                arr = np.array(values, dtype=_PRESSURE_DTYPE)
+            elif use == 'state':
+                values = [(t, str(state), str(info)) for t, state, info in values]
+                dtype = [
+                    ('time', float),
+                    ('state', _stringDtype([str(v[1]) for v in values])),
+                    ('info', _stringDtype([str(v[2]) for v in values])),
+                ]
+                arr = np.array(values, dtype=dtype)
+            elif use == 'test_pulse':
+                arr = np.array(values, dtype=TEST_PULSE_NUMPY_DTYPE)
+            elif use == 'full_test_pulse':
+                values = [(v or '').encode('utf8') for v in values]
+                arr = np.array(values, dtype=_stringDtype(values, kind='S'))
+            else:
+                width = {'position': 4, 'auto_bias_change': 2, 'target': 4}[use]
+                arr = np.array(values, dtype=float).reshape(len(values), width)
+            devArrays[use] = arr
+        # sort by time (events from different threads may be logged slightly out of order)
+        for use, column in _TIME_COLUMNS.items():
+            if column is None:
+                continue
+            times = devArrays[use][column] if isinstance(column, str) else devArrays[use][:, column]
+            order = np.argsort(times, kind='stable')
+            if np.any(order != np.arange(len(order))):
+                devArrays[use] = devArrays[use][order]
+                if use == 'event':
+                    devArrays['event_offset'] = devArrays['event_offset'][order]
+                elif use == 'test_pulse':
+                    devArrays['full_test_pulse'] = devArrays['full_test_pulse'][order]
+
+    return {'minTime': minTime, 'maxTime': maxTime}, arrays
+
+
+def _sourceStamp(filename: str) -> dict:
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _writeIndex(indexFile: str, source: dict, info: dict, arrays: dict[str, dict[str, np.ndarray]]) -> None:
+    """Atomically write *arrays* to *indexFile*.
+
+    The file holds a magic line, the header length (uint64, little endian), a JSON header and the raw array
+    data, each array aligned to 64 bytes. The header records the size and modification time of the log file
+    that was indexed, and the dtype, shape and file offset of each array.
+    """
+    layout = {}
+    offset = 0
+    for dev, devArrays in arrays.items():
+        layout[dev] = {}
+        for use, arr in devArrays.items():
+            offset = -(-offset // _INDEX_ALIGN) * _INDEX_ALIGN
+            layout[dev][use] = {
+                'dtype': np.lib.format.dtype_to_descr(arr.dtype),
+                'shape': arr.shape,
+                'offset': offset,
+            }
+            offset += arr.nbytes
+    header = json.dumps({
+        'version': _INDEX_VERSION, 'source': source, **info, 'arrays': layout,
+    }).encode('utf8')
+    dataStart = len(_INDEX_MAGIC) + 8 + len(header)
+    dataStart = -(-dataStart // _INDEX_ALIGN) * _INDEX_ALIGN
+
+    tmpFile = f"{indexFile}.{os.getpid()}.tmp"
+    try:
+        with open(tmpFile, 'wb') as fh:
+            fh.write(_INDEX_MAGIC)
+            fh.write(np.uint64(len(header)).astype('<u8').tobytes())
+            fh.write(header)
+            for dev, devArrays in arrays.items():
+                for use, arr in devArrays.items():
+                    fh.seek(dataStart + layout[dev][use]['offset'])
+                    fh.write(np.ascontiguousarray(arr).tobytes())
+        os.replace(tmpFile, indexFile)
+    finally:
+        if os.path.exists(tmpFile):
+            os.remove(tmpFile)
+
+
+def _readIndex(indexFile: str, source: dict) -> tuple[dict, dict[str, dict[str, np.ndarray]]] | None:
+    """Memory-map the arrays in *indexFile*, or return None if the index is missing, unreadable, or does
+    not match *source*.
+
+    Arrays are mapped copy-on-write so that callers may modify them without touching the file.
+    """
+    try:
+        with open(indexFile, 'rb') as fh:
+            if fh.read(len(_INDEX_MAGIC)) != _INDEX_MAGIC:
+                return None
+            headerLength = int(np.frombuffer(fh.read(8), dtype='<u8')[0])
+            header = json.loads(fh.read(headerLength))
+    except (OSError, ValueError, IndexError):
+        return None
+    if header.get('version') != _INDEX_VERSION or header.get('source') != source:
+        return None
+    dataStart = len(_INDEX_MAGIC) + 8 + headerLength
+    dataStart = -(-dataStart // _INDEX_ALIGN) * _INDEX_ALIGN
+
+    arrays = {}
+    for dev, layout in header['arrays'].items():
+        arrays[dev] = {}
+        for use, spec in layout.items():
+            dtype = np.lib.format.descr_to_dtype(spec['dtype'])
+            shape = tuple(spec['shape'])
+            if int(np.prod(shape)) == 0:
+                arr = np.zeros(shape, dtype=dtype)
+            else:
+                arr = np.memmap(indexFile, dtype=dtype, mode='c', offset=dataStart + spec['offset'], shape=shape)
+            arrays[dev][use] = arr
+    return {'minTime': header['minTime'], 'maxTime': header['maxTime']}, arrays
+
+
+class MultiPatchDeviceLog(Mapping):
+    """Read-only mapping of the logged data for one device, as returned by ``MultiPatchLogData[dev]``.
+
+    Keys are 'position' (time, x, y, z), 'event', 'pressure', 'state' (list of (time, state, info) tuples),
+    'auto_bias_change' (time, target), 'target' (time, x, y, z), 'test_pulse', 'full_test_pulse' (list of
+    "file:path" locations, or None), 'event_offset' (byte offset in the log of each entry in 'event'), and
+    'position_ITS' (an interpolating IrregularTimeSeries of the positions). All are sorted by time. The list
+    and time series values are only built when first requested.
+    """
+
+    _derived = ('position_ITS', 'state', 'full_test_pulse')
+
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        self._arrays = arrays
+        self._cache = {}
+
+    def __getitem__(self, key):
+        if key not in self._derived:
+            return self._arrays[key]
+        if key not in self._cache:
+            if key == 'position_ITS':
+                position = self._arrays['position']
+                self._cache[key] = IrregularTimeSeries(interpolate=True)
+                self._cache[key].extendArrays(position[:, 0], position[:, 1:])
+            elif key == 'state':
+                self._cache[key] = [(float(t), str(s), str(i)) for t, s, i in self._arrays['state']]
+            elif key == 'full_test_pulse':
+                self._cache[key] = [loc.decode('utf8') or None for loc in self._arrays['full_test_pulse'].tolist()]
+        return self._cache[key]
+
+    def __iter__(self):
+        yield 'position_ITS'
+        yield from self._arrays
 
     def __len__(self):
-        return len(self.events)
+        return len(self._arrays) + 1
+
+    def array(self, key) -> np.ndarray:
+        """Return the underlying array for *key* (unlike ``self[key]``, 'state' and 'full_test_pulse' are
+        returned as structured / byte-string arrays)."""
+        return self._arrays[key]
+
+    def slice(self, start=None, stop=None) -> MultiPatchDeviceLog:
+        """Return the entries with ``start <= time < stop``. Either bound may be None."""
+        arrays = {}
+        for use, column in _TIME_COLUMNS.items():
+            if column is None:
+                continue
+            arr = self._arrays[use]
+            times = arr[column] if isinstance(column, str) else arr[:, column]
+            i0 = 0 if start is None else np.searchsorted(times, start, side='left')
+            i1 = len(times) if stop is None else np.searchsorted(times, stop, side='left')
+            arrays[use] = arr[i0:i1]
+            if use == 'event':
+                arrays['event_offset'] = self._arrays['event_offset'][i0:i1]
+            elif use == 'test_pulse':
+                arrays['full_test_pulse'] = self._arrays['full_test_pulse'][i0:i1]
+        return MultiPatchDeviceLog(arrays)
 
 
 class MultiPatchLogData(object):
-    def __init__(self, filename=None):
-        self._devices = {}
+    """Data read from a MultiPatch event log.
+
+    The first time a log is opened, it is parsed once and a compact columnar index is saved next to it (see
+    indexFileName()). Later opens memory-map that index instead of parsing the log again; the index is
+    rebuilt whenever the size or modification time of the log changes. If the index cannot be written, the
+    data is kept in memory instead.
+
+    Parameters
+    ----------
+    filename : str | None
+        Log file to read.
+    useIndex : bool
+        If False, neither read nor write the index file.
+    """
+
+    def __init__(self, filename=None, useIndex=True):
+        self._devices: dict[str, MultiPatchDeviceLog] = {}
         self.fullTestPulseStacks: dict[str, H5BackedTestPulseStack] = {}
+        self._filename = None
         self._minTime = None
         self._maxTime = None
 
         if filename is not None:
-            self.process(filename)
-
-    def process(self, filename) -> None:
-        def possible_uses_for_type(event_type: str) -> list[str]:
-            uses = ['event']
-            if event_type in {'pipette_transform_changed', 'move_start', 'move_stop'}:
-                uses.append('position')
-            if event_type in {'pressure_changed'}:
-                uses.append('pressure')
-            if event_type in {'state_change', 'state_event'}:
-                uses.append('state')
-            if event_type in {'auto_bias_change'}:
-                uses.append('auto_bias_change')
-            if event_type in {'target_changed'}:
-                uses.append('target')
-            # currently ignored:
-            # if event_type in {'move_requested'}:
-            #     uses.append('move_request')
-            if event_type in {'test_pulse'}:
-                uses += ['test_pulse', 'full_test_pulse']
-            return uses
-
-        with open(filename, 'rb') as fh:
-            events: list[dict[str, Any]] = [json.loads(line.rstrip(b',\r\n')) for line in fh]
-
-            events_by_dev_and_use = {}
-            bool_fields = ('clean', 'broken', 'active', 'enabled')
-            for ev in events:
-                is_true = [ev[f] for f in bool_fields if f in ev]
-                ev["is_true"] = not is_true or any(is_true)  # empty should mean True
-                for use in possible_uses_for_type(ev['event']):
-                    events_by_dev_and_use.setdefault(ev['device'], {}).setdefault(use, [])
-                    events_by_dev_and_use[ev['device']][use].append(ev)
-            for dev in events_by_dev_and_use:
-                self._devices[dev] = self._initial_data_structures(events_by_dev_and_use[dev])
-                for use in events_by_dev_and_use[dev]:
-                    for i, event in enumerate(events_by_dev_and_use[dev][use]):
-                        if self._minTime is None or event['event_time'] < self._minTime:
-                            self._minTime = event['event_time']
-                        if self._maxTime is None or event['event_time'] > self._maxTime:
-                            self._maxTime = event['event_time']
-                        self._devices[dev][use][i] = self._prepare_event_for_use(event, use)
-                        if use == 'position':
-                            time, *pos = self._prepare_event_for_use(event, use)
-                            self._devices[dev]['position_ITS'][time] = pos
-                if 'full_test_pulse' in self._devices[dev]:
-                    h5_fns = {loc.split(":")[0] for loc in self._devices[dev]['full_test_pulse'] if loc}
-                    for h5_fn in h5_fns:
-                        h5_fn = os.path.join(os.path.dirname(filename), h5_fn)
-                        # TODO only open the file once, not once per device
-                        h5_file = h5py.File(h5_fn, 'r')
-                        # TODO find a way to stop duplicating the "test_pulses/{dev}" part
-                        data_group = h5_file[f"test_pulses/{dev}"]
-                        stack = H5BackedTestPulseStack(data_group)
-                        if dev in self.fullTestPulseStacks:
-                            self.fullTestPulseStacks[dev].merge(stack)
-                        else:
-                            self.fullTestPulseStacks[dev] = stack
+            self.process(filename, useIndex=useIndex)
+
+    def process(self, filename, useIndex=True) -> None:
+        self._filename = filename
+        # events are parsed into per-use arrays by _buildIndex
+        # TODO save field of view dimensions to show stage (camera) position
+        # TODO save objective
+        # TODO save current patch profile and any changes thereof
+        # TODO save pressure measurements, maybe?
+        # TODO save lighting
+        # TODO save clamp_state_change, holding voltage
+        # TODO save entire test pulse
+        loaded = None
+        if useIndex:
+            indexFile = indexFileName(filename)
+            source = _sourceStamp(filename)
+            loaded = _readIndex(indexFile, source)
+            if loaded is None:
+                built = _buildIndex(filename)
+                try:
+                    _writeIndex(indexFile, source, *built)
+                except OSError:
+                    logger.warning(f"Could not write index for {filename}; keeping the log data in memory.")
+                    loaded = built
+                else:
+                    del built
+                    loaded = _readIndex(indexFile, source)
+        if loaded is None:
+            loaded = _buildIndex(filename)
+        info, arrays = loaded
+        self._minTime = info['minTime']
+        self._maxTime = info['maxTime']
+        self._devices = {dev: MultiPatchDeviceLog(devArrays) for dev, devArrays in arrays.items()}
+        self._loadTestPulseStacks(filename)
+
+    def _loadTestPulseStacks(self, filename):
+        h5Files = {}
+        for dev, data in self._devices.items():
+            locations = np.unique(data.array('full_test_pulse'))
+            h5_fns = {loc.decode('utf8').split(":")[0] for loc in locations if loc}
+            for h5_fn in sorted(h5_fns):
+                h5_fn = os.path.join(os.path.dirname(filename), h5_fn)
+                if h5_fn not in h5Files:
+                    h5Files[h5_fn] = h5py.File(h5_fn, 'r')
+                # TODO find a way to stop duplicating the "test_pulses/{dev}" part
+                data_group = h5Files[h5_fn][f"test_pulses/{dev}"]
+                stack = H5BackedTestPulseStack(data_group)
+                if dev in self.fullTestPulseStacks:
+                    self.fullTestPulseStacks[dev].merge(stack)
+                else:
+                    self.fullTestPulseStacks[dev] = stack
 
     def devices(self) -> list[str]:
         return list(self._devices.keys())
 
-    def __getitem__(self, dev: str) -> dict[str, Any]:
+    def __getitem__(self, dev: str) -> MultiPatchDeviceLog:
         return self._devices[dev]
 
+    def slice(self, start=None, stop=None) -> dict[str, MultiPatchDeviceLog]:
+        """Return the data for each device with ``start <= time < stop``. Either bound may be None."""
+        return {dev: data.slice(start, stop) for dev, data in self._devices.items()}
+
+    def records(self, dev: str, start=None, stop=None):
+        """Yield the original log records (as dicts) for *dev* with ``start <= time < stop``, in time order.
+
+        Only the requested lines are read from the log.
+        """
+        offsets = self._devices[dev].slice(start, stop)['event_offset']
+        with open(self._filename, 'rb') as fh:
+            for offset in offsets.tolist():
+                fh.seek(offset)
+                yield json.loads(fh.readline().rstrip(b',\r\n'))
+
     def state(self, time):
-        # Used by MultiPatchLogCanvasItem
-        return {
-            dev: {'position': self._devices[dev]['position_ITS'][time]}
-            for dev in self.devices()
-        }
+        """Return ``{dev: {'position': pos}}`` for every device at *time* (used by MultiPatchLogCanvasItem).
+
+        If *time* is an array, each position is an array with one (x, y, z) row per time (NaN before the
+        device's first position); otherwise it is an (x, y, z) tuple, or None.
+        """
+        times = np.atleast_1d(np.asarray(time, dtype=float))
+        state = {}
+        for dev in self.devices():
+            series = self._devices[dev]['position_ITS']
+            if len(series) == 0:
+                pos = np.full((len(times), 3), np.nan)
+            else:
+                pos = series.values_at(times)
+            if np.ndim(time) == 0:
+                pos = None if np.isnan(pos[0]).any() else tuple(pos[0].tolist())
+            state[dev] = {'position': pos}
+        return state
 
     def firstTime(self):
         return self._minTime
@@ -283,56 +666,14 @@ class MultiPatchLogData(object):
     def lastTime(self):
         return self._maxTime
 
-    @staticmethod
-    def _initial_data_structures(events_by_use: dict[str, list]) -> dict[str, Any]:
-        def count_for_use(use: str):
-            return len(events_by_use[use]) if use in events_by_use else 0
-
-        return {
-            # 'position_ITS' is a special case, to support Canvas
-            'position_ITS': IrregularTimeSeries(interpolate=True),
-            'position': np.zeros(
-                (count_for_use('position'), 4),
-                dtype=float,
-            ),
-            'event': np.zeros(
-                count_for_use('event'),
-                dtype=[('time', float), ('event', 'U32'), ('bool', 'bool')],
-            ),
-            'pressure': np.zeros(
-                count_for_use('pressure'),
-                dtype=[('time', float), ('pressure', float), ('source', 'U32')],
-            ),
-            'state': list(range(count_for_use('state'))),
-            'auto_bias_change': np.zeros(
-                (count_for_use('auto_bias_change'), 2),
-                dtype=float,
-            ),
-            'target': np.zeros(
-                (count_for_use('target'), 4),
-                dtype=float,
-            ),
-            # TODO save field of view dimensions to show stage (camera) position
-            # TODO save objective
-            # TODO save current patch profile and any changes thereof
-            # TODO save pressure measurements, maybe?
-            # TODO save lighting
-            # TODO save clamp_state_change, holding voltage
-            # TODO save entire test pulse
-            'test_pulse': np.zeros(
-                count_for_use('test_pulse'),
-                dtype=TEST_PULSE_NUMPY_DTYPE,
-            ),
-            'full_test_pulse': list(range(count_for_use('full_test_pulse'))),
-        }
-
     @staticmethod
     def _prepare_event_for_use(event: dict, use: str) -> tuple[Any, ...]:
         event_time = float(event['event_time'])
         # TODO 'move_request'
         # TODO 'init'
         if use == 'event':
-            return event_time, event['event'], event['is_true']
+            is_true = [event[f] for f in _BOOL_FIELDS if f in event]
+            return event_time, event['event'], not is_true or any(is_true)  # empty should mean True
         if use == 'position':
             return event_time, *event.get('position', event.get('globalPosition', (np.nan, np.nan, np.nan)))
         if use == 'pressure':
@@ -1010,8 +1351,8 @@ class MultiPatchLogWidget(Qt.QWidget):
         for dev_name, data in self._devices.items():
             position_its = data.get('position_ITS')
             if position_its is not None and len(position_its) > 0:
-                pos = position_its[abs_time]
-                if pos is not None and len(pos) >= 3:
+                pos = position_its.values_at([abs_time])[0]
+                if not np.isnan(pos).any():
                     z_pos = pos[2]
 
                     # Track stage position for focus depth
@@ -0,0 +1,194 @@
+import json
+import os
+import queue
+import threading
+import time
+
+from ...logging_config import get_logger
+from ...util.json_encoder import ACQ4JSONEncoder
+
+logger = get_logger(__name__)
+
+
+class EventLogWriter(threading.Thread):
+    """Writes MultiPatch event records and full test pulses from a background thread.
+
+    Records are queued by write() and serialized in batches; each record is written as one line of JSON
+    followed by ``,``, exactly as MultiPatchLogData expects. Records carrying a ``full_test_pulse`` are
+    appended to the test pulse stack for their device (if any), and the record stores the location of the
+    stored pulse instead.
+
+    The log file is flushed after every batch and fsync'ed at most every *fsyncInterval* seconds (0 syncs
+    every batch; None leaves syncing to the OS). All file and stack access happens in this thread, so the log
+    file and the test pulse stacks must only be changed through setLogFile() and setTestPulseStacks().
+
+    Parameters
+    ----------
+    maxQueueSize : int
+        Maximum number of queued records. write() never blocks: when the queue is full, records are dropped
+        (counted in *dropped*, with one error logged per overflow). Other requests (setLogFile() etc.) wait up
+        to *putTimeout* seconds for space.
+    batchSize : int
+        Maximum number of records serialized per batch.
+
+    Records written after stop() are dropped (with one warning logged).
+    """
+
+    def __init__(self, maxQueueSize=10000, batchSize=500, fsyncInterval=5.0, putTimeout=1.0):
+        super().__init__(name="MultiPatchLogWriter", daemon=True)
+        self.batchSize = batchSize
+        self.fsyncInterval = fsyncInterval
+        self.putTimeout = putTimeout
+        self.dropped = 0
+        self._overflowing = False
+        self._warnedStopped = False
+        self._queue = queue.Queue(maxsize=maxQueueSize)
+        self._file = None
+        self._stacks = {}
+        self._lastSync = time.monotonic()
+        self._stopped = False
+
+    def write(self, records):
+        """Queue records to be written. This never blocks; see *maxQueueSize*."""
+        if self._stopped:
+            if not self._warnedStopped:
+                logger.warning("MultiPatch log writer has been stopped; discarding new records.")
+                self._warnedStopped = True
+            self.dropped += len(records)
+            return
+        for rec in records:
+            try:
+                self._queue.put_nowait(('record', rec))
+            except queue.Full:
+                self.dropped += 1
+                if not self._overflowing:
+                    logger.error("MultiPatch log writer is falling behind; dropping records.")
+                    self._overflowing = True
+            else:
+                self._overflowing = False
+
+    def setLogFile(self, fileName):
+        """Close the current log file (if any) after writing all records queued so far, then start appending
+        records to *fileName* (or discard them if *fileName* is None)."""
+        self._put(('file', fileName))
+
+    def setTestPulseStacks(self, stacks):
+        """Replace the per-device test pulse stacks; the files of the previous stacks are closed."""
+        self._put(('stacks', dict(stacks)))
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been written and flushed. Returns False on timeout."""
+        if self._stopped:
+            return True
+        done = threading.Event()
+        if not self._put(('flush', done)):
+            return False
+        return done.wait(timeout)
+
+    def stop(self, timeout=10.0):
+        """Write all queued records, close the files and end the thread."""
+        if self._stopped:
+            return
+        self._stopped = True
+        self._queue.put(('stop', None))
+        self.join(timeout)
+
+    def _put(self, item):
+        """Queue a request other than a record. Return False if it could not be queued."""
+        if self._stopped:
+            logger.warning(f"MultiPatch log writer has been stopped; ignoring '{item[0]}' request.")
+            return False
+        try:
+            self._queue.put(item, timeout=self.putTimeout)
+        except queue.Full:
+            logger.error(f"MultiPatch log writer is falling behind; could not queue '{item[0]}' request.")
+            return False
+        return True
+
+    def run(self):
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < self.batchSize:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            waiting = []
+            for kind, arg in batch:
+                if kind == 'record':
+                    try:
+                        lines.append(self._serialize(arg))
+                    except Exception:
+                        logger.exception("Error serializing MultiPatch event")
+                    continue
+                # anything else must see all preceding records written first
+                self._writeLines(lines)
+                lines = []
+                if kind == 'file':
+                    self._closeFile()
+                    if arg is not None:
+                        self._file = open(arg, 'ab')
+                elif kind == 'stacks':
+                    self._closeStacks()
+                    self._stacks = arg
+                elif kind == 'flush':
+                    waiting.append(arg)
+                elif kind == 'stop':
+                    running = False
+            self._writeLines(lines)
+            self._flush(sync=not running)
+            for ev in waiting:
+                ev.set()
+
+        self._closeFile()
+        self._closeStacks()
+
+    def _serialize(self, rec):
+        if 'full_test_pulse' in rec:
+            stack = self._stacks.get(rec['device'], None)
+            tp = rec['full_test_pulse']
+            rec = {k: v for k, v in rec.items() if k != 'full_test_pulse'}
+            if stack is not None:
+                filename, path = stack.append(tp)
+                if self._file is not None:
+                    filename = os.path.relpath(filename, os.path.dirname(self._file.name))
+                rec['full_test_pulse'] = f"{filename}:{path}"
+        if self._file is None:
+            return None
+        return json.dumps(rec, cls=ACQ4JSONEncoder).encode("utf8") + b",\n"
+
+    def _writeLines(self, lines):
+        lines = [line for line in lines if line is not None]
+        if lines and self._file is not None:
+            self._file.write(b"".join(lines))
+
+    def _flush(self, sync=False):
+        for stack in self._stacks.values():
+            try:
+                stack.flush()
+            except Exception:
+                logger.exception("Error flushing test pulse stack")
+        if self._file is None:
+            return
+        self._file.flush()
+        now = time.monotonic()
+        if self.fsyncInterval is not None and (sync or now - self._lastSync >= self.fsyncInterval):
+            os.fsync(self._file.fileno())
+            self._lastSync = now
+
+    def _closeFile(self):
+        if self._file is not None:
+            self._flush(sync=True)
+            self._file.close()
+            self._file = None
+
+    def _closeStacks(self):
+        files = set()
+        for stack in self._stacks.values():
+            files.update(stack.files)
+        self._stacks = {}
+        for f in files:
+            f.close()
@@ -12,6 +12,7 @@ from acq4.devices.PatchPipette import PatchPipette
 from acq4.modules.Module import Module
 from acq4.util import Qt, ptime
 from neuroanalysis.test_pulse_stack import H5BackedTestPulseStack
+from .logwriter import EventLogWriter
 from .mockPatch import MockPatch
 from .pipetteControl import PipetteControl
 from ...devices.PatchPipette.statemanager import PatchPipetteStateManager
@@ -41,6 +42,7 @@ class MultiPatch(Module):
 
     def quit(self):
         self.win.saveConfig()
+        self.win.stopLogging()
         return Module.quit(self)
 
 
@@ -48,6 +50,8 @@ class MultiPatchWindow(Qt.QWidget):
     def __init__(self, module):
         self._eventStorageFile = None
         self._testPulseStacks = {}
+        self._logWriter = EventLogWriter()
+        self._logWriter.start()
         self.eventHistory = []
         self._pipsToSetTips = []
         self._setTargetPips = []
@@ -577,24 +581,21 @@ class MultiPatchWindow(Qt.QWidget):
 
     def recordToggled(self, rec):
         if self._eventStorageFile is not None:
-            self._eventStorageFile.close()
+            self._logWriter.setLogFile(None)
             self._eventStorageFile = None
             self.resetHistory()
         if rec is True:
             man = getManager()
             sdir = man.getCurrentDir()
-            self._eventStorageFile = open(sdir.createFile('MultiPatch.log', autoIncrement=True).name(), 'ab')
+            self._eventStorageFile = sdir.createFile('MultiPatch.log', autoIncrement=True).name()
+            self._logWriter.setLogFile(self._eventStorageFile)
             self.writeRecords(self.eventHistory)
             profile_data = PatchPipetteStateManager.buildPatchProfilesParameters().getValues()
             self.patchProfilesChanged(profile_data)
 
     def recordTestPulsesToggled(self, rec):
-        files = set()
-        for stack in self._testPulseStacks.values():
-            files.update(stack.files)
+        # the writer thread closes the files of the previous stacks
         self._testPulseStacks = {}
-        for f in files:
-            f.close()
         if rec is True:
             man = getManager()
             sdir = man.getCurrentDir()
@@ -605,6 +606,7 @@ class MultiPatchWindow(Qt.QWidget):
                 dev_gr = group.create_group(dev.name())
                 dev_gr.attrs['device'] = dev.name()
                 self._testPulseStacks[dev.name()] = H5BackedTestPulseStack(dev_gr)
+        self._logWriter.setTestPulseStacks(self._testPulseStacks)
         for pip in self.selectedPipettes():
             pip.emitFullTestPulseData(rec)
 
@@ -622,19 +624,14 @@ class MultiPatchWindow(Qt.QWidget):
                 pip.clampDevice.resetTestPulseHistory()
 
     def writeRecords(self, recs):
-        for rec in recs:
-            if 'full_test_pulse' in rec:
-                if self._testPulseStacks.get(rec['device'], None) is not None:
-                    filename, path = self._testPulseStacks[rec['device']].append(rec['full_test_pulse'])
-                    if self._eventStorageFile:
-                        filename = os.path.relpath(filename, os.path.dirname(self._eventStorageFile.name))
-                    rec = {k: v for k, v in rec.items() if k != 'full_test_pulse'}
-                    rec['full_test_pulse'] = f"{filename}:{path}"
-                else:
-                    rec = {k: v for k, v in rec.items() if k != 'full_test_pulse'}
-            if self._eventStorageFile:
-                self._eventStorageFile.write(json.dumps(rec, cls=ACQ4JSONEncoder).encode("utf8") + b",\n")
-        if self._eventStorageFile:
-            self._eventStorageFile.flush()
-        for stack in self._testPulseStacks.values():
-            stack.flush()
+        """Queue records for the background log writer (see EventLogWriter)."""
+        self._logWriter.write(recs)
+
+    def stopLogging(self):
+        """Write out all queued records and close the event log and test pulse files."""
+        for pip in self.pips:
+            if isinstance(pip, PatchPipette):
+                pg.disconnect(pip.sigNewEvent, self.pipetteEvent)
+        if self.microscope is not None:
+            pg.disconnect(self.microscope.sigSurfaceDepthChanged, self.surfaceDepthChanged)
+        self._logWriter.stop()
@@ -0,0 +1,82 @@
+import json
+import os
+
+import numpy as np
+
+from acq4.filetypes.MultiPatchLog import MultiPatchLogData, indexFileName
+
+
+def write_log(fileName, events):
+    with open(fileName, 'wb') as fh:
+        for ev in events:
+            fh.write(json.dumps(ev).encode('utf8') + b",\n")
+
+
+def make_events():
+    events = []
+    for i in range(100):
+        t = 1000.0 + i
+        events.append({'device': 'pip1', 'event': 'move_start', 'event_time': t, 'position': [i, 2 * i, 3 * i]})
+        events.append({'device': 'pip1', 'event': 'pressure_changed', 'event_time': t + 0.5,
+                       'pressure': -i, 'source': 'regulator'})
+        events.append({'device': 'pip2', 'event': 'state_change', 'event_time': t + 0.25,
+                       'state': f"state{i}", 'info': ''})
+    # logged out of order
+    events.append({'device': 'pip1', 'event': 'move_stop', 'event_time': 1050.25, 'position': [0, 0, 0]})
+    events.append({'device': 'pip1', 'event': 'target_changed', 'event_time': 1010.0,
+                   'target_position': [1, 2, 3], 'active': False})
+    return events
+
+
+def test_log_index(tmp_path):
+    logFile = str(tmp_path / 'MultiPatch_000.log')
+    events = make_events()
+    write_log(logFile, events)
+
+    log = MultiPatchLogData(logFile)
+    assert os.path.exists(indexFileName(logFile))
+    assert sorted(log.devices()) == ['pip1', 'pip2']
+    assert log.firstTime() == 1000.0
+    assert log.lastTime() == 1099.5
+
+    pip1 = log['pip1']
+    assert pip1['position'].shape == (101, 4)
+    assert np.all(np.diff(pip1['position'][:, 0]) >= 0)
+    assert tuple(pip1['position'][51]) == (1050.25, 0, 0, 0)
+    assert len(pip1['pressure']) == 100 and pip1['pressure']['source'][0] == 'regulator'
+    assert pip1['target'].tolist() == [[1010.0, 1, 2, 3]]
+    assert not pip1['event']['bool'][pip1['event']['event'] == 'target_changed'][0]
+    assert pip1['position_ITS'][1000.5] == (0.5, 1.0, 1.5)
+    assert log.state(1000.5) == {'pip1': {'position': (0.5, 1.0, 1.5)}, 'pip2': {'position': None}}
+    positions = log.state([999.0, 1000.5])['pip1']['position']
+    assert np.all(np.isnan(positions[0])) and positions[1].tolist() == [0.5, 1.0, 1.5]
+    assert log['pip2']['state'][3] == (1003.25, 'state3', '')
+    assert len(pip1['test_pulse']) == 0 and pip1['full_test_pulse'] == []
+
+    # a second open maps the index instead of parsing the log
+    reopened = MultiPatchLogData(logFile)
+    assert isinstance(reopened['pip1'].array('position'), np.memmap)
+    for key in ('position', 'event', 'pressure', 'target'):
+        assert np.array_equal(reopened['pip1'][key], pip1[key])
+    assert reopened['pip2']['state'] == log['pip2']['state']
+
+    # time-range queries
+    part = reopened.slice(1010, 1020)
+    assert part['pip1']['position'][:, 0].tolist() == [1010.0 + i for i in range(10)]
+    assert len(part['pip1']['event']) == len(part['pip1']['event_offset']) == 21
+    assert [s[1] for s in part['pip2']['state']] == [f"state{i}" for i in range(10, 20)]
+    records = list(reopened.records('pip1', 1050, 1050.5))
+    assert records == [events[150], events[-2]]
+
+    # appending to the log invalidates the index
+    events.append({'device': 'pip3', 'event': 'move_start', 'event_time': 2000.0, 'position': [0, 0, 0]})
+    write_log(logFile, events)
+    assert 'pip3' in MultiPatchLogData(logFile).devices()
+
+
+def test_log_without_index(tmp_path):
+    logFile = str(tmp_path / 'MultiPatch_000.log')
+    write_log(logFile, make_events())
+    log = MultiPatchLogData(logFile, useIndex=False)
+    assert not os.path.exists(indexFileName(logFile))
+    assert len(log['pip1']['position']) == 101
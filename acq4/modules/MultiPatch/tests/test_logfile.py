@@ -1,6 +1,6 @@
 import numpy as np
 
-from acq4.util.MultiPatchLog import IrregularTimeSeries
+from acq4.filetypes.MultiPatchLog import IrregularTimeSeries
 
 
 def test_timeseries_index():
@@ -67,4 +67,52 @@ def test_timeseries_index():
                     ts[t] = v
                 for t in np.arange(-1, 40, 0.05):
                     assert ts[t] == lookup(t, ts)
-    
\ No newline at end of file
+    
+
+def test_timeseries_values_at():
+    times = np.linspace(0, 100, 1001)
+    positions = np.random.normal(size=(1001, 3))
+    ts = IrregularTimeSeries(interpolate=True)
+    ts.extendArrays(times[:500], positions[:500])
+    for t, p in zip(times[500:], positions[500:]):
+        ts[t] = p  # grows the buffer one at a time
+    assert len(ts) == 1001
+
+    query = np.random.uniform(-10, 110, size=500)
+    result = ts.values_at(query)
+    assert result.shape == (500, 3)
+    for t, v in zip(query, result):
+        expected = ts[t]
+        if expected is None:
+            assert np.all(np.isnan(v))
+        else:
+            assert np.allclose(v, expected)
+
+    scalars = IrregularTimeSeries(data=[(10.5, 0.1), (12.0, 0.7), (16.0, 0.5), (34.2, 1.2)], interpolate=True)
+    assert np.allclose(scalars.values_at([5.0, 14.0, 50]), [np.nan, 0.6, 1.2], equal_nan=True)
+
+    strings = IrregularTimeSeries(data=[(1, 'a'), (2, 'b')])
+    assert strings.values_at([0, 1.5, 3]) == [None, 'a', 'b']
+    strings[3] = 'c'
+    assert strings[3.5] == 'c'
+
+
+def test_timeseries_returns_stored_values():
+    pos = np.array([1.0, 2.0, 3.0])
+    ts = IrregularTimeSeries()
+    ts[1] = [0, 1]
+    ts[2] = (2, 3)
+    ts[3] = pos
+    assert ts[1.5] == [0, 1] and type(ts[1.5]) is list
+    assert ts[2] == (2, 3)
+    assert ts[4] is pos
+    assert ts.values()[:2] == [[0, 1], (2, 3)] and ts.values()[2] is pos
+
+    ints = IrregularTimeSeries(data=[(1, 5), (2, 7)])
+    assert ints[1.5] == 5 and type(ints[1.5]) is int
+    assert np.allclose(ints.values_at([1.5, 3]), [5, 7])
+
+    # rows of an array added in one batch come back as tuples
+    batch = IrregularTimeSeries()
+    batch.extendArrays([1, 2], np.array([[0.5, 1.0], [1.5, 2.0]]))
+    assert batch[1.5] == (0.5, 1.0)
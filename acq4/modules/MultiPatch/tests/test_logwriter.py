@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+import time
+
+from acq4.modules.MultiPatch.logwriter import EventLogWriter
+
+
+class FakeFile:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeStack:
+    """Stands in for H5BackedTestPulseStack: records appended pulses and reports where they were stored."""
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.pulses = []
+        self.flushes = 0
+        self.files = [FakeFile()]
+        self.thread = None
+
+    def append(self, tp):
+        self.thread = threading.current_thread()
+        self.pulses.append(tp)
+        return self.fileName, f"test_pulses/dev1/{len(self.pulses) - 1}"
+
+    def flush(self):
+        self.flushes += 1
+
+
+def read_log(fileName):
+    with open(fileName, 'rb') as fh:
+        return [json.loads(line.rstrip(b',\r\n')) for line in fh]
+
+
+def test_log_writer(tmp_path):
+    logFile = str(tmp_path / 'MultiPatch.log')
+    stack = FakeStack(str(tmp_path / 'TestPulses.hdf5'))
+    writer = EventLogWriter(fsyncInterval=0)
+    writer.start()
+
+    # records written before a log file is set are discarded
+    writer.write([{'device': 'dev1', 'event': 'ignored', 'event_time': 0}])
+    writer.setLogFile(logFile)
+    writer.setTestPulseStacks({'dev1': stack})
+    records = [{'device': 'dev1', 'event': 'move_start', 'event_time': float(i)} for i in range(1000)]
+    writer.write(records)
+    writer.write([{'device': 'dev1', 'event': 'test_pulse', 'event_time': 1000.0, 'full_test_pulse': 'pulse'}])
+    writer.write([{'device': 'dev2', 'event': 'test_pulse', 'event_time': 1001.0, 'full_test_pulse': 'pulse'}])
+    assert writer.flush(timeout=5)
+
+    with open(logFile, 'rb') as fh:
+        text = fh.read()
+    assert text.endswith(b",\n")
+    assert text.count(b"\n") == 1002
+    events = read_log(logFile)
+    assert events[:1000] == records
+    # the full test pulse is stored in the stack (from the writer thread); the log refers to it
+    assert events[1000]['full_test_pulse'] == "TestPulses.hdf5:test_pulses/dev1/0"
+    assert stack.pulses == ['pulse']
+    assert stack.thread is writer
+    assert stack.flushes > 0
+    # no stack for this device
+    assert 'full_test_pulse' not in events[1001]
+
+    # closing the log drains the queue and closes the stack files
+    writer.write([{'device': 'dev1', 'event': 'last', 'event_time': 1002.0}])
+    writer.stop()
+    assert not writer.is_alive()
+    assert read_log(logFile)[-1]['event'] == 'last'
+    assert stack.files[0].closed
+    assert os.path.getsize(logFile) == len(text) + len(json.dumps(read_log(logFile)[-1])) + 2
+
+
+def test_log_writer_never_blocks(tmp_path):
+    # writer thread not started, so nothing is taken from the queue
+    writer = EventLogWriter(maxQueueSize=10, putTimeout=0.01)
+    start = time.monotonic()
+    writer.write([{'device': 'dev1', 'event': 'move_start', 'event_time': float(i)} for i in range(100)])
+    assert time.monotonic() - start < 0.5
+    assert writer.dropped == 90
+    assert writer.flush(timeout=0.1) is False
+
+
+def test_log_writer_after_stop(tmp_path):
+    logFile = str(tmp_path / 'MultiPatch.log')
+    writer = EventLogWriter(fsyncInterval=0)
+    writer.start()
+    writer.setLogFile(logFile)
+    writer.write([{'device': 'dev1', 'event': 'first', 'event_time': 0.0}])
+    writer.stop()
+
+    # records written after stop (e.g. from pipettes still emitting events) are dropped without raising
+    writer.write([{'device': 'dev1', 'event': 'late', 'event_time': 1.0}])
+    writer.setLogFile(None)
+    assert writer.flush() is True
+    assert writer.dropped == 1
+    assert [ev['event'] for ev in read_log(logFile)] == ['first']
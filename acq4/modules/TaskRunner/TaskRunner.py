@@ -1,12 +1,13 @@
 import contextlib
 import gc
+import itertools
 import os
 import sys
+import threading
 import time
 from collections import OrderedDict
 from functools import reduce
 
-import numpy as np
 import six
 
 import acq4.util.DirTreeWidget as DirTreeWidget
@@ -85,6 +86,8 @@ class TaskRunner(Module):
         # Works by running garbage collection between consecutive task runs to avoid accumulation of large garbage objects.
         # Since most modern systems have adequate memory, this is now disabled by default.
         self._reduceMemoryUsage = config.get('reduceMemoryUsage', False)
+        # create the task for each point in a sequence while the previous one is running
+        self._pipelineSequence = config.get('pipelineSequence', True)
 
         self.lastProtoTime = None
         self.loopEnabled = False
@@ -979,6 +982,8 @@ class TaskThread(Thread):
         self._currentTask = None
         self._currentFuture = None
         self._systrace = None
+        self._interrupt = threading.Event()  # set to wake the thread when it is asked to stop or abort
+        self._prepared = None  # (params, cmd, task, error) created ahead of time for the next point in a sequence
 
     def startTask(self, task, paramSpace=None):
         with self.lock:
@@ -1013,6 +1018,7 @@ class TaskThread(Thread):
             with self.lock:
                 self.stopThread = False
                 self.abortThread = False
+                self._interrupt.clear()
 
             if self.paramSpace is None:
                 try:
@@ -1021,7 +1027,7 @@ class TaskThread(Thread):
                     if e.args[0] != 'stop':
                         raise
             else:
-                runSequence(self.runOnce, self.paramSpace, list(self.paramSpace.keys()))
+                self.runSequence()
 
         except Exception as exc:
             self.task = None  ## free up this memory
@@ -1033,8 +1039,68 @@ class TaskThread(Thread):
         else:
             self._currentFuture._taskDone()
             self._currentFuture = None
+        finally:
+            self._prepared = None
+
+    def runSequence(self):
+        """Run the task once for every point in the parameter space, iterating over the last parameter fastest.
+
+        Unless the 'pipelineSequence' module option is False or a device in the task does not allow it (see
+        Device.allowEarlyTaskCreation), the Manager task for each point is created while the previous one is
+        running, so that only device configuration and start remain between trials.
+        """
+        keys = list(self.paramSpace.keys())
+        paramList = [dict(zip(keys, inds)) for inds in itertools.product(*self.paramSpace.values())]
+        pipeline = self.ui._pipelineSequence and self.canCreateEarly(self.selectCommand(paramList[0]))
+        for i, params in enumerate(paramList):
+            nextParams = None
+            if pipeline and i + 1 < len(paramList):
+                nextParams = paramList[i + 1]
+            try:
+                self.runOnce(params, nextParams)
+            except Exception as e:
+                if len(e.args) > 0 and e.args[0] == 'stop':
+                    break
+                raise
+
+    def selectCommand(self, params):
+        """Return the command structure to execute for the sequence point *params*."""
+        cmd = self.task
+        for p in params:
+            cmd = cmd[p: params[p]]
+
+        if type(cmd) is not dict:
+            print("========= TaskRunner.runOnce cmd: ==================")
+            print(cmd)
+            print("========= TaskRunner.runOnce params: ==================")
+            print("Params:", params)
+            print("===========================")
+            raise TypeError(
+                "TaskRunner.runOnce failed to generate a proper command structure. Object type was '%s', should have been 'dict'." % type(
+                    cmd))
+        return cmd
+
+    def canCreateEarly(self, cmd):
+        """Return True if tasks for *cmd* may be created while another task is running."""
+        return all(self.dm.getDevice(name).allowEarlyTaskCreation for name in cmd if name != 'protocol')
+
+    def prepareNext(self, params):
+        """Create the task for the sequence point *params* while the current task is running.
 
-    def runOnce(self, params=None):
+        This relies on every device in the task building its DeviceTask (commands, waveforms, etc.) without
+        changing hardware or device configuration; devices that do otherwise set allowEarlyTaskCreation to
+        False, which disables pipelining (see runSequence). Errors are logged right away and raised again when
+        the point is run.
+        """
+        cmd = None
+        try:
+            cmd = self.selectCommand(params)
+            self._prepared = (params, cmd, self.dm.createTask(cmd), None)
+        except Exception as exc:
+            logger.warning("Error creating the next task in sequence:", exc_info=True)
+            self._prepared = (params, cmd, None, exc)
+
+    def runOnce(self, params=None, nextParams=None):
         # good time to collect garbage
         if self.ui._reduceMemoryUsage:
             gc.collect()
@@ -1043,11 +1109,15 @@ class TaskThread(Thread):
         if params is None:
             params = {}
 
-        ## Select correct command to execute
-        cmd = self.task
-        if params is not None:
-            for p in params:
-                cmd = cmd[p: params[p]]
+        ## Select correct command to execute, unless the task was already created while the previous one ran
+        prepared, self._prepared = self._prepared, None
+        if prepared is not None and prepared[0] == params:
+            _, cmd, task, error = prepared
+            if error is not None:
+                raise error
+        else:
+            cmd = self.selectCommand(params)
+            task = None
         prof.mark('select command')
 
         ## Wait before starting if we've already run too recently
@@ -1056,7 +1126,7 @@ class TaskThread(Thread):
                 if self.abortThread or self.stopThread:
                     # print "Task run aborted by user"
                     return
-            time.sleep(1e-3)
+            self._interrupt.wait(self.lastRunTime + cmd['protocol']['cycleTime'] - ptime.time())
         prof.mark('sleep')
 
         emitSig = True
@@ -1074,17 +1144,8 @@ class TaskThread(Thread):
 
         prof.mark('pause')
 
-        if type(cmd) is not dict:
-            print("========= TaskRunner.runOnce cmd: ==================")
-            print(cmd)
-            print("========= TaskRunner.runOnce params: ==================")
-            print("Params:", params)
-            print("===========================")
-            raise TypeError(
-                "TaskRunner.runOnce failed to generate a proper command structure. Object type was '%s', should have been 'dict'." % type(
-                    cmd))
-
-        task = self.dm.createTask(cmd)
+        if task is None:
+            task = self.dm.createTask(cmd)
         prof.mark('create task')
 
         self.lastRunTime = ptime.time()
@@ -1093,8 +1154,6 @@ class TaskThread(Thread):
             with self.lock:
                 self._currentTask = task
             task.execute(block=False)
-            # record estimated end time
-            endTime = time.time() + cmd['protocol']['duration']
             self.sigTaskStarted.emit(params)
             prof.mark('execute')
         except Exception as exc:
@@ -1109,20 +1168,19 @@ class TaskThread(Thread):
         ### Do not put code outside of these try: blocks; may cause device lockup
 
         try:
-            ## wait for finish, watch for abort requests
-            while True:
-                if task.isDone():
-                    prof.mark('task done')
-                    break
+            if nextParams is not None:
+                self.prepareNext(nextParams)
+                prof.mark('prepare next task')
+
+            ## wait for finish, watch for abort requests (abort() interrupts the wait)
+            while not task.wait():
                 with self.lock:
                     if self.abortThread:
                         # should be taken care of in TaskThread.abort()
                         # NO -- task.stop() is not thread-safe.
                         task.stop(abort=True)
                         return
-                # adjust sleep time based on estimated time remaining in the task.
-                sleep = np.clip((endTime - time.time()) * 0.5, 1e-3, 20e-3)
-                time.sleep(sleep)
+            prof.mark('task done')
 
             result = task.getResult()
         except:
@@ -1159,6 +1217,7 @@ class TaskThread(Thread):
             if task is not None and self._currentTask is not task:
                 return
             self.stopThread = True
+            self._interrupt.set()
         if block:
             if not self.wait(10000):
                 raise Exception("Timed out while waiting for thread exit!")
@@ -1169,6 +1228,8 @@ class TaskThread(Thread):
                 # bad idea -- task.stop() is not thread-safe; must ask the task thread to stop.
                 # self._currentTask.stop(abort=True)
                 self.abortThread = True
+                self._currentTask.interruptWait()
+            self._interrupt.set()
 
 
 class TaskFuture(Future):
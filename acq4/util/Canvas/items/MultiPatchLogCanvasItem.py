@@ -1,6 +1,7 @@
 import re
 import time
 
+import numpy as np
 import pyqtgraph as pg
 from acq4.util import Qt
 from .CanvasItem import CanvasItem
@@ -34,7 +35,10 @@ class MultiPatchLogCanvasItem(CanvasItem):
         self._timeSliderResolution = 10.  # 10 ticks per second on the time slider
         self._mpCtrlWidget = MultiPatchLogCtrlWidget()
         self.layout.addWidget(self._mpCtrlWidget, self.layout.rowCount(), 0, 1, 2)
-        self._mpCtrlWidget.timeSlider.setMaximum(self._timeSliderResolution * (self.data.lastTime() - self.data.firstTime()))
+        nTicks = int(self._timeSliderResolution * (self.data.lastTime() - self.data.firstTime()))
+        self._mpCtrlWidget.timeSlider.setMaximum(nTicks)
+        # look up pipette positions for every slider tick at once
+        self._sliderPositions = self.data.state(self.data.firstTime() + np.arange(nTicks + 1) / self._timeSliderResolution)
         self._mpCtrlWidget.timeSlider.valueChanged.connect(self.timeSliderChanged)
         self._mpCtrlWidget.createMarkersBtn.clicked.connect(self.createMarkersClicked)
         
@@ -42,10 +46,10 @@ class MultiPatchLogCanvasItem(CanvasItem):
 
     def timeSliderChanged(self, v):
         t = self.currentTime()
-        pos = self.data.state(t)
+        v = self._mpCtrlWidget.timeSlider.value()
         for dev, arrow in self.pipettes.items():
-            p = pos.get(dev, {'position': None})['position']
-            if p is None:
+            p = self._sliderPositions[dev]['position'][v]
+            if np.isnan(p).any():
                 arrow.hide()
             else:
                 arrow.show()
@@ -67,7 +71,7 @@ class MultiPatchLogCanvasItem(CanvasItem):
         return (v / self._timeSliderResolution) + self.data.firstTime()
 
     def setCurrentTime(self, t):
-        self._mpCtrlWidget.timeSlider.setValue(self._timeSliderResolution * (t - self.data.firstTime()))
+        self._mpCtrlWidget.timeSlider.setValue(int(round(self._timeSliderResolution * (t - self.data.firstTime()))))
 
     def createMarkersClicked(self):
         fmt = str(self._mpCtrlWidget.createMarkersFormat.text())
@@ -7,12 +7,14 @@ These classes implement a data management system that allows modules
 to easily store and retrieve data files along with metadata. The objects
 probably only need to be created via functions in the Manager class.
 """
+import bisect
 import os
 import weakref
+from collections import OrderedDict
 
 from acq4.logging_config import get_logger
 from acq4.util import Qt
-from .dot_index import FileHandle, DirHandle
+from .dot_index import FileHandle, DirHandle, flushIndexes
 from .common import abspath
 from acq4.util.Mutex import Mutex
 
@@ -44,16 +46,25 @@ def getInfo(name) -> dict:
 class DataManager(Qt.QObject):
     """Class for creating and caching DirHandle objects to make sure there is only one manager object per
     file/directory. This class is (supposedly) thread-safe.
+
+    At most *maxCacheSize* handles are kept alive by the cache; beyond that, the least recently used handles are
+    released. A released handle is still returned by later lookups for as long as it is referenced elsewhere,
+    so there is never more than one handle per file.
     """
 
     INSTANCE = None
+    maxCacheSize = 10000
 
-    def __init__(self):
+    def __init__(self, maxCacheSize=None):
         Qt.QObject.__init__(self)
         if DataManager.INSTANCE is not None:
             raise ValueError("Attempted to create more than one DataManager!")
         DataManager.INSTANCE = self
-        self.cache = {}
+        if maxCacheSize is not None:
+            self.maxCacheSize = maxCacheSize
+        self.cache = OrderedDict()  # handles kept alive by the cache, in least- to most-recently used order
+        self._handles = weakref.WeakValueDictionary()  # all live handles
+        self._paths = []  # sorted names of handles in self._handles (may include some that have died)
         self.lock = Mutex(Qt.QMutex.Recursive)
 
     def getDirHandle(self, dirName, create=False):
@@ -92,10 +103,10 @@ class DataManager(Qt.QObject):
         import gc
 
         with self.lock:
-            tmp = weakref.WeakValueDictionary(self.cache)
-            self.cache = None
-            gc.collect()
-            self.cache = dict(tmp)
+            self.cache.clear()
+        # handles that are only kept alive by reference cycles are freed here; handles still in use elsewhere
+        # remain available through self._handles
+        gc.collect()
 
     def _addHandle(self, fileName, handle):
         """Cache a handle and watch it for changes"""
@@ -107,50 +118,82 @@ class DataManager(Qt.QObject):
                 oldName = args[0]
                 newName = args[1]
                 ## Inform all children that they have been moved and update cache
-                tree = self._getTree(oldName)
-                for h in tree:
+                for h, child in self._getTreeHandles(oldName):
                     ## Update key to cached handle
                     newh = abspath(os.path.join(newName, h[len(oldName+os.path.sep):]))
-                    self._setCache(newh, self._getCache(h))
+                    self._setCache(newh, child)
 
                     ## If the change originated from h's parent, inform it that this change has occurred.
                     if h != oldName:
-                        self._getCache(h)._parentMoved(oldName, newName)
+                        child._parentMoved(oldName, newName)
                     self._delCache(h)
 
             elif change == 'deleted':
                 oldName = args[0]
 
                 ## Inform all children that they have been deleted and remove from cache
-                tree = self._getTree(oldName)
-                for path in tree:
-                    self._getCache(path)._deleted()
+                for path, child in self._getTreeHandles(oldName):
+                    child._deleted()
                     self._delCache(path)
 
+    def _getTreeHandles(self, parent):
+        """Return (name, handle) pairs for the handles returned by _getTree()."""
+        handles = [(name, self._handles.get(name)) for name in self._getTree(parent)]
+        # skip any that were garbage collected in the meantime
+        return [(name, h) for name, h in handles if h is not None]
+
     def _getTree(self, parent):
         """Return the entire list of cached handles that are children or grandchildren of this handle"""
-
-        ## If handle has no children, then there is no need to search for its tree.
-        tree = [parent]
-        ph = self._getCache(parent)
-        prefix = os.path.normcase(os.path.join(parent, ''))
-
-        for h in self.cache:
-            if h[:len(prefix)] == prefix:
-                tree.append(h)
-        return tree
+        with self.lock:
+            tree = [parent]
+            ph = self._getCache(parent)
+            prefix = os.path.normcase(os.path.join(parent, ''))
+
+            # all names beginning with prefix are adjacent in the sorted path list
+            i = bisect.bisect_left(self._paths, prefix)
+            while i < len(self._paths) and self._paths[i].startswith(prefix):
+                if self._paths[i] in self._handles:
+                    tree.append(self._paths[i])
+                    i += 1
+                else:
+                    del self._paths[i]
+            return tree
 
     def _getCache(self, name):
-        return self.cache[abspath(name)]
+        name = abspath(name)
+        handle = self._handles[name]
+        self._touch(name, handle)
+        return handle
 
     def _setCache(self, name, value):
-        self.cache[abspath(name)] = value
+        name = abspath(name)
+        if name not in self._handles:
+            if len(self._paths) > 2 * len(self._handles) + 1000:
+                # drop names of handles that have been garbage collected
+                self._paths = sorted(self._handles.keys())
+            i = bisect.bisect_left(self._paths, name)
+            if i == len(self._paths) or self._paths[i] != name:
+                self._paths.insert(i, name)
+        self._handles[name] = value
+        self._touch(name, value)
+
+    def _touch(self, name, handle):
+        """Mark a handle as most recently used, and release the least recently used handles if the cache is full."""
+        self.cache[name] = handle
+        self.cache.move_to_end(name)
+        while len(self.cache) > self.maxCacheSize:
+            self.cache.popitem(last=False)
 
     def _delCache(self, name):
-        del self.cache[abspath(name)]
+        name = abspath(name)
+        self._handles.pop(name, None)
+        self.cache.pop(name, None)
+        i = bisect.bisect_left(self._paths, name)
+        if i < len(self._paths) and self._paths[i] == name:
+            del self._paths[i]
 
     def _cacheHasName(self, name):
-        return abspath(name) in self.cache
+        return abspath(name) in self._handles
 
 
 __all__ = [
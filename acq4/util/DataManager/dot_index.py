@@ -1,7 +1,13 @@
+import atexit
+import concurrent.futures
 import contextlib
+import datetime
+import hashlib
+import json
 import os
 import re
 import shutil
+import threading
 import time
 from collections import OrderedDict
 from typing import Callable
@@ -12,12 +18,103 @@ from acq4 import filetypes
 from acq4.logging_config import get_logger
 from acq4.util import Qt, advancedTypes as advancedTypes
 from acq4.util.Mutex import Mutex
-from pyqtgraph import SignalProxy, BusyCursor
-from pyqtgraph.configfile import readConfigFile, writeConfigFile, appendConfigFile
+from pyqtgraph import SignalProxy, BusyCursor, Point, ColorMap, units
+from pyqtgraph.configfile import writeConfigFile, appendConfigFile, genString, parseString, ParseError
 from .common import abspath
 
 logger = get_logger(__name__)
 
+# Updates to existing index entries are appended to the .index file as journal records rather than rewriting
+# the whole file. Each record is a line containing only _JOURNAL_START, followed by the genString() output for
+# {fileName: changedInfo} with every line prefixed by _JOURNAL_LINE. Because these are comment lines,
+# readConfigFile() still reads the file (it just does not see updates that have not been compacted yet).
+_JOURNAL_START = '#~~'
+_JOURNAL_LINE = '#~ '
+
+_indexScope = None
+
+# Files that belong to the DataManager rather than the user; these are hidden from DirHandle.ls()
+_INDEX_FILES = ['.index', '.index.compact', '.index.ctimes']
+# Hidden index files written next to data files by their readers (e.g. MultiPatch logs)
+_INDEX_FILE_SUFFIX = '.idx'
+
+# DirHandles whose index file has journal records that have not been compacted yet (see flushIndexes)
+_uncompactedDirs = set()
+_uncompactedDirsLock = threading.Lock()
+
+# Shared pool used to look up file timestamps when sorting directory listings by date
+_ctimeExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="DirHandle.ls")
+
+
+def flushIndexes(timeout=10.0):
+    """Fold all journaled index updates into their index files now, so that readers that ignore journal records
+    (readConfigFile, older versions of acq4) see them. Called at shutdown and at exit."""
+    with _uncompactedDirsLock:
+        dirs = list(_uncompactedDirs)
+    for dh in dirs:
+        try:
+            dh.flushIndex(timeout=timeout)
+        except Exception:
+            logger.exception(f"Error while compacting index file for {dh.name()}:")
+
+
+atexit.register(flushIndexes)
+
+
+def _getIndexScope():
+    """Return the namespace used to evaluate values in .index files (mirrors pyqtgraph's readConfigFile)."""
+    global _indexScope
+    if _indexScope is None:
+        scope = {
+            **units.allUnits,
+            'np': np,
+            'array': np.array,
+            'OrderedDict': OrderedDict,
+            'Point': Point,
+            'QtCore': Qt.QtCore,
+            'ColorMap': ColorMap,
+            'datetime': datetime,
+        }
+        for dtype in ['int8', 'uint8', 'int16', 'uint16', 'float16', 'int32', 'uint32', 'float32', 'int64',
+                      'uint64', 'float64']:
+            scope[dtype] = getattr(np, dtype)
+        _indexScope = scope
+    return _indexScope
+
+
+def _parseIndexBlock(lines):
+    return parseString('\n'.join(lines), **_getIndexScope())[1]
+
+
+def _mergeIndexText(index, text):
+    """Parse text read from a .index file and merge it into *index*, replaying journal records in order.
+
+    Returns the number of journal records that were applied.
+    """
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    nRecords = 0
+    inRecord = False
+    block = []
+    for line in text.split('\n') + [None]:
+        if line is not None and inRecord and line.startswith(_JOURNAL_LINE):
+            block.append(line[len(_JOURNAL_LINE):])
+            continue
+        if line is None or line == _JOURNAL_START or inRecord:
+            # end of the current block
+            for k, v in _parseIndexBlock(block).items():
+                if inRecord:
+                    index.setdefault(k, OrderedDict()).update(v)
+                else:
+                    index[k] = v
+            block = []
+            inRecord = line == _JOURNAL_START
+            if inRecord:
+                nRecords += 1
+                continue
+        if line is not None:
+            block.append(line)
+    return nRecords
+
 
 class FileHandle:
     def __init__(self, path, manager):
@@ -294,11 +391,30 @@ class FileHandle:
 
 
 class DirHandle(FileHandle):
+    # If True, updates to already-indexed files are journaled (appended) instead of rewriting the index file.
+    journalIndex = True
+    # Journaled updates are folded back into the index file by a background thread this many seconds after
+    # the first pending update, or immediately once this many records have accumulated.
+    compactionDelay = 10.0
+    maxJournalRecords = 200
+    # Number of bytes at the end of the index file we remember in order to detect append-only changes
+    _indexTailSize = 256
+
     def __init__(self, path, manager, create=False):
         FileHandle.__init__(self, path, manager)
         self._index = None
+        self._indexStat = None  # (mtime_ns, size) of the index file when last read or written
+        self._indexTail = b''
+        self._journalCount = 0  # number of journal records in the index file
+        self._indexGeneration = 0  # incremented each time the index file is rewritten
+        self._compactTimer = None
+        self._compacting = False
         self.lsCache = {}  # sortMode: [files...]
         self.cTimeCache = {}
+        self._unindexedCTimes = set()  # names in cTimeCache whose timestamps are not recorded in the index
+        self._cTimeCacheLoaded = False
+        self._wroteIndex = False  # whether this session has written to the index
+        self._cTimeThread = None
         self._indexFileExists = False
 
         if not os.path.isdir(self.path) and create:
@@ -395,35 +511,45 @@ class DirHandle(FileHandle):
     def dirExists(self, dirName):
         return os.path.isdir(os.path.join(self.path, dirName))
 
-    def ls(self, normcase=False, sortMode='date', useCache=False):
+    def ls(self, normcase=False, sortMode='date', useCache=False, lazy=False):
         """Return a list of all files in the directory.
         If normcase is True, normalize the case of all names in the list.
-        sortMode may be 'date', 'alpha', or None."""
+        sortMode may be 'date', 'alpha', or None.
+
+        If lazy is True and sortMode is 'date', do not wait for file timestamps that are not yet known. Instead,
+        return the files sorted by name, look up the timestamps in the background, and emit a 'children'
+        change once the date-sorted listing is available.
+        """
         if (not useCache) or (sortMode not in self.lsCache):
-            self._updateLsCache(sortMode)
-        files = self.lsCache[sortMode]
+            files = self._updateLsCache(sortMode, lazy=lazy)
+        else:
+            files = self.lsCache[sortMode]
 
         if normcase:
             return list(map(os.path.normcase, files))
         else:
             return files[:]
 
-    def _updateLsCache(self, sortMode):
+    def _updateLsCache(self, sortMode, lazy=False):
         try:
             files = os.listdir(self.name())
         except Exception:
             logger.exception(f"Error while listing files in {self.name()}:")
             files = []
-        for i in ['.index']:
+        for i in _INDEX_FILES:
             if i in files:
                 files.remove(i)
+        files = [f for f in files if not (f.startswith('.') and f.endswith(_INDEX_FILE_SUFFIX))]
 
         if sortMode == 'date':
             # Sort files by creation time
-            with BusyCursor():
-                for f in files:
-                    if f not in self.cTimeCache:
-                        self.cTimeCache[f] = self._getFileCTime(f)
+            missing = self._missingCTimes(files)
+            if len(missing) > 0:
+                if lazy:
+                    self._fetchCTimesAsync(missing, files)
+                    return sorted(files)
+                with BusyCursor():
+                    self._fetchCTimes(missing, files)
             files.sort(key=lambda f: (self.cTimeCache[f], f))  ## sort by time first, then name.
         elif sortMode == 'alpha':
             # show directories first when sorting alphabetically.
@@ -434,6 +560,102 @@ class DirHandle(FileHandle):
             raise ValueError(f'Unrecognized sort mode "{sortMode}"')
 
         self.lsCache[sortMode] = files
+        return files
+
+    def _missingCTimes(self, files):
+        """Return the names in *files* whose timestamps are not yet cached, after taking the timestamps that
+        are recorded in the index."""
+        missing = [f for f in files if f not in self.cTimeCache]
+        if len(missing) > 0 and self.isManaged():
+            index = self._readIndex(unmanagedOk=True) or {}
+            with self.lock:
+                for f in missing:
+                    with contextlib.suppress(KeyError, TypeError):
+                        self.cTimeCache[f] = index[f]['__timestamp__']
+            missing = [f for f in missing if f not in self.cTimeCache]
+        if len(missing) > 0 and not self._cTimeCacheLoaded:
+            self._loadCTimeCache(files)
+            missing = [f for f in missing if f not in self.cTimeCache]
+        return missing
+
+    def _fetchCTimes(self, files, listing):
+        """Look up the timestamps for *files* (part of the directory *listing*) and add them to cTimeCache.
+        Timestamps that are not recorded in the index are looked up in parallel."""
+        index = self._readIndex(unmanagedOk=True) if self.isManaged() else None
+        cTimes = {}
+        unindexed = []
+        for f in files:
+            try:
+                cTimes[f] = index[f]['__timestamp__']
+            except (KeyError, TypeError):
+                unindexed.append(f)
+        cTimes.update(zip(unindexed, _ctimeExecutor.map(self._getUnindexedFileCTime, unindexed)))
+        with self.lock:
+            self.cTimeCache.update(cTimes)
+            self._unindexedCTimes.update(unindexed)
+            if len(unindexed) > 0:
+                self._saveCTimeCache(listing)
+
+    def _fetchCTimesAsync(self, files, listing):
+        with self.lock:
+            if self._cTimeThread is not None:
+                return
+            self._cTimeThread = threading.Thread(
+                target=self._fetchCTimesThread, args=(files, listing), daemon=True, name=f"ls {self.shortName()}"
+            )
+            self._cTimeThread.start()
+
+    def _fetchCTimesThread(self, files, listing):
+        try:
+            self._fetchCTimes(files, listing)
+        except Exception:
+            logger.exception(f"Error while reading file timestamps in {self.name()}:")
+            return
+        finally:
+            self._cTimeThread = None
+        self.emitChanged('children')
+
+    def _cTimeCacheFile(self):
+        return os.path.join(self.path, '.index.ctimes')
+
+    @staticmethod
+    def _listingKey(listing):
+        return hashlib.sha1('\n'.join(sorted(listing)).encode('utf8')).hexdigest()
+
+    def _loadCTimeCache(self, listing):
+        """Fill cTimeCache from the file written by _saveCTimeCache, if the directory listing has not changed
+        since then."""
+        self._cTimeCacheLoaded = True
+        if not self.isManaged():
+            return
+        try:
+            with open(self._cTimeCacheFile(), 'r') as fd:
+                cache = json.load(fd)
+            if cache['listing'] != self._listingKey(listing):
+                return
+            for name, cTime in cache['files']:
+                self.cTimeCache.setdefault(name, cTime)
+                self._unindexedCTimes.add(name)
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+
+    def _saveCTimeCache(self, listing):
+        """Store the timestamps of files in *listing* that are not recorded in the index, so that later
+        sessions can sort this directory without looking each of them up again. The cache is keyed by the
+        listing; timestamps recorded in the index are always read from the index.
+
+        The cache is only written to directories that this session has already written to, so that browsing
+        a data set does not modify it.
+        """
+        if not (self.isManaged() and self._wroteIndex and os.access(self.path, os.W_OK)):
+            return
+        files = [(f, self.cTimeCache[f]) for f in listing if f in self._unindexedCTimes and f in self.cTimeCache]
+        cache = {'listing': self._listingKey(listing), 'files': files}
+        try:
+            with open(self._cTimeCacheFile(), 'w') as fd:
+                json.dump(cache, fd)
+        except (OSError, TypeError, ValueError):
+            logger.debug(f"Could not write timestamp cache for {self.name()}", exc_info=True)
 
     def __iter__(self):
         for f in self.ls():
@@ -444,6 +666,12 @@ class DirHandle(FileHandle):
             index = self._readIndex()
             with contextlib.suppress(KeyError):
                 return index[fileName]['__timestamp__']
+        return self._getUnindexedFileCTime(fileName)
+
+    def _getUnindexedFileCTime(self, fileName):
+        """Return the timestamp for a file whose timestamp is not recorded in this directory's index.
+        Does not acquire self.lock, so that it can be run from worker threads."""
+        if self.isManaged() and os.path.isdir(os.path.join(self.path, fileName)):
             # try getting time directly from file
             with contextlib.suppress(Exception):
                 return self[fileName].info()['__timestamp__']
@@ -653,7 +881,8 @@ class DirHandle(FileHandle):
 
             if append:
                 self._appendIndex({fileName: info})
-
+            elif self.journalIndex:
+                self._appendJournal(fileName, info)
             else:
                 self._writeIndex(index, lock=False)
             self.emitChanged('meta', fileName)
@@ -661,35 +890,191 @@ class DirHandle(FileHandle):
     def _readIndex(self, lock=True, unmanagedOk=False):
         with self.lock:
             indexFile = self._indexFile()
-            if self._index is None or os.path.getmtime(indexFile) != self._indexMTime:
-                if not os.path.isfile(indexFile):
-                    if unmanagedOk:
-                        return None
-                    else:
-                        raise Exception("Directory '%s' is not managed!" % (self.name()))
+            try:
+                stat = os.stat(indexFile)
+            except FileNotFoundError:
+                if unmanagedOk:
+                    return None
+                else:
+                    raise Exception("Directory '%s' is not managed!" % (self.name()))
+            if self._index is None or (stat.st_mtime_ns, stat.st_size) != self._indexStat:
                 try:
-                    self._index = readConfigFile(indexFile, np=np)
-                    self._indexMTime = os.path.getmtime(indexFile)
-                except:
+                    if self._index is None or not self._readIndexTail(stat):
+                        with open(indexFile, 'rb') as fd:
+                            data = fd.read()
+                        index = OrderedDict()
+                        self._journalCount = _mergeIndexText(index, data.decode())
+                        self._index = index
+                        self._indexStat = (stat.st_mtime_ns, len(data))
+                        self._indexTail = data[-self._indexTailSize:]
+                except Exception as exc:
+                    if isinstance(exc, ParseError):
+                        exc.fileName = indexFile
                     print("***************Error while reading index file %s!*******************" % indexFile)
                     raise
             return self._index
 
+    def _readIndexTail(self, stat):
+        """Merge only the records appended to the index file since it was last read.
+
+        Returns False if the file was changed in some other way and must be read in full.
+        """
+        knownSize = self._indexStat[1]
+        if stat.st_size <= knownSize:
+            return False
+        with open(self._indexFile(), 'rb') as fd:
+            fd.seek(knownSize - len(self._indexTail))
+            if fd.read(len(self._indexTail)) != self._indexTail:
+                return False
+            newData = fd.read()
+        # don't consume a record that is still being written
+        newData = newData[:newData.rfind(b'\n') + 1]
+        self._journalCount += _mergeIndexText(self._index, newData.decode())
+        self._indexStat = (stat.st_mtime_ns, knownSize + len(newData))
+        self._indexTail = (self._indexTail + newData)[-self._indexTailSize:]
+        return True
+
+    def _statIndex(self):
+        stat = os.stat(self._indexFile())
+        return stat.st_mtime_ns, stat.st_size
+
+    def _indexWritten(self):
+        """Record the state of the index file after we have written to it."""
+        self._wroteIndex = True
+        self._indexStat = self._statIndex()
+        with open(self._indexFile(), 'rb') as fd:
+            fd.seek(max(0, self._indexStat[1] - self._indexTailSize))
+            self._indexTail = fd.read()
+        self._indexFileExists = True
+
     def _writeIndex(self, newIndex, lock=True):
         with self.lock:
             writeConfigFile(newIndex, self._indexFile())
             self._index = newIndex
-            self._indexMTime = os.path.getmtime(self._indexFile())
-            self._indexFileExists = True
+            self._journalCount = 0
+            self._setCompacted()
+            self._indexGeneration += 1
+            self._indexWritten()
 
     def _appendIndex(self, info):
         with self.lock:
             indexFile = self._indexFile()
             appendConfigFile(info, indexFile)
-            self._indexFileExists = True
             for k in info:
                 self._index[k] = info[k]
-            self._indexMTime = os.path.getmtime(indexFile)
+            self._indexWritten()
+
+    def _appendJournal(self, fileName, info):
+        """Append a record to the index file that updates the existing entry for *fileName* with *info*."""
+        with self.lock:
+            lines = genString({fileName: info}).splitlines()
+            record = '\n'.join([_JOURNAL_START] + [_JOURNAL_LINE + line for line in lines]) + '\n'
+            with open(self._indexFile(), 'at') as fd:
+                fd.write(record)
+            self._journalCount += 1
+            self._indexWritten()
+            with _uncompactedDirsLock:
+                _uncompactedDirs.add(self)
+            self._scheduleCompaction()
+
+    def _setCompacted(self):
+        if self._journalCount == 0:
+            with _uncompactedDirsLock:
+                _uncompactedDirs.discard(self)
+
+    def flushIndex(self, timeout=10.0):
+        """Compact the index file now (see _compactIndex), waiting for a compaction that is already running in the
+        background. Returns False if journal records remain after *timeout* seconds."""
+        with self.lock:
+            if self._compactTimer is not None:
+                self._compactTimer.cancel()
+                self._compactTimer = None
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                if self.path is None or not os.path.exists(self._indexFile()):
+                    # moved, deleted, or removed from disk by someone else
+                    with _uncompactedDirsLock:
+                        _uncompactedDirs.discard(self)
+                    return True
+                if self._journalCount == 0 and not self._compacting:
+                    self._setCompacted()
+                    return True
+                waiting = self._compacting
+            if time.monotonic() > deadline:
+                return False
+            if waiting:
+                time.sleep(0.01)
+            else:
+                self._compactIndex()
+
+    def _scheduleCompaction(self):
+        """Start the background timer that will compact the index file, or hurry it along if too many
+        journal records have accumulated. Must be called with the lock held."""
+        if self._compacting or self._journalCount == 0:
+            return
+        delay = 0 if self._journalCount >= self.maxJournalRecords else self.compactionDelay
+        if self._compactTimer is not None:
+            if delay > 0:
+                return
+            self._compactTimer.cancel()
+        self._compactTimer = threading.Timer(delay, self._compactIndex)
+        self._compactTimer.daemon = True
+        self._compactTimer.start()
+
+    def _compactIndex(self):
+        """Rewrite the index file with all journal records folded in.
+
+        The new file is generated and written without holding the lock; any records appended in the meantime
+        are copied onto the end of the new file before it replaces the old one.
+        """
+        with self.lock:
+            if self._compacting:
+                return
+            self._compactTimer = None
+            if self.path is None or self._journalCount == 0:
+                self._setCompacted()
+                return
+            self._compacting = True
+            index = self._readIndex(lock=False)
+            text = genString(index)
+            indexFile = self._indexFile()
+            generation = self._indexGeneration
+            journalCount = self._journalCount
+            size = self._indexStat[1]
+
+        tmpFile = indexFile + '.compact'
+        try:
+            with open(tmpFile, 'wt') as fd:
+                fd.write(text)
+            with self.lock:
+                self._compacting = False
+                if self.path is None or self._indexFile() != indexFile:
+                    # moved or deleted while we were working
+                    os.remove(tmpFile)
+                    return
+                if self._indexGeneration != generation or self._statIndex() != self._indexStat:
+                    # rewritten or modified by someone else while we were working; try again later
+                    os.remove(tmpFile)
+                    self._scheduleCompaction()
+                    return
+                with open(indexFile, 'rb') as src, open(tmpFile, 'ab') as dst:
+                    src.seek(size)
+                    dst.write(src.read(self._indexStat[1] - size))
+                os.replace(tmpFile, indexFile)
+                self._journalCount -= journalCount
+                self._indexGeneration += 1
+                self._indexWritten()
+                if self._journalCount > 0:
+                    self._scheduleCompaction()
+                else:
+                    self._setCompacted()
+        except Exception:
+            logger.exception(f"Error while compacting index file {indexFile}:")
+            with self.lock:
+                self._compacting = False
+            with contextlib.suppress(OSError):
+                os.remove(tmpFile)
 
     def checkIndex(self):
         ind = self._readIndex(unmanagedOk=True)
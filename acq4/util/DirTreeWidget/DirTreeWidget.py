@@ -247,7 +247,7 @@ class DirTreeWidget(Qt.QTreeWidget):
         """Make sure all children are present and in the correct order"""
         scroll = self.verticalScrollBar().value()
         handle = self.handle(root)
-        files = handle.ls(sortMode=self.sortMode)
+        files = handle.ls(sortMode=self.sortMode, lazy=True)
         handles = [handle[f] for f in files]
         i = 0
         while True:
@@ -306,7 +306,7 @@ class DirTreeWidget(Qt.QTreeWidget):
         if handle is None:
             return
         
-        for f in handle.ls(useCache=useCache):
+        for f in handle.ls(useCache=useCache, lazy=True):
             #print "Add handle", f
             try:
                 childHandle = handle[f]
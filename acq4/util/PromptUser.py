@@ -1,11 +1,11 @@
 from threading import Event
 
-from acq4.util import Qt
+from acq4.util import Qt, executor
 from acq4.util.future import future_wrap
 from acq4.util.threadrun import runInGuiThread
 
 
-@future_wrap
+@future_wrap(executor=executor.DEDICATED)
 def prompt(title, text, choices, extra_text=None, parent=None, _future=None):
     """
     Prompt the user with a choice.
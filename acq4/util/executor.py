@@ -0,0 +1,295 @@
+"""Named, bounded thread pools used to run Futures.
+
+Futures started with executeInThread() (including every @future_wrap call) run on one of these pools rather
+than on a new thread per call. Two pools are provided by default:
+
+* ``'io'`` for device communication (stage moves, frame acquisition, pressure changes, ...)
+* ``'compute'`` for CPU-bound work such as path planning
+
+Long-running jobs (for example a patch state that runs until it is told to stop) should use
+``DEDICATED`` instead, which gives them a thread of their own.
+
+A worker that blocks waiting for another Future (in Future.wait, waitFor or sleep) does not count against the
+size of its pool while it waits, so jobs that wait on other jobs in the same pool cannot deadlock it.
+"""
+from __future__ import annotations
+
+import collections
+import contextlib
+import os
+import threading
+import time
+
+from acq4.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEDICATED = 'dedicated'  # executor name that runs each job in a new thread
+
+_local = threading.local()
+
+
+class ExecutorPool:
+    """A bounded pool of daemon worker threads.
+
+    Workers are started as needed, up to *maxWorkers* running at once, and exit after *idleTimeout* seconds
+    without work. Jobs wait in an unbounded FIFO queue; a warning is logged (at most every 10 s) when a job
+    waits longer than *slowQueueWarning* seconds before starting.
+    """
+
+    def __init__(self, name: str, maxWorkers: int, idleTimeout: float = 10.0, slowQueueWarning: float = 1.0):
+        self.name = name
+        self.idleTimeout = idleTimeout
+        self.slowQueueWarning = slowQueueWarning
+        self._maxWorkers = maxWorkers
+        self._cond = threading.Condition()
+        self._queue = collections.deque()
+        self._workers = set()
+        self._idle = 0
+        self._blocked = 0
+        self._shutdown = False
+        self._lastWarning = 0.0
+        self._threadCount = 0
+        self._active = 0
+        self.resetStats()
+
+    @property
+    def maxWorkers(self) -> int:
+        return self._maxWorkers
+
+    def setMaxWorkers(self, n: int):
+        with self._cond:
+            self._maxWorkers = n
+            self._startWorkersIfNeeded()
+
+    def submit(self, fn, *args, **kwds):
+        """Queue fn(*args, **kwds) to be called in a worker thread. Exceptions raised by *fn* are logged."""
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError(f"Executor pool '{self.name}' has been shut down.")
+            self._queue.append((time.perf_counter(), fn, args, kwds))
+            self._submitted += 1
+            self._maxQueued = max(self._maxQueued, len(self._queue))
+            if self._idle > 0:
+                self._cond.notify()
+            self._startWorkersIfNeeded()
+
+    def _startWorkersIfNeeded(self):
+        # must be called with self._cond held
+        while len(self._queue) > self._idle and len(self._workers) - self._blocked < self._maxWorkers:
+            self._threadCount += 1
+            thread = threading.Thread(
+                target=self._run, daemon=True, name=f"{self.name} executor worker {self._threadCount}")
+            self._workers.add(thread)
+            thread.start()
+
+    def _run(self):
+        _local.pool = self
+        _local.blockDepth = 0
+        thread = threading.current_thread()
+        while True:
+            with self._cond:
+                while not self._queue and not self._shutdown:
+                    self._idle += 1
+                    notified = self._cond.wait(self.idleTimeout)
+                    self._idle -= 1
+                    if not notified and not self._queue:
+                        break
+                # retire when there is nothing to do, or when blocked workers have resumed and the pool is
+                # over its limit
+                if not self._queue or len(self._workers) - self._blocked > self._maxWorkers:
+                    self._workers.discard(thread)
+                    self._cond.notify_all()
+                    return
+                queuedAt, fn, args, kwds = self._queue.popleft()
+                self._active += 1
+            start = time.perf_counter()
+            latency = start - queuedAt
+            if latency > self.slowQueueWarning and start - self._lastWarning > 10.0:
+                self._lastWarning = start
+                logger.warning(
+                    f"Job waited {latency:.2f}s to start in executor pool '{self.name}' "
+                    f"({self._maxWorkers} workers); consider a larger pool or a dedicated thread.")
+            try:
+                fn(*args, **kwds)
+            except Exception:
+                logger.exception(f"Unhandled error in executor pool '{self.name}'")
+            finally:
+                runTime = time.perf_counter() - start
+                with self._cond:
+                    self._active -= 1
+                    self._completed += 1
+                    self._totalLatency += latency
+                    self._maxLatency = max(self._maxLatency, latency)
+                    self._totalRunTime += runTime
+
+    @contextlib.contextmanager
+    def _blocking(self):
+        with self._cond:
+            self._blocked += 1
+            self._startWorkersIfNeeded()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._blocked -= 1
+
+    def stats(self) -> dict:
+        """Return a dict describing the current state of the pool and the jobs it has run since the last
+        resetStats(). Times are in seconds."""
+        with self._cond:
+            completed = max(self._completed, 1)
+            return {
+                'name': self.name,
+                'maxWorkers': self._maxWorkers,
+                'workers': len(self._workers),
+                'active': self._active,
+                'blocked': self._blocked,
+                'queued': len(self._queue),
+                'maxQueued': self._maxQueued,
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'meanQueueLatency': self._totalLatency / completed,
+                'maxQueueLatency': self._maxLatency,
+                'meanRunTime': self._totalRunTime / completed,
+            }
+
+    def resetStats(self):
+        with self._cond:
+            self._submitted = 0
+            self._completed = 0
+            self._maxQueued = len(self._queue)
+            self._totalLatency = 0.0
+            self._maxLatency = 0.0
+            self._totalRunTime = 0.0
+
+    def shutdown(self, wait=True, timeout=None):
+        """Stop accepting jobs; workers exit once the queue is empty."""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+            workers = list(self._workers)
+        if wait:
+            for w in workers:
+                if w is not threading.current_thread():
+                    w.join(timeout)
+
+
+_pools: dict[str, ExecutorPool] = {}
+_poolsLock = threading.Lock()
+_defaultPoolSizes = {
+    'io': 32,
+    'compute': os.cpu_count() or 4,
+}
+
+
+def getPool(name: str) -> ExecutorPool:
+    """Return the pool with the given name, creating it if needed.
+
+    Pools other than the defaults ('io', 'compute') are created with 4 workers unless they have been
+    configured with configurePool() first.
+    """
+    with _poolsLock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = ExecutorPool(name, _defaultPoolSizes.get(name, 4))
+        return pool
+
+
+def configurePool(name: str, maxWorkers: int) -> ExecutorPool:
+    """Create the named pool, or change the number of workers in an existing one."""
+    with _poolsLock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = ExecutorPool(name, maxWorkers)
+            return pool
+    pool.setMaxWorkers(maxWorkers)
+    return pool
+
+
+def poolStats() -> dict[str, dict]:
+    """Return stats() for every pool that has been created."""
+    with _poolsLock:
+        pools = list(_pools.values())
+    return {pool.name: pool.stats() for pool in pools}
+
+
+def submit(executor: str, fn, args=(), kwds=None, threadName=None):
+    """Run fn(*args, **kwds) on the named pool, or in a new thread if *executor* is DEDICATED.
+
+    Returns the new thread for DEDICATED jobs, otherwise None.
+    """
+    kwds = {} if kwds is None else kwds
+    if executor == DEDICATED:
+        thread = threading.Thread(target=fn, args=args, kwargs=kwds, daemon=True, name=threadName)
+        thread.start()
+        return thread
+    getPool(executor).submit(fn, *args, **kwds)
+    return None
+
+
+def parallelMap(executor: str, fn, items) -> list:
+    """Call fn(item) for every item and return the results in order.
+
+    The calling thread works through the items together with as many helpers on the named pool as the pool
+    allows, so that a busy pool delays nothing. If any call raised an exception, the first one (in item order) is
+    re-raised after all items have been processed.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    errors = [None] * len(items)
+    cond = threading.Condition()
+    state = {'next': 0, 'helpers': 0}
+
+    def work():
+        while True:
+            with cond:
+                i = state['next']
+                if i >= len(items):
+                    return
+                state['next'] += 1
+            try:
+                results[i] = fn(items[i])
+            except Exception as exc:
+                errors[i] = exc
+
+    def helper():
+        try:
+            work()
+        finally:
+            with cond:
+                state['helpers'] -= 1
+                cond.notify_all()
+
+    maxWorkers = (os.cpu_count() or 4) if executor == DEDICATED else getPool(executor).maxWorkers
+    nHelpers = min(len(items) - 1, maxWorkers)
+    for i in range(nHelpers):
+        with cond:
+            state['helpers'] += 1
+        submit(executor, helper)
+    work()
+    with blocking(), cond:
+        cond.wait_for(lambda: state['helpers'] == 0)
+    for exc in errors:
+        if exc is not None:
+            raise exc
+    return results
+
+
+@contextlib.contextmanager
+def blocking():
+    """Context manager marking the current thread as blocked waiting on other work.
+
+    When called from a pool worker, another worker may be started while this one waits, so that queued jobs
+    are not starved. Elsewhere this does nothing.
+    """
+    pool = getattr(_local, 'pool', None)
+    if pool is None or _local.blockDepth > 0:
+        yield
+        return
+    _local.blockDepth += 1
+    try:
+        with pool._blocking():
+            yield
+    finally:
+        _local.blockDepth -= 1
@@ -21,6 +21,7 @@ from scipy.signal import deconvolve
 
 from MetaArray import MetaArray
 from acq4.util import Qt
+from acq4.util.image_registration import windowSum
 
 try:
     import scipy.weave as weave
@@ -1178,7 +1179,89 @@ def stdFilter(data, kernShape):
         res[tuple(ind)] = np.std(data[tuple(sl)])
     return res
 
-def makeDispMap(im1, im2, maxDist=10, searchRange=None, normBlur=5.0, matchSize=10., printProgress=False, showProgress=False, method="diffNoise"):
+def matchBlock(im1, im2, block, searchRange):
+    """Find the offset at which the region *block* (row slice, column slice) of im2 best matches im1.
+    
+    Candidate positions are scored by normalized cross-correlation, computed for all offsets in *searchRange* at
+    once using an FFT for the correlation and integral images for the local normalization. Only offsets that
+    place the block entirely within im1 are considered.
+    
+    Return ((i, j), error) using the same conventions as makeDispMap: im2[y, x] matches im1[y-i, x-j], and
+    error is 1 - correlation (0 for a perfect match, 2 for a perfect inverse match). Return None if the block
+    has no contrast or no offset in the search range fits within im1.
+    """
+    rows, cols = block
+    tmpl = im2[rows, cols].astype(np.float64)
+    shape = tmpl.shape
+    tmpl = tmpl - tmpl.mean()
+    tmplNorm = np.sqrt((tmpl**2).sum())
+    
+    # range of im1 positions that the block may be matched against
+    r0 = max(0, rows.start - (searchRange[0][1]-1))
+    r1 = min(im1.shape[0] - shape[0], rows.start - searchRange[0][0])
+    c0 = max(0, cols.start - (searchRange[1][1]-1))
+    c1 = min(im1.shape[1] - shape[1], cols.start - searchRange[1][0])
+    if tmplNorm == 0 or r1 < r0 or c1 < c0:
+        return None
+    rgn = im1[r0:r1+shape[0], c0:c1+shape[1]].astype(np.float64)
+    rgn -= rgn.mean()  # reduces round-off error in the integral images
+    
+    # since tmpl is zero-mean, correlating against the raw region gives the covariance numerator
+    num = scipy.signal.fftconvolve(rgn, tmpl[::-1, ::-1], mode='valid')
+    n = shape[0] * shape[1]
+    var = windowSum(rgn**2, shape) - windowSum(rgn, shape)**2 / n
+    
+    # positions with (almost) no contrast in im1 are never considered a match
+    valid = var > 1e-9 * n * rgn.var()
+    ncc = np.zeros(var.shape)
+    if not valid.any():
+        return None
+    ncc[valid] = num[valid] / (np.sqrt(var[valid]) * tmplNorm)
+    
+    u, v = np.unravel_index(np.argmax(ncc), ncc.shape)
+    offset = (rows.start - (r0 + u), cols.start - (c0 + v))
+    return offset, 1.0 - min(ncc[u, v], 1.0)
+
+
+def makeBlockDispMap(im1, im2, searchRange, blockSize=20, workers=None, printProgress=False):
+    """Generate a displacement map by block matching (see matchBlock). 
+    Return a tuple of two images (displacement, error) in the same format as makeDispMap; every pixel in a
+    block is assigned that block's offset and error. Blocks with no valid match are given offset (0, 0) and
+    error 2.0.
+    
+    Blocks are matched in parallel by *workers* forked processes (None to use one per CPU; requires fork()
+    and runs serially on windows).
+    """
+    import pyqtgraph.multiprocess as mp
+    
+    blockSize = int(blockSize)
+    blockRows = [slice(y, min(y+blockSize, im2.shape[0])) for y in range(0, im2.shape[0], blockSize)]
+    blockCols = [slice(x, min(x+blockSize, im2.shape[1])) for x in range(0, im2.shape[1], blockSize)]
+    
+    # each task matches one row of blocks to keep inter-process traffic low
+    results = []
+    with mp.Parallelize(tasks=enumerate(blockRows), results=results, workers=workers) as tasker:
+        for i, rows in tasker:
+            tasker.results.append((i, [matchBlock(im1, im2, (rows, cols), searchRange) for cols in blockCols]))
+    
+    matchOffset = np.zeros(im2.shape + (2,), dtype=int)
+    bestMatch = np.full(im2.shape, 2.0)
+    nMatched = 0
+    for i, matches in results:
+        for cols, match in zip(blockCols, matches):
+            if match is None:
+                continue
+            matchOffset[blockRows[i], cols] = match[0]
+            bestMatch[blockRows[i], cols] = match[1]
+            nMatched += 1
+        
+    if printProgress:
+        print("Matched %d / %d blocks" % (nMatched, len(blockRows) * len(blockCols)))
+        
+    return (matchOffset, bestMatch)
+
+
+def makeDispMap(im1, im2, maxDist=10, searchRange=None, normBlur=5.0, matchSize=10., printProgress=False, showProgress=False, method="diffNoise", workers=None):
     """Generate a displacement map that can be used to distort one image to match another. 
     Return a tuple of two images (displacement, goodness).
     
@@ -1195,12 +1278,21 @@ def makeDispMap(im1, im2, maxDist=10, searchRange=None, normBlur=5.0, matchSize=
         im1dist = scipy.ndimage.geometric_transform(im1, lambda x: (x[0]-dmb[x[0]], x[1]-dmb[x[1]]))
         
         (See also: matchDistortImg)
+        
+    method may be 'diffNoise', 'diff' (both test every offset across the whole image), or 'ncc' (normalized
+    cross-correlation of blocks of size 2*matchSize, computed for all offsets at once by FFT; see 
+    makeBlockDispMap). For 'ncc', the returned goodness is 1 - correlation, and blocks are matched in parallel
+    by *workers* processes.
     """
     im1 = im1.astype(np.float32)
     im2 = im2.astype(np.float32)
     
     if searchRange is None:
         searchRange = [[-maxDist, maxDist+1], [-maxDist, maxDist+1]]
+    searchRange = [[int(np.floor(a)), int(np.ceil(b))] for a, b in searchRange]
+    
+    if method == 'ncc':
+        return makeBlockDispMap(im1, im2, searchRange, blockSize=max(4, int(round(2*matchSize))), workers=workers, printProgress=printProgress)
     
     bestMatch = np.empty(im2.shape, dtype=float)
     bmSet = False
@@ -1270,8 +1362,11 @@ def makeDispMap(im1, im2, maxDist=10, searchRange=None, normBlur=5.0, matchSize=
 
 
             
-def matchDistortImg(im1, im2, scale=4, maxDist=40, mapBlur=30, showProgress=False):
-    """Distort im2 to fit optimally over im1. Searches scaled-down images first to determine range"""
+def matchDistortImg(im1, im2, scale=4, maxDist=40, mapBlur=30, showProgress=False, method='ncc', workers=None):
+    """Distort im2 to fit optimally over im1. Searches scaled-down images first to determine range.
+    
+    *method* and *workers* are passed to makeDispMap.
+    """
 
     ## Determine scale and offset factors needed to match histograms
     for i in range(3):
@@ -1290,9 +1385,9 @@ def matchDistortImg(im1, im2, scale=4, maxDist=40, mapBlur=30, showProgress=Fals
     print("Scaling images down for fast displacement search")
     #im1s = downsamplend(im1, (scale,scale))
     #im2s = downsamplend(im2, (scale,scale))
-    im1s = downsample(downsample(im1, scale), scale)
-    imss = downsample(downsample(im2, scale), scale)
-    (dispMap, goodMap) = makeDispMap(im1s, im2s, maxDist=maxDist/scale, normBlur=5.0, matchSize=10., showProgress=showProgress)
+    im1s = downsample(im1, scale, axis=(0, 1))
+    im2s = downsample(im2, scale, axis=(0, 1))
+    (dispMap, goodMap) = makeDispMap(im1s, im2s, maxDist=int(np.ceil(maxDist/scale)), normBlur=5.0, matchSize=10., showProgress=showProgress, method=method, workers=workers)
     #showImg(make3Color(r=dispMap[..., 0], g=dispMap[..., 1], b=goodMap), title="Rough displacement map")
     
     
@@ -1308,7 +1403,7 @@ def matchDistortImg(im1, im2, scale=4, maxDist=40, mapBlur=30, showProgress=Fals
     
     ## Determine range of displacements to search, exclude border pixels
     ## TODO: this should exclude regions of the image which obviously do not match, rather than just chopping out the borders.
-    dmCrop = dispMap[border:-border, border:-border]
+    dmCrop = dispMap[border:-border, border:-border] if min(dispMap.shape[:2]) > 2*border else dispMap
     search = [
         [scale*(dmCrop[...,0].min()-1), scale*(dmCrop[...,0].max()+1)], 
         [scale*(dmCrop[...,1].min()-1), scale*(dmCrop[...,1].max()+1)]
@@ -1317,7 +1412,7 @@ def matchDistortImg(im1, im2, scale=4, maxDist=40, mapBlur=30, showProgress=Fals
     
     
     ## Generate full-size displacement map
-    (dispMap2, goodMap2) = makeDispMap(im1, im2, searchRange=search, normBlur=2*scale, matchSize=5.*scale, showProgress=showProgress)
+    (dispMap2, goodMap2) = makeDispMap(im1, im2, searchRange=search, normBlur=2*scale, matchSize=5.*scale, showProgress=showProgress, method=method, workers=workers)
     if showProgress:
         imws.append(showImg(make3Color(r=dispMap2[..., 0], g=dispMap2[..., 1], b=goodMap2), title="Full displacement map"))
     
@@ -1330,7 +1425,8 @@ def matchDistortImg(im1, im2, scale=4, maxDist=40, mapBlur=30, showProgress=Fals
     
     ## Generate matched images
     print("Distorting image to match..")
-    im2d = scipy.geometric_transform(im2, lambda x: (x[0] + (dm2Blur[x[0], x[1], 0]), x[1] + (dm2Blur[x[0], x[1], 1])))
+    coords = np.indices(im2.shape).astype(np.float32) + np.rollaxis(dm2Blur, 2)
+    im2d = scipy.ndimage.map_coordinates(im2, coords, order=1)
     
     if showProgress:
         for w in imws:
@@ -11,7 +11,7 @@ from typing import Any, Callable, ParamSpec, Optional, overload
 from typing import Generic, TypeVar
 
 from acq4.logging_config import get_logger
-from acq4.util import Qt, ptime
+from acq4.util import Qt, executor as _executor, ptime
 from pyqtgraph import FeedbackButton
 
 FUTURE_RETVAL_TYPE = TypeVar("FUTURE_RETVAL_TYPE")
@@ -102,16 +102,19 @@ class Future(Qt.QObject, Generic[FUTURE_RETVAL_TYPE]):
     def __repr__(self):
         return f"<{self.__class__.__name__} {self._name}>"
 
-    def executeInThread(self, func, args, kwds):
+    def executeInThread(self, func, args, kwds, executor='io'):
         """Execute the specified function in a separate thread.
 
         The function should call _taskDone() when finished (or raise an exception).
+
+        *executor* names the pool from acq4.util.executor that runs the function ('io' or 'compute' by default),
+        or is executor.DEDICATED to start a new thread for long-running functions.
         """
-        self._executingThread = threading.Thread(target=self.executeAndSetReturn, args=(func, args, kwds), daemon=True,
-                                                 name=f"execute thread for {repr(self)}")
-        self._executingThread.start()
+        _executor.submit(
+            executor, self.executeAndSetReturn, (func, args, kwds), threadName=f"execute thread for {repr(self)}")
 
     def executeAndSetReturn(self, func, args, kwds):
+        self._executingThread = threading.current_thread()
         try:
             kwds["_future"] = self
             self.setResult(rval=func(*args, **kwds))
@@ -302,19 +305,22 @@ class Future(Qt.QObject, Generic[FUTURE_RETVAL_TYPE]):
 
         If a timeout is specified and the task takes too long, then raise Future.Timeout.
         If the task ends incomplete for another reason, then raise RuntimeError.
-        """
-        start = ptime.time()
-        while True:
-            if (timeout is not None) and (ptime.time() > start + timeout):
-                raise self.Timeout(f"Timeout waiting for task {self} to complete.")
 
-            if self.isDone():
-                break
-
-            if updates is True:
-                Qt.QTest.qWait(min(1, int(pollInterval * 1000)))
-            else:
-                self._wait(pollInterval)
+        Without *updates*, this returns as soon as the future finishes; *pollInterval* only limits how long
+        to go between calls to isDone() (for subclasses that reimplement it).
+        """
+        deadline = None if timeout is None else ptime.time() + timeout
+        with _executor.blocking():
+            while not self.isDone():
+                remaining = None if deadline is None else deadline - ptime.time()
+                if remaining is not None and remaining <= 0:
+                    raise self.Timeout(f"Timeout waiting for task {self} to complete.")
+                interval = pollInterval if remaining is None else min(pollInterval, remaining)
+
+                if updates is True:
+                    Qt.QTest.qWait(min(1, int(interval * 1000)))
+                else:
+                    self._wait(interval)
 
         if self.wasInterrupted():
             err = self.errorMessage()
@@ -357,13 +363,14 @@ class Future(Qt.QObject, Generic[FUTURE_RETVAL_TYPE]):
         """Sleep for the specified duration (in seconds) while checking for stop requests."""
         stop = ptime.time() + duration
         self.checkStop()
-        while True:
-            now = ptime.time()
-            if now > stop:
-                return
+        with _executor.blocking():
+            while True:
+                now = ptime.time()
+                if now > stop:
+                    return
 
-            time.sleep(max(0.0, min(interval, stop - now)))
-            self.checkStop()
+                time.sleep(max(0.0, min(interval, stop - now)))
+                self.checkStop()
 
     def waitFor(self, future: Future[WAITING_RETVAL_TYPE], timeout=20.0) -> Future[WAITING_RETVAL_TYPE]:
         """Wait for another future to complete while also checking for stop requests on self."""
@@ -429,8 +436,9 @@ WRAPPED_FN_RETVAL_TYPE = TypeVar("WRAPPED_FN_RETVAL_TYPE")
 
 
 class FutureWrapper:
-    def __init__(self, logLevel='debug'):
+    def __init__(self, logLevel='debug', executor='io'):
         self.logLevel = logLevel
+        self.executor = executor
 
     @overload
     def __call__(
@@ -444,11 +452,12 @@ class FutureWrapper:
         self,
         func: None = None,
         *,
-        logLevel: str,
+        logLevel: str = None,
+        executor: str = None,
     ) -> "FutureWrapper":
         ...
 
-    def __call__(self, func=None, *, logLevel=None):
+    def __call__(self, func=None, *, logLevel=None, executor=None):
         """Decorator to execute a function in a Thread wrapped in a future. The function must take a Future
         named "_future" as a keyword argument. This Future can be variously used to checkStop() the
         function, wait for other futures, and will be returned by the decorated function call. The function
@@ -462,11 +471,17 @@ class FutureWrapper:
                 ...
             result = myFunc(arg1, arg2).getResult()
             threadless_result = myFunc(arg1, arg2, block=True).getResult()
+
+        Calls run on the 'io' executor pool unless another is given (see acq4.util.executor)::
+
+            @future_wrap(executor='compute')
+            def planPath(start, stop, _future=None):
+                ...
         """
-        if logLevel is not None:
+        if logLevel is not None or executor is not None:
             if func is not None:
-                raise ValueError(f"Cannot have func {func} and logLevel {logLevel}")
-            return FutureWrapper(logLevel)
+                raise ValueError(f"Cannot have func {func} and logLevel {logLevel} / executor {executor}")
+            return FutureWrapper(logLevel or self.logLevel, executor or self.executor)
 
         @functools.wraps(func)
         def wrapper(*args: WRAPPED_FN_PARAMS.args, **kwds: WRAPPED_FN_PARAMS.kwargs) -> Future[WRAPPED_FN_RETVAL_TYPE]:
@@ -480,7 +495,7 @@ class FutureWrapper:
                 future.executeAndSetReturn(func, args, kwds)
                 future.wait()
             else:
-                future.executeInThread(func, args, kwds)
+                future.executeInThread(func, args, kwds, executor=self.executor)
             return future
 
         return wrapper
@@ -9,6 +9,7 @@ entering python code used to generate waveforms. Functions available
 for evaluation are provided in waveforms.py.
 """
 
+import ast
 from collections import OrderedDict
 
 import numpy as np
@@ -27,6 +28,8 @@ Ui_Form = Qt.importTemplate('.GeneratorTemplate')
 
 class StimGenerator(Qt.QWidget):
     
+    cacheSize = 256 * 2**20  ## maximum number of bytes held in the waveform cache
+
     sigDataChanged = Qt.Signal()        ## Emitted when the output of getSingle() is expected to have changed
     sigStateChanged = Qt.Signal()       ## Emitted when the output of saveState() is expected to have changed
     sigParametersChanged = Qt.Signal()  ## Emitted when the sequence parameter space has changed
@@ -46,9 +49,9 @@ class StimGenerator(Qt.QWidget):
         
         self.pSpace = None    ## cached sequence parameter space
         
-        self.cache = {}       ## cached waveforms
-        self.cacheRate = None
-        self.cacheNPts = None
+        self.cache = WaveformCache(self.cacheSize)  ## cached waveforms and function terms
+        self._compiled = None  ## CompiledFunction for the current function string
+        self._namespace = None  ## (rate, nPts, arg, funcNs, extraNs) evaluation namespace, minus sequence parameters
         
         self.meta = {  ## holds some extra information about signals (units, expected scale and range, etc)
                        ## mostly information useful in configuring SpinBoxes
@@ -105,8 +108,7 @@ class StimGenerator(Qt.QWidget):
         This allows, for example, writing a pulse waveform such that 0 is 
         always assumed to mean the current holding value."""
         if self.offset != o:
-            self.offset = o
-            self.clearCache()
+            self.offset = o  ## cached waveforms are keyed by offset; no need to clear the cache
             self.autoUpdate()
             
     def setMeta(self, axis, **args):
@@ -122,7 +124,12 @@ class StimGenerator(Qt.QWidget):
         self.stimParams.setMeta(axis, self.meta[axis])
 
     def clearCache(self):
-        self.cache = {}
+        self.cache.clear()
+        self._namespace = None
+
+    def cacheStats(self):
+        """Return a dict of waveform cache statistics (hits, misses, evictions, entries, nbytes, maxBytes)."""
+        return self.cache.stats()
     
     def functionString(self):
         return str(self.ui.functionText.toPlainText())
@@ -313,7 +320,7 @@ class StimGenerator(Qt.QWidget):
     def flatParamSpace(self):
         """return a list of every point in the parameter space"""
         l = self.listSequences()
-        shape = tuple(l.values())
+        shape = tuple(len(v) for v in l.values())
         ar = np.ones(shape)
         return np.argwhere(ar)
         
@@ -333,92 +340,126 @@ class StimGenerator(Qt.QWidget):
         """
         Return a single generated waveform (possibly cached) with the given sample rate
         number of samples, and sequence parameters.        
+
+        When the function is a sum of terms (as generated by the simple stimulus editor), each term
+        is cached separately, keyed only by the sequence parameters it uses. Terms that do not
+        change across a sequence are therefore generated once for the entire sequence.
         """
         if params is None:
             params = {}
-            
-        if self.cacheRate != rate or self.cacheNPts != nPts:
-            self.clearCache()
-            
-        paramKey = tuple(params.items())
-        if paramKey in self.cache:
-            return self.cache[paramKey]
-            
-        self.cacheRate = rate
-        self.cacheNPts = nPts
-            
-        ## create namespace with generator functions. 
-        ##   - iterates over all functions provided in waveforms module
-        ##   - wrap each function to automatically provide rate and nPts arguments
-        ns = {}
-        #arg = {'rate': rate * self.timeScale, 'nPts': nPts}
-        arg = {'rate': rate, 'nPts': nPts}
-        ns.update(arg)  ## copy rate and nPts to eval namespace
-        for i in dir(waveforms):
-            obj = getattr(waveforms, i)
-            if type(obj) is types.FunctionType:
-                ns[i] = self.makeWaveFunction(i, arg)
-        
-        ## add current sequence parameter values into namespace
+        fn = self.compiledFunction()
+
+        ## values of all sequence parameters for this point
         seq = self.paramSpace() # -- this is where the Laser bug was happening -- seq becomes 'Pulse_sum', but params was {'power.Pulse_sum': x}, so the default value is always used instead (fixed by removing 'power.' before the params are sent to stimGenerator, but perhaps there is a better place to fix this)
+        seqValues = {}
         for k in seq:
             if k in params:  ## select correct value from sequence list
                 try:
-                    ns[k] = float(seq[k][1][params[k]])
+                    seqValues[k] = float(seq[k][1][params[k]])
                 except IndexError:
                     print("Requested value %d for param %s, but only %d in the param list." % (params[k], str(k), len(seq[k][1])))
                     raise
             else:  ## just use single value
-                ns[k] = float(seq[k][0])
+                seqValues[k] = float(seq[k][0])
 
-        ## add units into namespace
-        ns.update(units.allUnits)
-        
-        ## add extra parameters to namespace
-        ns.update(self.extraParams)
+        paramKey = tuple(params.items())
+        termKeys = [fn.termKey(i, rate, nPts, seqValues, paramKey) for i in range(len(fn.terms))]
+        waveKey = ('wave', rate, nPts, self.offset, fn.source, tuple(termKeys))
+        cached = self.cache.get(waveKey, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        ## evaluate each term (or reuse it from the cache) and add them together
+        ret = None
+        message = None
+        for i, (sign, code, names, shareable) in enumerate(fn.terms):
+            term = self.cache.get(termKeys[i], _MISSING)
+            if term is _MISSING:
+                term = self._evaluate(fn, code, rate, nPts, seqValues)
+                self.cache.put(termKeys[i], term)
+            value, termMessage = term
+            if termMessage is not None:
+                message = termMessage
+            if i == 0:
+                ret = value
+            elif sign < 0:
+                ret = ret - value
+            else:
+                ret = ret + value
 
-        ## evaluate and return
-        fn = self.functionString()
-        
-        ## build global namespace with numpy imported
-        #gns = {}
-        ns['np'] = np
-        
-        #print "function: '%s'" % fn
-        if fn.strip() == '':
-            ret = np.zeros(nPts)
-        else:
-            try:  # first try eval() without line breaks for backward compatibility
-                ret = eval(fn.replace('\n', ''), ns, {})
-            except SyntaxError:  # next try exec() as contents of a function
-                try:
-                    run = "\noutput=fn()\n"
-                    code = "def fn():\n" + "\n".join(["    "+l for l in fn.split('\n')]) + run
-                    #print "--- Code: ---"
-                    #print code
-                    #print "-------------"
-                    lns = {}
-                    exec(code, ns, lns)
-                    ret = lns['output']
-                except SyntaxError as err:
-                    err.lineno -= 1
-                    raise err
-                
-            
         if isinstance(ret, np.ndarray):
+            if len(fn.terms) == 1:
+                ret = ret.copy()  ## do not modify the cached term
             #ret *= self.scale
             ret += self.offset
             #print "===eval===", ret.min(), ret.max(), self.scale
         elif ret is not None:
             raise TypeError("Function must return ndarray or None.")
         
-        if 'message' in arg:
-            self.setError(arg['message'])
+        if message is not None:
+            self.setError(message)
         else:
             self.setError()
             
-        self.cache[paramKey] = ret
+        self.cache.put(waveKey, ret)
         return ret
+
+    def getSequence(self, rate, nPts):
+        """Return a list of the waveforms for every point in flatParamSpace(), in the same order.
+
+        Terms of the function that do not depend on a sequence parameter are generated only once
+        for the whole sequence (see getSingle).
+        """
+        names = list(self.listSequences().keys())
+        return [self.getSingle(rate, nPts, dict(zip(names, map(int, inds)))) for inds in self.flatParamSpace()]
+
+    def compiledFunction(self):
+        """Return the CompiledFunction for the current function string, compiling it if needed."""
+        fn = self.functionString()
+        if self._compiled is None or self._compiled.source != fn:
+            self._compiled = CompiledFunction(fn)
+        return self._compiled
+
+    def _evaluate(self, fn, code, rate, nPts, seqValues):
+        ## Evaluate one compiled term; return (value, message)
+        if code is None:
+            return np.zeros(nPts), None
+
+        ## create namespace with generator functions. 
+        ##   - iterates over all functions provided in waveforms module
+        ##   - wrap each function to automatically provide rate and nPts arguments
+        if self._namespace is None or self._namespace[:2] != (rate, nPts):
+            #arg = {'rate': rate * self.timeScale, 'nPts': nPts}
+            arg = {'rate': rate, 'nPts': nPts}
+            funcNs = {}
+            funcNs.update(arg)  ## copy rate and nPts to eval namespace
+            for i in dir(waveforms):
+                obj = getattr(waveforms, i)
+                if type(obj) is types.FunctionType:
+                    funcNs[i] = self.makeWaveFunction(i, arg)
+            ## units and extra parameters are added after (and take precedence over) sequence parameters
+            extraNs = {}
+            extraNs.update(units.allUnits)
+            extraNs.update(self.extraParams)
+            ## build global namespace with numpy imported
+            extraNs['np'] = np
+            self._namespace = (rate, nPts, arg, funcNs, extraNs)
+        _, _, arg, funcNs, extraNs = self._namespace
+        arg.pop('message', None)
+
+        ## add current sequence parameter values into namespace
+        ns = dict(funcNs)
+        ns.update(seqValues)
+        ns.update(extraNs)
+
+        ## evaluate and return
+        if fn.mode == 'eval':
+            ret = eval(code, ns, {})
+        else:
+            lns = {}
+            exec(code, ns, lns)
+            ret = lns['output']
+        return ret, arg.get('message', None)
         
     def makeWaveFunction(self, name, arg):
         ## Creates a copy of a wave function (such as steps or pulses) with the first parameter filled in
@@ -429,6 +470,137 @@ class StimGenerator(Qt.QWidget):
 
 
 
+_MISSING = object()
+
+## names whose use makes a term differ between evaluations, even with the same parameters
+_UNSHAREABLE_NAMES = {'noise', 'random'}
+
+
+class CompiledFunction:
+    """A waveform function string, compiled once.
+
+    Functions are evaluated as a single expression (ignoring line breaks) if possible, or
+    otherwise as the body of a function. Expressions that are a sum or difference of terms
+    are split so that each term can be evaluated and cached separately; *terms* is a list of
+    (sign, code, names, shareable) for each term, where *names* are the names used by the term
+    and *shareable* is False if the term may differ between evaluations (random noise).
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.terms = []
+        if source.strip() == '':
+            self.mode = 'eval'
+            self.terms.append((1, None, frozenset(), True))
+            return
+
+        try:  # first try eval() without line breaks for backward compatibility
+            tree = ast.parse(source.replace('\n', ''), mode='eval')
+        except SyntaxError:  # next try exec() as contents of a function
+            self.mode = 'exec'
+            run = "\noutput=fn()\n"
+            code = "def fn():\n" + "\n".join(["    "+l for l in source.split('\n')]) + run
+            try:
+                tree = ast.parse(code, mode='exec')
+            except SyntaxError as err:
+                err.lineno -= 1
+                raise err
+            names = self._names(tree)
+            self.terms.append((1, compile(tree, '<stimulus>', 'exec'), names, not (names & _UNSHAREABLE_NAMES)))
+            return
+
+        self.mode = 'eval'
+        for sign, node in self._splitSum(tree.body, 1):
+            names = self._names(node)
+            code = compile(ast.Expression(body=node), '<stimulus>', 'eval')
+            self.terms.append((sign, code, names, not (names & _UNSHAREABLE_NAMES)))
+
+    def termKey(self, i, rate, nPts, seqValues, paramKey):
+        """Return the cache key for term *i* given the values of all sequence parameters."""
+        sign, code, names, shareable = self.terms[i]
+        key = ('term', rate, nPts, self.source, i, tuple((k, v) for k, v in seqValues.items() if k in names))
+        if not shareable:
+            key = key + (paramKey,)
+        return key
+
+    @classmethod
+    def _splitSum(cls, node, sign):
+        ## return [(sign, node), ...] for the terms of a chain of + and - operations, left to right
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub)):
+            right = -sign if isinstance(node.op, ast.Sub) else sign
+            return cls._splitSum(node.left, sign) + [(right, node.right)]
+        return [(sign, node)]
+
+    @staticmethod
+    def _names(tree):
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name):
+                names.add(node.id)
+            elif isinstance(node, ast.Attribute):
+                names.add(node.attr)
+        return frozenset(names)
+
+
+class WaveformCache:
+    """Least-recently-used cache of generated waveforms, limited to *maxBytes* of array data.
+
+    Values are arrays, None, or tuples whose first item is an array or None.
+    """
+
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self._items = OrderedDict()  ## key: (value, nbytes), in least- to most-recently used order
+        self.nbytes = 0
+        self.resetStats()
+
+    def get(self, key, default=None):
+        item = self._items.get(key, None)
+        if item is None:
+            self.misses += 1
+            return default
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key, value):
+        arr = value[0] if isinstance(value, tuple) else value
+        nbytes = arr.nbytes if isinstance(arr, np.ndarray) else 0
+        if nbytes > self.maxBytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.nbytes -= old[1]
+        self._items[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.maxBytes:
+            _, (_, size) = self._items.popitem(last=False)
+            self.nbytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        self._items.clear()
+        self.nbytes = 0
+
+    def resetStats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._items),
+            'nbytes': self.nbytes,
+            'maxBytes': self.maxBytes,
+        }
+
+    def __len__(self):
+        return len(self._items)
+
+
 ## Old sequence parsing functions for backward compatibility:
 ##############################################################
 
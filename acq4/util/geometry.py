@@ -1,6 +1,12 @@
 from __future__ import annotations
 
+import hashlib
 import itertools
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
 from functools import cached_property
 from threading import RLock
 from typing import List, Callable, Optional, Dict, Any, Generator, Tuple
@@ -12,12 +18,15 @@ from trimesh.voxel import VoxelGrid
 
 import pyqtgraph as pg
 import pyqtgraph.opengl as gl
+from acq4.logging_config import get_logger
 from acq4.util.approx import ApproxDict, ApproxSet
 from coorx import SRT3DTransform, Transform, NullTransform, TTransform, Point, AffineTransform
 from pyqtgraph import debug
 from pyqtgraph.debug import Profiler
 from pyqtgraph.units import µm
 
+logger = get_logger(__name__)
+
 
 def truncated_cone(
     bottom_radius: float,
@@ -850,6 +859,7 @@ def rrt_connect(
     step_size: float = None,
     goal_sample_rate: float = 0.1,
     callback: Callable = None,
+    seed_path: List[np.ndarray] = None,
 ) -> List[np.ndarray]:
     """Find a path between *start* and *finish* using bidirectional RRT-Connect.
 
@@ -870,6 +880,9 @@ def rrt_connect(
         Probability of sampling the goal position directly.
     callback
         Used for debugging and visualization. Called with the current path at each iteration.
+    seed_path
+        A path previously planned between nearby endpoints. Both trees start out following as much of this path as they
+        can reach without collision, so that a similar route is usually found without any random sampling.
 
     Returns
     -------
@@ -885,6 +898,14 @@ def rrt_connect(
     start_tree = {tuple(start): RRTNode(start)}
     goal_tree = {tuple(finish): RRTNode(finish)}
 
+    if seed_path is not None and len(seed_path) > 2:
+        start_tip = _grow_along(start_tree, seed_path[1:-1], edge_cost)
+        goal_tip = _grow_along(goal_tree, seed_path[-2:0:-1], edge_cost)
+        for connect_node in (goal_tree[tuple(finish)], goal_tip):
+            if edge_cost(start_tip.position, connect_node.position) < np.inf:
+                path = start_tip.path_to_root() + connect_node.path_to_root()[::-1]
+                return simplify_path(path, edge_cost, callback)
+
     # For alternating between trees
     trees = [start_tree, goal_tree]
     goals = [finish, start]
@@ -1013,6 +1034,20 @@ def rrt_connect(
     raise ValueError("Pathfinding failed; no valid paths found after maximum iterations.")
 
 
+def _grow_along(tree: dict, waypoints, edge_cost: Callable) -> RRTNode:
+    """Extend *tree* from its root through *waypoints* for as long as the edges are free. Return the last node reached."""
+    node = next(iter(tree.values()))
+    for waypoint in waypoints:
+        waypoint = np.asarray(waypoint)
+        if tuple(waypoint) in tree or edge_cost(node.position, waypoint) == np.inf:
+            break
+        new_node = RRTNode(waypoint, node)
+        node.add_child(new_node)
+        tree[tuple(waypoint)] = new_node
+        node = new_node
+    return node
+
+
 def simplify_path_dp(path, edge_cost: Callable, viz_callback: Callable | None):
     if len(path) <= 3:
         return path
@@ -1043,14 +1078,113 @@ def simplify_path_dp(path, edge_cost: Callable, viz_callback: Callable | None):
     return result
 
 
+class PathCache:
+    """Least-recently-used cache of planned paths, so that moves requested over and over (for example, a pipette
+    cycling between its search, approach and clean positions) do not have to be planned from scratch each time.
+
+    Paths are stored under an opaque key (see GeometryMotionPlanner.path_cache_key) and a *group* (the name of the
+    traveling geometry) that limits which paths may be used to seed planning between nearby endpoints. Cached paths
+    must be checked against the current obstacles before they are used.
+
+    Parameters
+    ----------
+    max_entries : int
+        Maximum number of paths to keep.
+    warm_start_distance : float
+        Paths are only used to seed planning when both of their endpoints are within this distance of the requested
+        start and stop positions.
+    """
+
+    def __init__(self, max_entries: int = 256, warm_start_distance: float = 2e-3):
+        self.max_entries = max_entries
+        self.warm_start_distance = warm_start_distance
+        self._lock = RLock()
+        self._paths = OrderedDict()  # {key: (group, start, stop, path)}
+        self.reset_stats()
+
+    def get(self, key) -> List[np.ndarray] | None:
+        """Return the path stored under *key*, or None."""
+        with self._lock:
+            if key not in self._paths:
+                return None
+            self._paths.move_to_end(key)
+            return list(self._paths[key][3])
+
+    def nearest(self, group, start: np.ndarray, stop: np.ndarray) -> List[np.ndarray] | None:
+        """Return the path in *group* whose endpoints are closest to *start* and *stop*, or None if there is no path
+        within *warm_start_distance*."""
+        best = None
+        best_dist = self.warm_start_distance
+        with self._lock:
+            for path_group, path_start, path_stop, path in self._paths.values():
+                if path_group != group:
+                    continue
+                dist = max(np.linalg.norm(path_start - start), np.linalg.norm(path_stop - stop))
+                if dist <= best_dist:
+                    best = path
+                    best_dist = dist
+        return None if best is None else list(best)
+
+    def put(self, key, group, start: np.ndarray, stop: np.ndarray, path: List[np.ndarray]):
+        """Store *path* (including its *start* and *stop* points) under *key*."""
+        with self._lock:
+            self._paths[key] = (group, np.array(start, dtype=float), np.array(stop, dtype=float), list(path))
+            self._paths.move_to_end(key)
+            while len(self._paths) > self.max_entries:
+                self._paths.popitem(last=False)
+
+    def discard(self, key):
+        """Remove the path stored under *key*, because it is no longer free of collisions."""
+        with self._lock:
+            if self._paths.pop(key, None) is not None:
+                self._stats["invalidated"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._paths.clear()
+
+    def record(self, outcome: str, duration: float):
+        """Record how a path request was served ("hit", "warm_start" or "miss") and how long it took."""
+        with self._lock:
+            self._stats[outcome] += 1
+            self._times[outcome] += duration
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"hit": 0, "warm_start": 0, "miss": 0, "invalidated": 0}
+            self._times = {"hit": 0.0, "warm_start": 0.0, "miss": 0.0}
+
+    def stats(self) -> dict:
+        """Return request counts, the fraction of requests served from the cache, and the mean planning time (in
+        seconds) for each kind of request."""
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._paths))
+            requests = sum(self._stats[outcome] for outcome in self._times)
+            stats["hit_rate"] = self._stats["hit"] / requests if requests else 0.0
+            for outcome, total in self._times.items():
+                count = self._stats[outcome]
+                stats[f"mean_{outcome}_time"] = total / count if count else 0.0
+            return stats
+
+
 class GeometryMotionPlanner:
     _cache = {}
     _cache_lock = RLock()
+    # optional VolumeDiskCache used to persist convolved obstacles between sessions
+    disk_cache: VolumeDiskCache | None = None
+    path_cache = PathCache()
 
     @classmethod
     def clear_cache(cls):
         with cls._cache_lock:
             cls._cache = {}
+        cls.path_cache.clear()
+
+    @classmethod
+    def set_disk_cache(cls, cache: VolumeDiskCache | None):
+        """Set the VolumeDiskCache that convolved obstacles are loaded from and saved to (None to disable)."""
+        with cls._cache_lock:
+            cls.disk_cache = cache
 
     def __init__(self, geometries: Dict[Geometry, Transform], voxel_size: float = 200 * µm):
         """
@@ -1184,6 +1318,7 @@ class GeometryMotionPlanner:
         bounds=None,
         callback=None,
         visualizer: "VisualizePathPlan" = None,
+        use_path_cache: bool = True,
     ):
         """
         Return a path from *start* to *stop* in the global coordinate system that *traveling_object* can follow to avoid
@@ -1201,6 +1336,10 @@ class GeometryMotionPlanner:
              RRT-Connect (bidirectional rapidly-exploring random tree)
              volume.check_edge_collision
 
+        Paths are remembered in GeometryMotionPlanner.path_cache. If the same move (to within one voxel) was planned
+        before with the obstacles in the same place, the old path is reused after checking that it is still free of
+        collisions. Otherwise, a path previously planned between nearby endpoints is used to seed RRT-Connect.
+
         Parameters
         ----------
         traveler : Geometry
@@ -1218,6 +1357,8 @@ class GeometryMotionPlanner:
             Planes that define the bounds of the space in which the path is to be found.
         visualizer : VisualizePathPlan or None
             If not None, a VisualizePathPlan to visualize the path planning process.
+        use_path_cache : bool
+            If False, always plan the path from scratch.
 
         Returns
         -------
@@ -1239,6 +1380,7 @@ class GeometryMotionPlanner:
 
         obstacles = self.make_convolved_obstacles(traveler, to_global_from_traveler, visualizer)
         profile.mark("made convolved obstacles")
+        start_time = time.perf_counter()
 
         for i, _o in enumerate(obstacles):
             obst_volume, to_global_from_obst, obst_name = _o
@@ -1283,29 +1425,85 @@ class GeometryMotionPlanner:
                 curr = Point(curr.coordinates + step, start.system)
             return edge_dist
 
-        # Calculate appropriate step size based on voxel size and distance
-        distance = np.linalg.norm(stop.coordinates - start.coordinates)
-        step_size = min(distance / 10, self.voxel_size * 5)
-        step_size = max(step_size, self.voxel_size)
-
-        # Use RRT-Connect for pathfinding
-        path = rrt_connect(
-            start.coordinates,
-            stop.coordinates,
-            edge_cost_intersection,
-            max_iterations=4000,
-            step_size=step_size,
-            goal_sample_rate=0.2,
-            callback=callback,
-        )
-
-        profile.mark("RRT-Connect")
+        path = None
+        seed_path = None
+        if use_path_cache:
+            cache_key = self.path_cache_key(traveler, to_global_from_traveler, start.coordinates, stop.coordinates)
+            cached = self.path_cache.get(cache_key)
+            if cached is not None:
+                path = [start.coordinates] + cached[1:-1] + [stop.coordinates]
+                if not all(edge_cost_intersection(a, b) < np.inf for a, b in zip(path[:-1], path[1:])):
+                    self.path_cache.discard(cache_key)
+                    seed_path = path
+                    path = None
+            else:
+                seed_path = self.path_cache.nearest(traveler.name, start.coordinates, stop.coordinates)
+            profile.mark("checked path cache")
+
+        if path is None:
+            # Calculate appropriate step size based on voxel size and distance
+            distance = np.linalg.norm(stop.coordinates - start.coordinates)
+            step_size = min(distance / 10, self.voxel_size * 5)
+            step_size = max(step_size, self.voxel_size)
+
+            # Use RRT-Connect for pathfinding
+            path = rrt_connect(
+                start.coordinates,
+                stop.coordinates,
+                edge_cost_intersection,
+                max_iterations=4000,
+                step_size=step_size,
+                goal_sample_rate=0.2,
+                callback=callback,
+                seed_path=seed_path,
+            )
+            profile.mark("RRT-Connect")
+            if use_path_cache:
+                self.path_cache.put(cache_key, traveler.name, start.coordinates, stop.coordinates, path)
+                self.path_cache.record(
+                    "miss" if seed_path is None else "warm_start", time.perf_counter() - start_time
+                )
+        else:
+            self.path_cache.record("hit", time.perf_counter() - start_time)
 
         if callback:
             callback(path, skip=1)
         profile.finish()
         return path[1:] if len(path) > 1 else path
 
+    def path_cache_key(self, traveler: Geometry, to_global_from_traveler: Transform, start, stop) -> tuple:
+        """Return the key under which a path for *traveler* from *start* to *stop* is stored in the path cache.
+
+        Start and stop are quantized to the voxel size. The key also covers the orientation of the traveler and the
+        position and orientation of every obstacle; the traveler's own position is already given by *start*.
+        """
+
+        def quantized(coords):
+            return tuple(np.round(np.asarray(coords, dtype=float) / self.voxel_size).astype(int).tolist())
+
+        def transform_state(transform, include_offset=True):
+            matrix = transform.full_matrix
+            state = tuple((np.round(matrix[:3, :3], 6).ravel() + 0.0).tolist())
+            if include_offset:
+                state += quantized(matrix[:3, 3])
+            return state
+
+        obstacles = tuple(
+            sorted(
+                (obst.name, transform_state(to_global))
+                for obst, to_global in self.geometries.items()
+                if obst is not traveler
+            )
+        )
+        return (
+            traveler.name,
+            self.voxel_size,
+            transform_state(to_global_from_traveler, include_offset=False),
+            obstacles,
+            quantized(start),
+            quantized(stop),
+        )
+
     def make_convolved_obstacles(self, traveler, to_global_from_traveler, visualizer=None):
         obstacles = []
         for obst, to_global_from_obst in self.geometries.items():
@@ -1314,14 +1512,9 @@ class GeometryMotionPlanner:
             cache_key = (obst.name, traveler.name)
             with self._cache_lock:
                 if cache_key not in self._cache:
-                    convolved_obst = obst.make_convolved_voxels(
-                        traveler,
-                        to_global_from_obst.inverse * to_global_from_traveler,
-                        self.voxel_size,
+                    self._cache[cache_key] = self._load_or_make_convolved_obstacle(
+                        obst, traveler, to_global_from_obst.inverse * to_global_from_traveler
                     )
-                    # TODO is this bad? explicitly setting transforms frequently is...
-                    convolved_obst.transform = obst.transform * convolved_obst.transform
-                    self._cache[cache_key] = convolved_obst
                 obst_volume = self._cache[cache_key]
 
             obstacles.append((obst_volume, to_global_from_obst, obst.name))
@@ -1331,6 +1524,160 @@ class GeometryMotionPlanner:
                 )
         return obstacles
 
+    def _load_or_make_convolved_obstacle(self, obst, traveler, to_obst_parent_from_traveler_parent):
+        disk_cache = self.disk_cache
+        if disk_cache is not None:
+            disk_key = self.disk_cache_key(obst, traveler, to_obst_parent_from_traveler_parent)
+            convolved_obst = disk_cache.get(disk_key)
+            if convolved_obst is not None:
+                return convolved_obst
+
+        convolved_obst = obst.make_convolved_voxels(
+            traveler, to_obst_parent_from_traveler_parent, self.voxel_size
+        )
+        # TODO is this bad? explicitly setting transforms frequently is...
+        convolved_obst.transform = obst.transform * convolved_obst.transform
+        if disk_cache is not None:
+            disk_cache.put(disk_key, convolved_obst)
+        return convolved_obst
+
+    def disk_cache_key(
+        self, obst: Geometry, traveler: Geometry, to_obst_parent_from_traveler_parent: Transform
+    ) -> str:
+        """Return the key used to store the convolution of *obst* and *traveler* in a VolumeDiskCache.
+
+        The key is a hash of both geometry definitions (mesh, local transform and coordinate system names), the
+        voxel size, and the orientation of the traveler relative to the obstacle. Like the in-memory cache, it ignores
+        the translation between the two, which only changes where the convolved volume is placed.
+        """
+        key = hashlib.sha1(f"{VolumeDiskCache.format_version} {self.voxel_size!r}".encode())
+        for geom in (obst, traveler):
+            key.update(f"{geom.name}\0{geom.parent_name}\0".encode())
+            key.update(np.ascontiguousarray(geom.mesh.vertices, dtype=float).tobytes())
+            key.update(np.ascontiguousarray(geom.mesh.faces, dtype=np.int64).tobytes())
+            key.update(np.ascontiguousarray(geom.transform.full_matrix, dtype=float).tobytes())
+        # rounding hides float noise in transforms that are rebuilt from device positions (+ 0.0 drops the sign of -0)
+        rotation = np.round(to_obst_parent_from_traveler_parent.full_matrix[:3, :3], 6) + 0.0
+        key.update(np.ascontiguousarray(rotation, dtype=float).tobytes())
+        return key.hexdigest()
+
+
+class VolumeDiskCache:
+    """Content-addressed store of Volumes on disk, used to keep convolved obstacles between sessions.
+
+    Each Volume is written to a compressed ``<key>.npz`` file in *path*. When the files in the cache exceed *max_bytes*,
+    the least recently used entries are deleted.
+
+    Parameters
+    ----------
+    path : str
+        Directory holding the cache files (created if needed).
+    max_bytes : int
+        Maximum total size of the cache files.
+    """
+
+    # increment when the way volumes are computed or stored changes, so that stale entries are not loaded
+    format_version = 1
+
+    def __init__(self, path: str, max_bytes: int = 2 * 2**30):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        os.makedirs(path, exist_ok=True)
+        self._lock = RLock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+
+    def _filename(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.npz")
+
+    def get(self, key: str) -> Volume | None:
+        """Return the Volume stored under *key*, or None if there is none."""
+        filename = self._filename(key)
+        try:
+            with np.load(filename) as data:
+                volume = data["volume"]
+                transform = pickle.loads(data["transform"].tobytes())
+            os.utime(filename)  # mark as recently used
+        except FileNotFoundError:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        except Exception:
+            logger.warning(f"Discarding unreadable geometry cache file {filename}", exc_info=True)
+            with self._lock:
+                self._stats["errors"] += 1
+                self._stats["misses"] += 1
+                self._remove(filename)
+            return None
+        with self._lock:
+            self._stats["hits"] += 1
+        return Volume(volume, transform)
+
+    def put(self, key: str, volume: Volume):
+        """Store *volume* under *key*, then evict old entries if the cache has grown too large."""
+        filename = self._filename(key)
+        # write to a temporary file first so that readers (possibly in other processes) never see a partial file
+        tmp_filename = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_filename, "wb") as fh:
+                np.savez_compressed(
+                    fh,
+                    volume=volume.volume,
+                    transform=np.frombuffer(pickle.dumps(volume.transform), dtype=np.uint8),
+                )
+            os.replace(tmp_filename, filename)
+        except Exception:
+            logger.warning(f"Could not write geometry cache file {filename}", exc_info=True)
+            with self._lock:
+                self._stats["errors"] += 1
+                self._remove(tmp_filename)
+            return
+        with self._lock:
+            self._stats["writes"] += 1
+            self._evict()
+
+    def _entries(self) -> list:
+        """Return [(mtime, size, filename), ...] for all entries, oldest first."""
+        entries = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if not entry.name.endswith(".npz"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, filename in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(filename)
+            total -= size
+            self._stats["evictions"] += 1
+
+    @staticmethod
+    def _remove(filename):
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """Delete all entries."""
+        with self._lock:
+            for _, _, filename in self._entries():
+                self._remove(filename)
+
+    def stats(self) -> dict:
+        """Return hit/miss/write/eviction counts along with the current number and total size of entries."""
+        with self._lock:
+            entries = self._entries()
+            return dict(self._stats, entries=len(entries), bytes=sum(size for _, size, _ in entries))
+
 
 def point_in_bounds(point, bounds):
     """Return True if the given point is inside the given bounds.
@@ -1,4 +1,8 @@
+import threading
+import time
+
 import numpy as np
+import scipy.fft
 import scipy.ndimage
 import pyqtgraph as pg
 
@@ -31,7 +35,12 @@ def imageTemplateMatch(img, template, unsharp=3):
     return pos, val, cc
 
 
-def iterativeImageTemplateMatch(img, template, dsVals=(4, 2, 1), matchFn=imageTemplateMatch):
+def downsamplePyramid(img, dsVals=(4, 2, 1)):
+    """Return a list of copies of *img* downsampled along both axes by each value in *dsVals*."""
+    return [pg.downsample(pg.downsample(img, n, axis=0), n, axis=1) for n in dsVals]
+
+
+def iterativeImageTemplateMatch(img, template, dsVals=(4, 2, 1), matchFn=imageTemplateMatch, imgPyramid=None, templatePyramid=None):
     """Match a template to image data iteratively using successively higher resolutions.
 
     Return the (x, y) pixel offset of the template and a value indicating the strength of the match.
@@ -40,9 +49,12 @@ def iterativeImageTemplateMatch(img, template, dsVals=(4, 2, 1), matchFn=imageTe
     iteratively re-matching at higher resolutions. The *dsVals* argument lists the downsampling values
     that will be used, in order. Each value in this list must be an integer multiple of
     the value that follows it.
+
+    When matching repeatedly against the same image or template, the result of downsamplePyramid() for either may be
+    given as *imgPyramid* or *templatePyramid* to avoid recomputing it; *img* / *template* are then ignored.
     """
-    imgDs = [pg.downsample(pg.downsample(img, n, axis=0), n, axis=1) for n in dsVals]
-    tmpDs = [pg.downsample(pg.downsample(template, n, axis=0), n, axis=1) for n in dsVals]
+    imgDs = list(downsamplePyramid(img, dsVals) if imgPyramid is None else imgPyramid)
+    tmpDs = downsamplePyramid(template, dsVals) if templatePyramid is None else templatePyramid
     offset = np.array([0, 0])
     for i, ds in enumerate(dsVals):
         pos, val, cc = matchFn(imgDs[i], tmpDs[i])
@@ -58,3 +70,170 @@ def iterativeImageTemplateMatch(img, template, dsVals=(4, 2, 1), matchFn=imageTe
             end = offset + np.array(tmpDs[i+1].shape) + 3
             end = np.clip(end, 0, imgDs[i+1].shape)
             imgDs[i+1] = imgDs[i+1][offset[0]:end[0], offset[1]:end[1]]
+
+
+def windowSum(data, shape):
+    """Sum of *data* over every window of *shape* that fits within the last two axes (computed from an integral image)."""
+    ii = np.zeros(data.shape[:-2] + (data.shape[-2] + 1, data.shape[-1] + 1))
+    ii[..., 1:, 1:] = data.cumsum(axis=-2).cumsum(axis=-1)
+    h, w = shape
+    return ii[..., h:, w:] - ii[..., :-h, w:] - ii[..., h:, :-w] + ii[..., :-h, :-w]
+
+
+class TemplateMatcher:
+    """Match one template against many images, iteratively at successively higher resolutions.
+
+    This gives the same results as iterativeImageTemplateMatch, but the template pyramid, its normalization, and its
+    FFT are computed once and reused for every image of a given size. Correlations are computed with FFTs just large
+    enough for each image (rather than image+template as in skimage.feature.match_template), and a stack of images
+    may be matched at once with matchMany().
+
+    Timing for the most recent call is available in lastTiming, and totals in stats().
+    """
+
+    def __init__(self, template, dsVals=(4, 2, 1), unsharp=3, maxSpectra=32):
+        for i in range(len(dsVals) - 1):
+            if dsVals[i] % dsVals[i+1] != 0:
+                raise ValueError("dsVals must satisfy constraint: dsVals[i] == dsVals[i+1] * int(x)")
+        self.dsVals = tuple(dsVals)
+        self.unsharp = unsharp
+        self.maxSpectra = maxSpectra
+        self.pyramid = downsamplePyramid(np.asarray(template, dtype=float), self.dsVals)
+        # zero-mean template and its sum of squared deviations at each level
+        self._levels = []
+        for tmpl in self.pyramid:
+            tmpl = tmpl - tmpl.mean()
+            self._levels.append((tmpl, (tmpl**2).sum()))
+        self._spectra = {}  # (level, fftShape): spectrum of the flipped, zero-mean template
+        self._lock = threading.Lock()
+        self.lastTiming = None
+        self._calls = 0
+        self._images = 0
+        self._totalTime = 0.0
+
+    @property
+    def shape(self):
+        """Shape of the full-resolution template."""
+        return self.pyramid[-1].shape
+
+    def _spectrum(self, level, fftShape):
+        key = (level, fftShape)
+        spec = self._spectra.get(key)
+        if spec is None:
+            tmpl = self._levels[level][0]
+            spec = scipy.fft.rfft2(tmpl[::-1, ::-1], s=fftShape)
+            with self._lock:
+                if len(self._spectra) >= self.maxSpectra:
+                    del self._spectra[next(iter(self._spectra))]
+                self._spectra[key] = spec
+        return spec
+
+    def correlate(self, img, level=-1):
+        """Return the normalized cross-correlation of the template (at the given pyramid level) with *img*, for
+        every position where the template lies entirely within the image. This is equivalent to
+        skimage.feature.match_template(img, template).
+
+        *img* may be a single image or a stack of images (the last two axes are image rows and columns).
+        """
+        img = np.asarray(img, dtype=float)
+        tmpl, ssd = self._levels[level]
+        h, w = tmpl.shape
+        if img.shape[-2] < h or img.shape[-1] < w:
+            raise ValueError(f"Image ({img.shape}) must be larger than template ({tmpl.shape})")
+        # circular correlation is exact for the valid region as long as the FFT covers the image
+        fftShape = (scipy.fft.next_fast_len(img.shape[-2], real=True), scipy.fft.next_fast_len(img.shape[-1], real=True))
+        spec = self._spectrum(level % len(self._levels), fftShape)
+        numerator = scipy.fft.irfft2(scipy.fft.rfft2(img, s=fftShape) * spec, s=fftShape)
+        numerator = numerator[..., h-1:img.shape[-2], w-1:img.shape[-1]]
+
+        n = h * w
+        winSum = windowSum(img, (h, w))
+        denominator = (windowSum(img**2, (h, w)) - winSum**2 / n) * ssd
+        np.maximum(denominator, 0, out=denominator)
+        np.sqrt(denominator, out=denominator)
+        response = np.zeros_like(numerator)
+        mask = denominator > np.finfo(float).eps
+        response[mask] = numerator[mask] / denominator[mask]
+        return response
+
+    def _findPeak(self, cc):
+        # high-pass filter; we're looking for a fairly sharp peak.
+        if self.unsharp is not False:
+            sigma = (0,) * (cc.ndim - 2) + (self.unsharp, self.unsharp)
+            ccFilt = cc - scipy.ndimage.gaussian_filter(cc, sigma)
+        else:
+            ccFilt = cc
+        flat = ccFilt.reshape(-1, cc.shape[-2] * cc.shape[-1])
+        pos = np.array(np.unravel_index(np.argmax(flat, axis=1), cc.shape[-2:])).T
+        val = cc.reshape(flat.shape)[np.arange(len(flat)), np.argmax(flat, axis=1)]
+        return pos, val
+
+    def _refine(self, imgPyramid, pos, val, levelTimes):
+        """Continue matching one image from the coarsest level result; return (offset, val)"""
+        offset = np.array([0, 0])
+        for i, ds in enumerate(self.dsVals):
+            if i > 0:
+                start = time.perf_counter()
+                pos, val = self._findPeak(self.correlate(imgPyramid[i], level=i))
+                pos, val = pos[0], val[0]
+                levelTimes[i] += time.perf_counter() - start
+            if i == len(self.dsVals) - 1:
+                return offset + pos, val
+            scale = ds // self.dsVals[i+1]
+            nextImg = imgPyramid[i+1]
+            offset *= scale
+            offset += np.clip(((pos-1) * scale), 0, nextImg.shape)
+            end = offset + np.array(self.pyramid[i+1].shape) + 3
+            end = np.clip(end, 0, nextImg.shape)
+            imgPyramid[i+1] = nextImg[offset[0]:end[0], offset[1]:end[1]]
+
+    def match(self, img, imgPyramid=None):
+        """Return the (x, y) pixel offset of the template in *img* and a value indicating the strength of the match,
+        as iterativeImageTemplateMatch(img, template) would.
+
+        If the same image is matched against several templates, its downsamplePyramid() may be given as
+        *imgPyramid* (with *img* set to None) to avoid recomputing it.
+        """
+        start = time.perf_counter()
+        imgPyramid = list(downsamplePyramid(img, self.dsVals) if imgPyramid is None else imgPyramid)
+        levelTimes = [0.0] * len(self.dsVals)
+        coarseStart = time.perf_counter()
+        pos, val = self._findPeak(self.correlate(imgPyramid[0], level=0))
+        levelTimes[0] = time.perf_counter() - coarseStart
+        result = self._refine(imgPyramid, pos[0], val[0], levelTimes)
+        self._recordTiming(start, levelTimes, 1)
+        return result
+
+    def matchMany(self, images):
+        """Match the template against each image in a stack (or list of same-shape images) and return a list of
+        (offset, value) tuples. The coarsest level is matched for all images in a single batched correlation.
+        """
+        start = time.perf_counter()
+        images = np.asarray(images, dtype=float)
+        pyramids = [downsamplePyramid(img, self.dsVals) for img in images]
+        levelTimes = [0.0] * len(self.dsVals)
+        coarseStart = time.perf_counter()
+        pos, val = self._findPeak(self.correlate(np.stack([p[0] for p in pyramids]), level=0))
+        levelTimes[0] = time.perf_counter() - coarseStart
+        results = [self._refine(pyramids[i], pos[i], val[i], levelTimes) for i in range(len(images))]
+        self._recordTiming(start, levelTimes, len(images))
+        return results
+
+    def _recordTiming(self, start, levelTimes, nImages):
+        total = time.perf_counter() - start
+        with self._lock:
+            self.lastTiming = {'total': total, 'levels': dict(zip(self.dsVals, levelTimes)), 'images': nImages}
+            self._calls += 1
+            self._images += nImages
+            self._totalTime += total
+
+    def stats(self):
+        """Return a dict with the number of calls and images matched, and the total / mean time per image."""
+        with self._lock:
+            return {
+                'calls': self._calls,
+                'images': self._images,
+                'totalTime': self._totalTime,
+                'meanTimePerImage': self._totalTime / self._images if self._images else 0.0,
+                'cachedSpectra': len(self._spectra),
+            }
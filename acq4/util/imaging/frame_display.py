@@ -86,11 +86,16 @@ class FrameDisplay(Qt.QObject):
         return self.currentFrame.getImage()
 
     def newFrame(self, frame):
-        # integrate new frame into background
-        self.bgCtrl.includeNewFrame(frame)
+        self.annotateFrame(frame)
         # possibly draw the frame and update auto gain (rate limited)
         self.checkForDraw(frame)
-        # annotate frame with background and contrast info
+
+    def annotateFrame(self, frame):
+        """Integrate *frame* into the background and attach background and contrast info to it.
+
+        Unlike drawing, this must happen for every frame.
+        """
+        self.bgCtrl.includeNewFrame(frame)
         frame.addInfo(backgroundInfo=self.bgCtrl.deferredSave(), contrastInfo=self.contrastCtrl.saveState())
 
     def checkForDraw(self, frame=None):
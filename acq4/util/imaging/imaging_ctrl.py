@@ -122,6 +122,12 @@ class ImagingCtrl(Qt.QWidget):
         btn.clicked.connect(self._handleNamedVideoButtonClick)
 
     def newFrame(self, frame):
+        self.frameDisplay.annotateFrame(frame)
+        self.recordFrame(frame)
+        self.displayFrame(frame)
+
+    def recordFrame(self, frame):
+        """Update the acquisition frame rate and pass *frame* to the record thread; must see every frame."""
         # update acquisition frame rate
         now = frame.info()["time"]
         if self.lastFrameTime is not None:
@@ -143,7 +149,9 @@ class ImagingCtrl(Qt.QWidget):
         if self.ui.recordStackBtn.isChecked():
             self.ui.stackSizeLabel.setText("%d frames" % self.recordThread.stackSize)
 
-        self.frameDisplay.newFrame(frame)
+    def displayFrame(self, frame):
+        """Possibly draw *frame* (rate limited); frames may be skipped when drawing falls behind."""
+        self.frameDisplay.checkForDraw(frame)
         self.sigUpdateUi.emit()
 
     def updateUi(self):
@@ -1,13 +1,13 @@
 import time
 
 import numpy as np
-from MetaArray import MetaArray
 
 from acq4 import Manager
 from acq4.logging_config import get_logger
 from acq4.util import Qt
 from acq4.util.Mutex import Mutex
 from acq4.util.Thread import Thread
+from .stack_writer import StackWriter
 
 try:
     import acq4.filetypes.ImageFile
@@ -25,6 +25,9 @@ class RecordThread(Thread):
     sigRecordingFinished = Qt.Signal(object, object)  # file handle, num frames
     sigSavedFrame = Qt.Signal(object)
 
+    # HDF5 compression used for recorded stacks (None, 'lzf', 'gzip', ...)
+    stackCompression = None
+
     def __init__(self, ui):
         Thread.__init__(self, name="ImageRecordThread")
         self.m = Manager.getManager()
@@ -41,6 +44,7 @@ class RecordThread(Thread):
 
         # Attributes private to worker thread:
         self.currentStack = None  # file handle of currently recorded stack
+        self.stackWriter = None
         self.startFrameTime = None
         self.lastFrameTime = None
         self.currentFrameNum = 0
@@ -139,6 +143,10 @@ class RecordThread(Thread):
 
             time.sleep(100e-3)
 
+        if self.stackWriter is not None:
+            self.stackWriter.close()
+            self.stackWriter = None
+
     def handleFrames(self, frames):
         # Write as many frames into the stack as possible.
         # If False appears in the list of frames, it indicates the end of a stack
@@ -154,6 +162,8 @@ class RecordThread(Thread):
                     recFrames = []
 
                 if self.currentStack is not None:
+                    self.stackWriter.close()
+                    self.stackWriter = None
                     dur = self.lastFrameTime - self.startFrameTime
                     if dur > 0:
                         fps = (self.currentFrameNum + 1) / dur
@@ -188,32 +198,15 @@ class RecordThread(Thread):
 
         if len(recFrames) > 0:
             self.writeFrames(recFrames, dh)
-            self.currentFrameNum += len(recFrames)
 
     def writeFrames(self, frames, dh):
-        newRec = self.currentStack is None
-
-        if newRec:
+        if self.stackWriter is None:
             self.startFrameTime = frames[0][1]['time']
+            self.stackWriter = StackWriter(dh, 'video', compression=self.stackCompression)
 
-        times = [f[1]['time'] for f in frames]
+        times = np.array([f[1]['time'] for f in frames]) - self.startFrameTime
         translations = np.array([f[1]['transform'].getTranslation() for f in frames])
-        arrayInfo = [
-            {
-                'name': 'Time',
-                'values': np.array(times) - self.startFrameTime,
-                'units': 's',
-                'translation': translations,
-            },
-            {'name': 'X'},
-            {'name': 'Y'},
-        ]
-        imgs = [f[0][np.newaxis, ...] for f in frames]
-
-        data = MetaArray(np.concatenate(imgs, axis=0), info=arrayInfo)
-        if newRec:
-            self.currentStack = dh.writeFile(
-                data, 'video', autoIncrement=True, info=frames[0][1], appendAxis='Time', appendKeys=['translation']
-            )
-        else:
-            data.write(self.currentStack.name(), appendAxis='Time', appendKeys=['translation'])
+        self.currentStack = self.stackWriter.write(
+            [f[0] for f in frames], times, translations, info=frames[0][1]
+        )
+        self.currentFrameNum = self.stackWriter.frameCount
@@ -0,0 +1,126 @@
+import h5py
+import numpy as np
+from MetaArray import MetaArray
+
+from acq4.util.DataManager import DirHandle, FileHandle
+
+
+class StackWriter:
+    """Stream a sequence of image frames into a single MetaArray file.
+
+    The file is created by the first call to write(), in the same layout that
+    ``MetaArray.write(..., appendAxis='Time', appendKeys=['translation'])`` produces, so it can be
+    read back with MetaArray as usual. After that the HDF5 file stays open and new frames are written
+    directly into the chunked datasets.
+
+    The datasets grow *growBy* frames at a time (unwritten space costs nothing on disk) and are trimmed to
+    the frames actually written by close(). Each call to write() stores the number of valid frames in the
+    ``frameCount`` attribute of the data and flushes the file, so if acquisition is interrupted (crash,
+    kill, power loss) the file still holds every frame from the completed write() calls. It can be read
+    with MetaArray as is (with empty frames at the end), or trimmed first with StackWriter.recover(). At
+    most the batch being written is lost; an interruption in the middle of a flush can still corrupt the
+    HDF5 file.
+
+    Parameters
+    ----------
+    dh : DirHandle
+        Directory in which to create the file.
+    fileName : str
+        Name of the file to create; the name is auto-incremented.
+    compression : str | None
+        HDF5 compression for the image data (for example 'lzf'). Compression costs CPU time during recording.
+    growBy : int
+        Number of frames by which to grow the datasets when they are full.
+    """
+
+    def __init__(self, dh: DirHandle, fileName: str = 'video', compression=None, growBy: int = 64):
+        self.dh = dh
+        self.fileName = fileName
+        self.compression = compression
+        self.growBy = growBy
+        self.fileHandle = None
+        self.frameCount = 0
+        self._file = None
+        self._datasets = None
+
+    def write(self, images, times, translations, info=None) -> FileHandle:
+        """Append frames to the stack.
+
+        *images* is a sequence of 2D arrays (or a 3D array), *times* the times of the frames relative to the
+        start of the stack, and *translations* an (N, 3) array of the frame translations. *info* is the
+        meta-information to store with the file; it is only used when the file is created.
+
+        Returns the handle of the file being written.
+        """
+        times = np.asarray(times)
+        translations = np.asarray(translations)
+        if self.fileHandle is None:
+            self._create(images[:1], times[:1], translations[:1], info)
+            images, times, translations = images[1:], times[1:], translations[1:]
+
+        n = len(times)
+        if n == 0:
+            return self.fileHandle
+        start, stop = self.frameCount, self.frameCount + n
+        data, values, translation = self._datasets
+        if stop > len(values):
+            self._resize(stop + self.growBy - 1 - (stop - 1) % self.growBy)
+        data[start:stop] = images if isinstance(images, np.ndarray) else np.stack(images)
+        values[start:stop] = times
+        translation[start:stop] = translations
+        self.frameCount = stop
+        data.attrs['frameCount'] = stop
+        self._file.flush()
+        return self.fileHandle
+
+    def _create(self, images, times, translations, info):
+        arrayInfo = [
+            {'name': 'Time', 'values': times, 'units': 's', 'translation': translations},
+            {'name': 'X'},
+            {'name': 'Y'},
+        ]
+        data = MetaArray(np.stack(images), info=arrayInfo)
+        kwargs = {}
+        if self.compression is not None:
+            kwargs['compression'] = self.compression
+        self.fileHandle = self.dh.writeFile(
+            data, self.fileName, autoIncrement=True, info=info, appendAxis='Time', appendKeys=['translation'],
+            **kwargs,
+        )
+        self._file = h5py.File(self.fileHandle.name(), 'r+')
+        axis = self._file['info']['0']
+        self._datasets = (self._file['data'], axis['values'], axis['translation'])
+        self.frameCount = len(times)
+        self._file['data'].attrs['frameCount'] = self.frameCount
+
+    def _resize(self, nFrames):
+        for ds in self._datasets:
+            ds.resize(nFrames, axis=0)
+
+    @staticmethod
+    def recover(fileName: str) -> int:
+        """Trim a stack file left by an interrupted recording to the frames that were written.
+
+        Returns the number of frames in the file.
+        """
+        with h5py.File(fileName, 'r+') as f:
+            data = f['data']
+            if 'frameCount' not in data.attrs:
+                return len(data)
+            nFrames = int(data.attrs['frameCount'])
+            axis = f['info']['0']
+            for ds in (data, axis['values'], axis['translation']):
+                ds.resize(nFrames, axis=0)
+            del data.attrs['frameCount']
+            return nFrames
+
+    def close(self):
+        """Trim the datasets to the frames written and close the file. Returns the handle of the file that was
+        written, or None if no frames were written."""
+        if self._file is not None:
+            self._resize(self.frameCount)
+            del self._datasets[0].attrs['frameCount']
+            self._file.close()
+            self._file = None
+            self._datasets = None
+        return self.fileHandle
@@ -1,10 +1,9 @@
 from __future__ import print_function, division
 
-import queue
+import heapq
+import itertools
 import weakref
-from threading import Lock, Thread, Event
-
-
+from threading import Lock
 
 from .future import Future
 
@@ -15,7 +14,9 @@ class PriorityLock(object):
     The purpose of this class is to provide a mutex that:
     - Uses futures for acquiring locks asynchronously
     - Allows locks to be acquired in priority order
-    
+
+    There is no dispatcher thread: a free lock is granted immediately by acquire(), and release() hands
+    the lock directly to the highest-priority waiting request.
     
     Examples::
        
@@ -36,57 +37,57 @@ class PriorityLock(object):
 
     def __init__(self, name=None):
         self.name = name
-        self.req_count = Counter()
-        self.lock_queue = queue.PriorityQueue()
-
-        self.unlock_event = Event()
-        self.unlock_event.set()
-
-        self.lock_thread = Thread(target=self._lock_loop, name="PriorityLockThread")
-        self.lock_thread.daemon = True
-        self.lock_thread.start()
+        self._mutex = Lock()
+        self._queue = []  # heap of (-priority, order, request)
+        self._count = itertools.count()
+        self._owner = None
 
     def acquire(self, priority=0, name=None):
         """Return a Future that completes when the lock is acquired.
         
-        Higher priority values will be locked first.
+        Higher priority values will be locked first. If the lock is free and no other requests are waiting,
+        the returned request has already acquired it.
         """
         fut = PriorityLockRequest(self, name=name)
-        # print("request lock:", fut)
-        self.lock_queue.put((-priority, next(self.req_count), fut))
+        with self._mutex:
+            if self._owner is None:
+                self._owner = fut
+                fut._acquired = True
+            else:
+                heapq.heappush(self._queue, (-priority, next(self._count), fut))
+        if fut._acquired:
+            fut._taskDone()
         return fut
 
     def _release_lock(self, fut):
-        with fut._acq_lock:
-            # print("release request:", fut)
-            if fut.released:
+        # Requests are granted synchronously in the thread that releases the lock. Futures are completed
+        # outside of self._mutex because their callbacks may acquire or release this lock again.
+        granted = None
+        with self._mutex:
+            if fut._released:
                 return
             fut._released = True
-            if fut.acquired:
-                # print("release lock:", fut)
+            cancelled = not fut._acquired
+            if fut._acquired:
                 fut._acquired = False
-                self.unlock_event.set()
-            else:
-                fut._taskDone(interrupted=True)
-
-    def _lock_loop(self):
-        while True:
-            # wait for lock to become available
-            self.unlock_event.wait()
-
-            # get next lock request
-            while True:
-                _, _, fut = self.lock_queue.get()
-                with fut._acq_lock:
-                    if fut._released:
-                        # future has already been released; don't assign lock
-                        continue
-                    # assign lock to this request
-                    # print("assign lock:", fut)
-                    fut._acquired = True
-                    fut._taskDone()
-                    self.unlock_event.clear()
-                    break
+                self._owner = None
+                granted = self._grant_next()
+        if cancelled:
+            fut._taskDone(interrupted=True)
+        if granted is not None:
+            granted._taskDone()
+
+    def _grant_next(self):
+        # must be called with self._mutex held; cancelled requests are discarded here rather than when they
+        # are released
+        while self._queue:
+            _, _, fut = heapq.heappop(self._queue)
+            if fut._released:
+                continue
+            fut._acquired = True
+            self._owner = fut
+            return fut
+        return None
 
     def __repr__(self):
         return "<%s %s 0x%x>" % (self.__class__.__name__, self.name, id(self))
@@ -94,11 +95,8 @@ class PriorityLock(object):
 
 class PriorityLockRequest(Future):
     def __init__(self, mutex, name):
-        Future.__init__(self)
+        Future.__init__(self, name="%s lock request" % mutex.name if name is None else name, logLevel=None)
         self.mutex = weakref.ref(mutex)
-        self.name = name
-        self._acq_lock = Lock()
-        self._wait_event = Event()
         self._acquired = False
         self._released = False
 
@@ -115,9 +113,6 @@ class PriorityLockRequest(Future):
         """
         return self._released
 
-    def _wait(self, timeout):
-        self._wait_event.wait(timeout=timeout)
-
     def percentDone(self):
         return 100 if (self.acquired or self.released) else 0
 
@@ -133,10 +128,6 @@ class PriorityLockRequest(Future):
             return
         mutex._release_lock(self)
 
-    def _taskDone(self, *args, **kwds):
-        self._wait_event.set()
-        Future._taskDone(self, *args, **kwds)
-
     def __enter__(self):
         return self
 
@@ -145,23 +136,3 @@ class PriorityLockRequest(Future):
 
     def __repr__(self):
         return "<%s %s 0x%x>" % (self.__class__.__name__, self.name, id(self))
-
-
-class Counter(object):
-    """Just a thread-safe counter, returns the next integer every time next() is called.
-    """
-
-    def __init__(self):
-        self.value = 0
-        self.lock = Lock()
-
-    def __iter__(self):
-        return self
-
-    def __next__(self):  # for py3
-        with self.lock:
-            self.value += 1
-            return self.value - 1
-
-    def next(self):  # for py2
-        return self.__next__()
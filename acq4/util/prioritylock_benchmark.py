@@ -0,0 +1,71 @@
+"""Measure PriorityLock acquire/release latency with and without contention.
+
+Run with::
+
+    python -m acq4.util.prioritylock_benchmark [nWaiters ...]
+
+For each number of waiting threads, every thread repeatedly acquires the lock (with a random priority), holds
+it briefly and releases it. The reported handoff latency is the time from one thread calling release() to the
+next holder returning from wait().
+"""
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .prioritylock import PriorityLock
+
+
+def uncontended(n=10000):
+    """Return the mean time (s) for one acquire() / wait() / release() cycle on a free lock."""
+    lock = PriorityLock(name="benchmark")
+    start = time.perf_counter()
+    for i in range(n):
+        req = lock.acquire()
+        req.wait()
+        req.release()
+    return (time.perf_counter() - start) / n
+
+
+def contended(nWaiters, nHandoffs=2000, holdTime=20e-6):
+    """Return an array of handoff latencies (s) with *nWaiters* threads competing for one lock."""
+    lock = PriorityLock(name="benchmark")
+    latencies = []
+    lastRelease = [None]
+    done = threading.Event()
+
+    def run():
+        rng = random.Random()
+        while not done.is_set():
+            req = lock.acquire(priority=rng.randint(0, 10))
+            req.wait()
+            if lastRelease[0] is not None:
+                latencies.append(time.perf_counter() - lastRelease[0])
+            if len(latencies) >= nHandoffs:
+                done.set()
+            end = time.perf_counter() + holdTime
+            while time.perf_counter() < end:
+                pass
+            lastRelease[0] = time.perf_counter()
+            req.release()
+
+    threads = [threading.Thread(target=run, daemon=True) for i in range(nWaiters)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return np.array(latencies)
+
+
+def main(waiterCounts):
+    print(f"uncontended acquire/release: {uncontended() * 1e6:.1f} us")
+    print(f"{'waiters':>8} {'mean (us)':>10} {'median (us)':>12} {'p99 (us)':>10}")
+    for n in waiterCounts:
+        lat = contended(n) * 1e6
+        print(f"{n:>8d} {lat.mean():>10.1f} {np.median(lat):>12.1f} {np.percentile(lat, 99):>10.1f}")
+
+
+if __name__ == '__main__':
+    main([int(n) for n in sys.argv[1:]] or [1, 2, 4, 8, 16, 32])
@@ -1,5 +1,5 @@
 from __future__ import print_function
-import tempfile, shutil, atexit, os
+import tempfile, shutil, atexit, os, subprocess, sys
 import acq4.util.DataManager as dm
 from acq4.util.DirTreeWidget import DirTreeWidget
 import pyqtgraph as pg
@@ -75,3 +75,135 @@ def test_datamanager():
     d1.delete()
     dw.rebuildTree()
     assert dw.topLevelItemCount() == 1
+
+
+def test_index_journal():
+    from pyqtgraph.configfile import readConfigFile
+
+    rh = dm.getDirHandle(root).mkdir('journal_test')
+    rh.compactionDelay = 1000  # we'll compact manually
+    f1 = rh.createFile('file1.txt', info={'a': 1})
+    f1.setInfo(b=2)
+    f1.setInfo(a=3)
+    indexFile = os.path.join(rh.name(), '.index')
+
+    # old readers can still parse the file, but do not see journaled updates
+    assert readConfigFile(indexFile)['file1.txt']['a'] == 1
+    assert rh._journalCount == 3  # includes the info set by mkdir()
+
+    # a fresh handle replays the journal
+    rh2 = dm.DirHandle(rh.name(), rh.manager)
+    assert dict(rh2._fileInfo('file1.txt')) == {'__timestamp__': f1.info()['__timestamp__'], 'a': 3, 'b': 2}
+
+    # appended updates are picked up by reading only the new records
+    f1.setInfo(c=[1, 2])
+    rh2.setInfo(d='x')
+    assert rh2._fileInfo('file1.txt')['c'] == [1, 2]
+    assert rh.info()['d'] == 'x'
+
+    rh._compactIndex()
+    assert rh._journalCount == 0
+    ind = readConfigFile(indexFile)
+    assert ind['file1.txt']['a'] == 3
+    assert ind['file1.txt']['c'] == [1, 2]
+    assert ind['.']['d'] == 'x'
+    assert dm.DirHandle(rh.name(), rh.manager)._fileInfo('file1.txt')['a'] == 3
+
+
+def test_flush_indexes():
+    from pyqtgraph.configfile import readConfigFile
+
+    rh = dm.getDirHandle(root).mkdir('flush_test')
+    rh.compactionDelay = 1000
+    f1 = rh.createFile('file1.txt', info={'a': 1})
+    f1.setInfo(a=2)
+    indexFile = os.path.join(rh.name(), '.index')
+    assert readConfigFile(indexFile)['file1.txt']['a'] == 1
+
+    # compacted synchronously at shutdown
+    dm.flushIndexes()
+    assert rh._journalCount == 0 and rh._compactTimer is None
+    assert readConfigFile(indexFile)['file1.txt']['a'] == 2
+
+
+def test_flush_indexes_at_exit():
+    from pyqtgraph.configfile import readConfigFile
+
+    path = dm.getDirHandle(root).mkdir('flush_at_exit_test').name()
+    script = (
+        "import acq4.util.DataManager as dm\n"
+        f"rh = dm.getDirHandle({path!r})\n"
+        "rh.compactionDelay = 1000\n"
+        "f = rh.createFile('file1.txt', info={'a': 1})\n"
+        "f.setInfo(a=2)\n"
+    )
+    repoDir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(dm.__file__)))))
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen', PYTHONPATH=repoDir)
+    subprocess.run([sys.executable, '-c', script], check=True, env=env, cwd=root)
+    assert readConfigFile(os.path.join(path, '.index'))['file1.txt']['a'] == 2
+
+
+def test_lazy_ls():
+    rh = dm.getDirHandle(root).mkdir('lazy_ls_test')
+    for i, name in enumerate(['c', 'a', 'b']):
+        rh.createFile(name, info={'__timestamp__': 100 - i})
+    for name in ['2020.01.02_000', '2020.01.01_000']:
+        os.mkdir(os.path.join(rh.name(), name))
+    listing = ['a', 'b', 'c', '2020.01.02_000', '2020.01.01_000']
+    byDate = ['b', 'a', 'c', '2020.01.01_000', '2020.01.02_000']
+
+    # timestamps recorded in the index are used right away; the others are looked up in the background
+    rh.cTimeCache.clear()
+    assert rh._missingCTimes(listing) == ['2020.01.02_000', '2020.01.01_000']
+    assert rh.ls(lazy=True) == sorted(listing)
+    thread = rh._cTimeThread
+    if thread is not None:
+        thread.join()
+    assert rh.ls(useCache=True) == byDate
+
+    # timestamps of unindexed files are reloaded from disk by a new handle
+    assert os.path.exists(os.path.join(rh.name(), '.index.ctimes'))
+    rh2 = dm.DirHandle(rh.name(), rh.manager)
+    assert rh2._missingCTimes(listing) == []
+    assert rh2.ls(lazy=True) == byDate
+
+    # the cache is ignored once the listing changes
+    rh.createFile('d', info={'__timestamp__': 50})
+    rh3 = dm.DirHandle(rh.name(), rh.manager)
+    assert rh3._missingCTimes(listing + ['d']) == ['2020.01.02_000', '2020.01.01_000']
+
+
+def test_ls_does_not_write_to_unmodified_dirs():
+    path = dm.getDirHandle(root).mkdir('ls_readonly_test').name()
+    for name in ['2020.01.02_000', '2020.01.01_000']:
+        os.mkdir(os.path.join(path, name))
+    rh = dm.DirHandle(path, dm.getDataManager())
+    assert rh.ls() == ['2020.01.01_000', '2020.01.02_000']
+    assert not os.path.exists(os.path.join(path, '.index.ctimes'))
+
+
+def test_handle_cache():
+    manager = dm.getDataManager()
+    maxSize = manager.maxCacheSize
+    manager.maxCacheSize = 5
+    try:
+        base = dm.getDirHandle(root).mkdir('cache_test')
+        kept = base.createFile('kept.txt')
+        for i in range(20):
+            base.createFile(f'file{i}.txt')
+        assert len(manager.cache) <= 5
+
+        # handles that are still referenced are never duplicated
+        assert dm.getFileHandle(kept.name()) is kept
+        assert dm.getDirHandle(base.name()) is base
+
+        tree = manager._getTree(base.name())
+        assert kept.name() in tree
+        assert base.name() in tree
+        assert dm.getDirHandle(root).name() not in tree
+
+        base.rename('cache_test_renamed')
+        assert kept.name() == os.path.join(root, 'cache_test_renamed', 'kept.txt')
+        assert dm.getFileHandle(kept.name()) is kept
+    finally:
+        manager.maxCacheSize = maxSize
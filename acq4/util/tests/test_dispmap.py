@@ -0,0 +1,46 @@
+import numpy as np
+import scipy.ndimage
+
+from acq4.util.functions import makeDispMap, matchBlock
+
+
+def shiftedImages(shape=(96, 96), shift=(3, -5), seed=0):
+    rng = np.random.RandomState(seed)
+    im1 = scipy.ndimage.gaussian_filter(rng.normal(size=shape), 2)
+    im2 = np.roll(im1, shift, axis=(0, 1)) + rng.normal(size=shape) * 0.01
+    return im1, im2
+
+
+def test_match_block_brute_force():
+    im1, im2 = shiftedImages(shape=(40, 40))
+    block = (slice(12, 22), slice(15, 25))
+    searchRange = [[-6, 7], [-6, 7]]
+    offset, err = matchBlock(im1, im2, block, searchRange)
+
+    # compare against normalized cross-correlation computed directly for every offset
+    tmpl = im2[block]
+    best = None
+    for i in range(*searchRange[0]):
+        for j in range(*searchRange[1]):
+            rgn = im1[block[0].start-i:block[0].stop-i, block[1].start-j:block[1].stop-j]
+            ncc = np.corrcoef(rgn.ravel(), tmpl.ravel())[0, 1]
+            if best is None or ncc > best[1]:
+                best = ((i, j), ncc)
+    assert offset == best[0] == (3, -5)
+    assert np.isclose(err, 1 - best[1])
+
+    # blocks without contrast cannot be matched
+    assert matchBlock(im1, np.zeros_like(im2), block, searchRange) is None
+
+
+def test_ncc_disp_map():
+    im1, im2 = shiftedImages()
+    serial = makeDispMap(im1, im2, maxDist=8, matchSize=5, method='ncc', workers=1)
+    offset, err = serial
+    assert offset.shape == im2.shape + (2,)
+    inner = offset[10:-10, 10:-10]
+    assert np.all(inner[..., 0] == 3) and np.all(inner[..., 1] == -5)
+    assert err[10:-10, 10:-10].max() < 0.05
+    # same result when blocks are matched in parallel
+    parallel = makeDispMap(im1, im2, maxDist=8, matchSize=5, method='ncc', workers=2)
+    assert np.array_equal(serial[0], parallel[0]) and np.array_equal(serial[1], parallel[1])
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+import scipy.ndimage
+import skimage.feature
+
+from acq4.util.image_registration import TemplateMatcher, iterativeImageTemplateMatch
+
+
+def makeScene(shape=(160, 200), seed=0):
+    rng = np.random.RandomState(seed)
+    return scipy.ndimage.gaussian_filter(rng.normal(size=shape), 2)
+
+
+def test_correlate_matches_skimage():
+    scene = makeScene()
+    tmpl = scene[40:90, 60:130] + np.random.RandomState(1).normal(size=(50, 70)) * 0.2
+    matcher = TemplateMatcher(tmpl)
+    assert np.allclose(matcher.correlate(scene), skimage.feature.match_template(scene, tmpl), atol=1e-9)
+    with pytest.raises(ValueError):
+        matcher.correlate(scene[:40])
+
+
+def test_match():
+    scene = makeScene()
+    tmpl = scene[37:91, 58:121]
+    matcher = TemplateMatcher(tmpl)
+    offset, val = matcher.match(scene)
+    assert tuple(offset) == (37, 58)
+    assert np.isclose(val, 1.0)
+    expected = iterativeImageTemplateMatch(scene, tmpl)
+    assert tuple(offset) == tuple(expected[0]) and np.isclose(val, expected[1])
+
+    # the template spectrum is computed once for each level and reused
+    matcher.match(scene + 1)
+    stats = matcher.stats()
+    assert stats['calls'] == 2 and stats['cachedSpectra'] == 3
+    assert set(matcher.lastTiming['levels']) == {4, 2, 1}
+
+
+def test_match_many():
+    scene = makeScene(shape=(200, 200))
+    tmpl = scene[80:130, 70:140]
+    images = [np.roll(scene, (i, -2 * i), axis=(0, 1)) for i in range(5)]
+    matcher = TemplateMatcher(tmpl)
+    results = matcher.matchMany(images)
+    assert [tuple(offset) for offset, val in results] == [(80 + i, 70 - 2 * i) for i in range(5)]
+    assert [tuple(matcher.match(img)[0]) for img in images] == [tuple(offset) for offset, val in results]
+    assert matcher.stats()['images'] == 10
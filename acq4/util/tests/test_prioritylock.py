@@ -1,3 +1,4 @@
+import threading
 import time
 from acq4.util.prioritylock import PriorityLock
 import acq4
@@ -33,8 +34,44 @@ def test_prioritylock():
     f2.release()
     time.sleep(0.01)
     assert all([not f1.acquired, not f2.acquired, not f3.acquired, not f4.acquired, not f5.acquired, not f6.acquired, not f7.acquired])
-    
-    
-    
+
+
+
+def test_prioritylock_handoff():
+    threads = threading.active_count()
+    l = PriorityLock(name="handoff")
+    assert threading.active_count() == threads  # no dispatcher thread
+
+    # a free lock is acquired immediately
+    f1 = l.acquire()
+    assert f1.isDone() and f1.acquired
+
+    # callbacks run when the lock is handed over, and may release it again
+    f2 = l.acquire()
+    f3 = l.acquire()
+    f2.onFinish(lambda fut: fut.release())
+    f1.release()
+    assert f2.released and f3.isDone() and f3.acquired
+
+    # requests waiting in other threads are woken by release()
+    order = []
+
+    def waiter(priority):
+        with l.acquire(priority) as req:
+            req.wait(timeout=5)
+            order.append(priority)
+
+    waiters = [threading.Thread(target=waiter, args=(p,)) for p in (1, 3, 2)]
+    for t in waiters:
+        t.start()
+    while len(l._queue) < 3:
+        time.sleep(1e-3)
+    f3.release()
+    for t in waiters:
+        t.join(timeout=5)
+    assert order == [3, 2, 1]
+    assert l.acquire().acquired
+
+
 if __name__ == '__main__':
     test_prioritylock()
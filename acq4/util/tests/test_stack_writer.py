@@ -0,0 +1,66 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+import acq4.util.DataManager as dm
+from acq4.util.imaging.stack_writer import StackWriter
+
+
+@pytest.fixture
+def tmp_dir():
+    path = tempfile.mkdtemp()
+    yield dm.getDirHandle(path)
+    shutil.rmtree(path)
+
+
+def test_stack_writer(tmp_dir):
+    frames = np.random.randint(0, 2**16, size=(25, 16, 12), dtype=np.uint16)
+    times = np.linspace(0, 1, 25)
+    translations = np.random.normal(size=(25, 3))
+
+    writer = StackWriter(tmp_dir, 'video', growBy=10)
+    fh = writer.write(frames[:3], times[:3], translations[:3], info={'binning': (1, 1)})
+    for start in range(3, 25, 7):
+        assert writer.write(list(frames[start:start + 7]), times[start:start + 7], translations[start:start + 7]) is fh
+    assert writer.frameCount == 25
+    assert len(writer._datasets[0]) == 30
+    assert writer.close() is fh
+
+    data = fh.read()
+    assert data.shape == frames.shape
+    assert np.all(data.asarray() == frames)
+    assert np.allclose(data.xvals('Time'), times)
+    assert np.allclose(data._info[0]['translation'], translations)
+    assert fh.info()['binning'] == (1, 1)
+
+
+def test_interrupted_recording(tmp_dir):
+    # a process that is killed while recording leaves a readable file with all frames written so far,
+    # followed by the empty frames that had been reserved
+    script = (
+        "import os, sys, numpy as np\n"
+        "import acq4.util.DataManager as dm\n"
+        "from acq4.util.imaging.stack_writer import StackWriter\n"
+        "writer = StackWriter(dm.getDirHandle(sys.argv[1]), 'video')\n"
+        "for i in range(5):\n"
+        "    frames = np.full((3, 16, 12), i, dtype=np.uint16)\n"
+        "    writer.write(frames, np.arange(3) + 3 * i + 1, np.zeros((3, 3)))\n"
+        "os._exit(1)\n"
+    )
+    repoDir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(dm.__file__)))))
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen', PYTHONPATH=repoDir)
+    proc = subprocess.run([sys.executable, '-c', script, tmp_dir.name()], env=env)
+    assert proc.returncode == 1
+
+    fh = tmp_dir['video_000.ma']
+    assert fh.read().shape == (64, 16, 12)
+    assert StackWriter.recover(fh.name()) == 15
+    data = fh.read()
+    assert data.shape == (15, 16, 12)
+    assert np.all(data.asarray()[:, 0, 0] == np.repeat(np.arange(5), 3))
+    assert np.all(data.xvals('Time') == np.arange(15) + 1)
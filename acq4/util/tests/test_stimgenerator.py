@@ -0,0 +1,64 @@
+import numpy as np
+import pyqtgraph as pg
+
+from acq4.util.generator.StimGenerator import StimGenerator, WaveformCache
+
+pg.mkQApp()
+
+
+def makeGenerator(function, params="amp=1;[1,2,3]\n"):
+    sg = StimGenerator()
+    sg.loadState({'function': function, 'params': params})
+    sg.cache.clear()
+    sg.cache.resetStats()
+    return sg
+
+
+def test_sequence_shares_terms():
+    sg = makeGenerator("pulse(10*ms, 5*ms, amp) + \npulse(1*ms, 2*ms, 3) - \nsteps([0, 40*ms], [0, 1])")
+    waves = sg.getSequence(1000., 50)
+    assert len(waves) == 3
+    for amp, wave in zip([1, 2, 3], waves):
+        expected = np.zeros(50)
+        expected[10:15] = amp
+        expected[1:3] = 3
+        expected[40:] -= 1
+        assert np.array_equal(wave, expected)
+    # 3 waveforms and 3 + 1 + 1 terms: the two terms that do not use 'amp' are generated once
+    assert sg.cacheStats()['misses'] == 3 + 5
+    assert sg.cacheStats()['hits'] == 4
+
+    # repeated requests come straight from the cache, and the cached data is not modified
+    # (sequence parameters are given as indices into the sequence)
+    assert sg.getSingle(1000., 50, {'amp': 0}) is waves[0]
+    sg.setOffset(1)
+    assert np.array_equal(sg.getSingle(1000., 50, {'amp': 0}), waves[0] + 1)
+
+
+def test_function_body():
+    sg = makeGenerator("x = pulse(10*ms, 5*ms, amp)\nreturn x * 2")
+    assert sg.getSingle(1000., 50, {'amp': 1}).max() == 4
+    assert sg.getSingle(1000., 50).max() == 2
+
+
+def test_noise_is_not_shared():
+    sg = makeGenerator("noise(0, 1)")
+    waves = sg.getSequence(1000., 100)
+    assert not np.array_equal(waves[0], waves[1])
+
+
+def test_cache_byte_budget():
+    cache = WaveformCache(maxBytes=2000)
+    for i in range(5):
+        cache.put(i, np.zeros(100))  # 800 bytes each
+    assert len(cache) == 2 and cache.nbytes == 1600
+    assert cache.get(0) is None
+    assert cache.get(4) is not None
+    cache.put(5, np.zeros(100))
+    assert cache.get(3) is None  # least recently used
+    assert cache.get(4) is not None
+    cache.put('large', np.zeros(1000))  # larger than the budget; not cached
+    assert cache.get('large') is None
+    stats = cache.stats()
+    assert stats['evictions'] == 4
+    assert stats['hits'] == 2 and stats['misses'] == 3
@@ -0,0 +1,58 @@
+"""Minimal stand-ins for devices and the Manager, shared by the Task tests."""
+from acq4.devices.Device import DeviceTask
+
+
+class FakeDevice:
+    allowEarlyTaskCreation = True
+
+    def __init__(self, name, rearmable=True):
+        self._name = name
+        self.rearmable = rearmable
+        self.calls = []
+
+    def name(self):
+        return self._name
+
+    def createTask(self, cmd, parentTask):
+        return FakeDeviceTask(self, cmd, parentTask)
+
+
+class FakeDeviceTask(DeviceTask):
+    def __init__(self, dev, cmd, parentTask):
+        DeviceTask.__init__(self, dev, cmd, parentTask)
+        self.runs = 0
+
+    def configure(self):
+        self.dev.calls.append('configure')
+
+    def canRearm(self):
+        return self.dev.rearmable
+
+    def rearm(self):
+        self.dev.calls.append('rearm')
+
+    def start(self):
+        self.runs += 1
+        self.dev.calls.append('start')
+
+    def getResult(self):
+        return self.runs
+
+
+class FakeLock:
+    def lock(self):
+        pass
+
+    def unlock(self):
+        pass
+
+
+class FakeManager:
+    def __init__(self, devices):
+        self.devices = {dev.name(): dev for dev in devices}
+
+    def getDevice(self, name):
+        return self.devices[name]
+
+    def reserveDevices(self, names):
+        return FakeLock()
@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from acq4.util import executor
+from acq4.util.executor import ExecutorPool
+from acq4.util.future import Future, future_wrap
+
+
+def test_pool_is_bounded():
+    pool = ExecutorPool('test-bounded', maxWorkers=2)
+    lock = threading.Lock()
+    running = []
+    peak = [0]
+    done = threading.Semaphore(0)
+
+    def job():
+        with lock:
+            running.append(1)
+            peak[0] = max(peak[0], len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+        done.release()
+
+    for _ in range(10):
+        pool.submit(job)
+    for _ in range(10):
+        assert done.acquire(timeout=5)
+    assert peak[0] == 2
+    stats = pool.stats()
+    assert stats['submitted'] == stats['completed'] == 10
+    assert stats['maxQueued'] >= 8
+    assert stats['workers'] <= 2
+    assert stats['maxQueueLatency'] > 0
+    pool.shutdown()
+    assert pool.stats()['workers'] == 0
+
+
+def test_waiting_does_not_deadlock():
+    pool = executor.configurePool('test-nested', 1)
+    threads = set()
+
+    @future_wrap(executor='test-nested')
+    def inner(_future):
+        threads.add(threading.current_thread())
+        return 'inner'
+
+    @future_wrap(executor='test-nested')
+    def outer(_future):
+        threads.add(threading.current_thread())
+        # the only worker waits for a job queued behind it
+        return _future.waitFor(inner()).getResult()
+
+    assert outer().getResult(timeout=5) == 'inner'
+    assert len(threads) == 2
+    assert pool.stats()['blocked'] == 0
+    pool.shutdown()
+
+
+def test_workers_are_reused():
+    pool = executor.configurePool('test-reuse', 1)
+    threads = []
+
+    @future_wrap(executor='test-reuse')
+    def job(_future):
+        threads.append(threading.current_thread())
+
+    for _ in range(5):
+        job().wait(timeout=5)
+    assert len(set(threads)) == 1
+    assert threads[0].name.startswith('test-reuse executor worker')
+    pool.shutdown()
+
+
+def test_dedicated_thread():
+    fut = Future()
+    fut.executeInThread(lambda _future: threading.current_thread(), (), {}, executor=executor.DEDICATED)
+    thread = fut.getResult(timeout=5)
+    assert thread.name.startswith('execute thread for')
+    assert 'test-bounded' not in executor.poolStats()  # unnamed pools are not created
+
+
+def test_parallel_map():
+    pool = executor.configurePool('test-map', 2)
+    threads = set()
+
+    def square(x):
+        threads.add(threading.current_thread())
+        time.sleep(0.01)
+        return x * x
+
+    assert executor.parallelMap('test-map', square, range(6)) == [0, 1, 4, 9, 16, 25]
+    # the calling thread helps the pool workers
+    assert threading.current_thread() in threads and len(threads) <= 3
+
+    def fail(x):
+        if x % 2:
+            raise ValueError(x)
+        return x
+
+    with pytest.raises(ValueError) as exc:
+        executor.parallelMap('test-map', fail, range(4))
+    assert exc.value.args == (1,)
+    pool.shutdown()
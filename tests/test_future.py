@@ -41,7 +41,8 @@ class TestFutureButton(unittest.TestCase):
         @future_wrap
         def task(_future=None):
             raise ValueError("error")
-        self.future_producer.return_value = task()
+        self.future_producer.return_value = fut = task()
+        fut.finishedEvent.wait(5)  # the task runs in a worker thread; make sure it has failed before clicking
         self.button.click()
         QApplication.processEvents()
         self.assertEqual("Failed", self.button.text())
@@ -1,3 +1,4 @@
+import os
 import time
 
 import numpy as np
@@ -6,7 +7,7 @@ import pytest
 from acq4.modules.Visualize3D import VisualizerWindow
 from acq4.util import Qt
 from acq4.util.geometry import Geometry, Volume, Plane, Line, point_in_bounds
-from acq4.util.geometry import GeometryMotionPlanner
+from acq4.util.geometry import GeometryMotionPlanner, PathCache, VolumeDiskCache
 from coorx import NullTransform, TTransform, SRT3DTransform, Transform
 from coorx import Point
 
@@ -705,7 +706,7 @@ def test_cylinder_pathfinding_performance():
     print(f"Running {iterations} benchmark iterations...")
     for i in range(iterations):
         start_time = time.time()
-        path = planner.find_path(traveler, traveler_to_global, start, end)
+        path = planner.find_path(traveler, traveler_to_global, start, end, use_path_cache=False)
         elapsed = time.time() - start_time
         times.append(elapsed)
         path_lengths.append(len(path))
@@ -723,6 +724,144 @@ def test_cylinder_pathfinding_performance():
     return avg_time, avg_path_length, path
 
 
+def test_disk_cache(geometry, tmp_path):
+    voxel_size = 0.1
+    traveler = Geometry({"type": "box", "size": [0.3, 0.3, 0.3]}, "traveler_mesh", "traveler")
+    geometry_to_global = NullTransform(3, from_cs=geometry.parent_name, to_cs="global")
+    planner = GeometryMotionPlanner({geometry: geometry_to_global}, voxel_size)
+    cache = VolumeDiskCache(str(tmp_path))
+    GeometryMotionPlanner.set_disk_cache(cache)
+    try:
+        traveler_to_global = TTransform(offset=(2, 0, 0), from_cs=traveler.parent_name, to_cs="global")
+        (computed, _, _), = planner.make_convolved_obstacles(traveler, traveler_to_global)
+        assert cache.stats()["writes"] == 1 and cache.stats()["entries"] == 1
+
+        # a new session loads the volume from disk; translating the traveler does not change the key
+        GeometryMotionPlanner.clear_cache()
+        traveler_to_global = TTransform(offset=(-1, 3, 0), from_cs=traveler.parent_name, to_cs="global")
+        (loaded, _, _), = planner.make_convolved_obstacles(traveler, traveler_to_global)
+        assert cache.stats()["hits"] == 1
+        assert np.array_equal(loaded.volume, computed.volume)
+        assert np.allclose(loaded.transform.full_matrix, computed.transform.full_matrix)
+        assert loaded.transform.systems == computed.transform.systems
+
+        # rotating the traveler or changing the voxel size does
+        rotated = SRT3DTransform(angle=30, axis=(0, 1, 0), from_cs=traveler.parent_name, to_cs="global")
+        keys = {
+            planner.disk_cache_key(geometry, traveler, traveler_to_global),
+            planner.disk_cache_key(geometry, traveler, rotated),
+            GeometryMotionPlanner({}, 0.2).disk_cache_key(geometry, traveler, traveler_to_global),
+        }
+        assert len(keys) == 3
+    finally:
+        GeometryMotionPlanner.set_disk_cache(None)
+
+
+def test_disk_cache_eviction(tmp_path):
+    vol = Volume(np.random.RandomState(0).rand(20, 20, 20) > 0.5, TTransform(offset=(1, 2, 3)))
+    cache = VolumeDiskCache(str(tmp_path))
+    cache.put("a", vol)
+    size = cache.stats()["bytes"]
+    cache.max_bytes = int(size * 2.5)
+    cache.put("b", vol)
+    os.utime(tmp_path / "a.npz", (0, 0))
+    os.utime(tmp_path / "b.npz", (1, 1))
+    assert cache.get("a") is not None  # "a" is now the most recently used entry
+    cache.put("c", vol)
+    assert cache.get("b") is None
+    assert np.array_equal(cache.get("a").volume, vol.volume)
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+
+    # unreadable entries are discarded
+    (tmp_path / "c.npz").write_bytes(b"garbage")
+    assert cache.get("c") is None
+    assert cache.stats()["errors"] == 1 and not (tmp_path / "c.npz").exists()
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+
+def test_disk_cache_is_opt_in(tmp_path):
+    from acq4.devices.Pipette.planners import configureGeometryDiskCache
+
+    class FakeManager:
+        def __init__(self, misc):
+            self.config = {"misc": misc}
+
+        def userCacheDir(self):
+            return str(tmp_path)
+
+    try:
+        configureGeometryDiskCache(FakeManager({}))
+        assert GeometryMotionPlanner.disk_cache is None
+        configureGeometryDiskCache(FakeManager({"geometryCache": {"maxSize": 1e6}}))
+        assert GeometryMotionPlanner.disk_cache.path == str(tmp_path / "geometry_cache")
+    finally:
+        GeometryMotionPlanner.set_disk_cache(None)
+
+
+def assert_path_clear(path, start, geometry):
+    for a, b in zip([start] + path[:-1], path):
+        for t in np.linspace(0, 1, 20):
+            assert not geometry.contains(a + t * (b - a))
+
+
+def test_path_cache(geometry, monkeypatch):
+    monkeypatch.setattr(GeometryMotionPlanner, "path_cache", PathCache(warm_start_distance=1.0))
+    voxel_size = 0.1
+    geometry_to_global = NullTransform(3, from_cs=geometry.parent_name, to_cs="global")
+    planner = GeometryMotionPlanner({geometry: geometry_to_global}, voxel_size)
+    traveler = Geometry(
+        {"type": "box", "size": [voxel_size, voxel_size, voxel_size]}, "traveler_mesh", "traveler"
+    )
+    traveler_to_global = NullTransform(3, from_cs=traveler.parent_name, to_cs="global")
+    start = np.array([0, 0, -2.0])
+    stop = np.array([0, 0, 3.0])
+    path = planner.find_path(traveler, traveler_to_global, start, stop)
+    assert GeometryMotionPlanner.path_cache.stats()["miss"] == 1
+
+    # the same move, give or take a fraction of a voxel, reuses the path
+    path2 = planner.find_path(traveler, traveler_to_global, start + 0.01, stop)
+    assert all(np.array_equal(a, b) for a, b in zip(path, path2)) and len(path) == len(path2)
+    assert_path_clear(path2, start + 0.01, geometry)
+
+    # a nearby move is seeded with the cached path
+    path3 = planner.find_path(traveler, traveler_to_global, start + (0.3, 0, 0), stop)
+    assert np.array_equal(path3[-1], stop)
+    assert_path_clear(path3, start + (0.3, 0, 0), geometry)
+
+    # moving the obstacle changes the key
+    moved_to_global = TTransform(offset=(0, 0, 0.3), from_cs=geometry.parent_name, to_cs="global")
+    moved = GeometryMotionPlanner({geometry: moved_to_global}, voxel_size)
+    assert moved.path_cache_key(traveler, traveler_to_global, start, stop) != planner.path_cache_key(
+        traveler, traveler_to_global, start, stop
+    )
+
+    # cached paths that are no longer valid are replaced
+    side = np.sign(path[0][0]) or np.sign(path[0][1])
+    axis = 0 if path[0][0] != 0 else 1
+    normal = np.zeros(3)
+    normal[axis] = -side
+    bounds = [Plane(normal, np.zeros(3))]  # forbid the side of the box that the cached path goes around
+    path4 = planner.find_path(traveler, traveler_to_global, start, stop, bounds=bounds)
+    assert all(point_in_bounds(p, bounds)[0] for p in path4)
+
+    stats = GeometryMotionPlanner.path_cache.stats()
+    assert stats["hit"] == 1 and stats["warm_start"] == 2 and stats["miss"] == 1
+    assert stats["invalidated"] == 1 and stats["hit_rate"] == 0.25
+    assert stats["mean_hit_time"] > 0
+
+
+def test_path_cache_lru():
+    cache = PathCache(max_entries=2)
+    for i in range(3):
+        cache.put(i, "a", np.zeros(3), np.full(3, i * 1e-3), [np.zeros(3), np.full(3, i * 1e-3)])
+    assert cache.get(0) is None and cache.get(1) is not None
+    assert cache.nearest("a", np.zeros(3), np.full(3, 0.9e-3))[-1][0] == 1e-3
+    assert cache.nearest("b", np.zeros(3), np.full(3, 1e-3)) is None
+    assert cache.nearest("a", np.zeros(3), np.full(3, 1.0)) is None
+
+
 draw_n = 0
 
 
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from acq4.Manager import Task
+from _fake_devices import FakeDevice, FakeDeviceTask, FakeManager
+
+
+class SlowConfigDevice(FakeDevice):
+    """Device whose tasks take *delay* seconds to configure and must be configured before *before*."""
+
+    def __init__(self, name, delay=0.1, concurrent=True, before=(), log=None, error=False):
+        FakeDevice.__init__(self, name)
+        self.delay = delay
+        self.concurrent = concurrent
+        self.before = list(before)
+        self.log = log
+        self.error = error
+
+    def createTask(self, cmd, parentTask):
+        return SlowConfigTask(self, cmd, parentTask)
+
+
+class SlowConfigTask(FakeDeviceTask):
+    def getConfigOrder(self):
+        return [], self.dev.before
+
+    def canConfigureConcurrently(self):
+        return self.dev.concurrent
+
+    def configure(self):
+        self.dev.log.append(('start', self.dev.name(), threading.current_thread()))
+        time.sleep(self.dev.delay)
+        if self.dev.error:
+            raise ValueError("configure failed")
+        self.dev.log.append(('end', self.dev.name(), threading.current_thread()))
+
+
+def makeTask(devices):
+    cmd = {'protocol': {'duration': 0}}
+    cmd.update({dev.name(): {} for dev in devices})
+    return Task(FakeManager(devices), cmd)
+
+
+def test_concurrent_configure():
+    log = []
+    devs = [
+        SlowConfigDevice('Camera', before=['DAQ'], log=log),
+        SlowConfigDevice('Clamp1', before=['DAQ'], log=log),
+        SlowConfigDevice('Clamp2', before=['DAQ'], log=log),
+        SlowConfigDevice('DAQ', delay=0, concurrent=False, log=log),
+    ]
+    task = makeTask(devs)
+    start = time.perf_counter()
+    task.execute(block=False)
+    # the three slow devices are configured at the same time
+    assert time.perf_counter() - start < 0.25
+    assert task.wait(timeout=5)
+
+    events = [(ev, name) for ev, name, thread in log]
+    # the DAQ is configured last, in the executing thread
+    assert events[-2:] == [('start', 'DAQ'), ('end', 'DAQ')]
+    assert log[-1][2] is threading.current_thread()
+    assert set(task.configureTimes) == {'Camera', 'Clamp1', 'Clamp2', 'DAQ'}
+    assert all(task.configureTimes[name] >= 0.1 for name in ['Camera', 'Clamp1', 'Clamp2'])
+
+
+def test_serial_configure_respects_order():
+    log = []
+    devs = [
+        SlowConfigDevice('A', delay=0.01, concurrent=False, before=['B'], log=log),
+        SlowConfigDevice('B', delay=0.01, concurrent=False, log=log),
+    ]
+    task = makeTask(devs)
+    task.execute(block=False)
+    assert task.wait(timeout=5)
+    assert [(ev, name) for ev, name, thread in log] == [('start', 'A'), ('end', 'A'), ('start', 'B'), ('end', 'B')]
+    assert all(thread is threading.current_thread() for ev, name, thread in log)
+
+
+def test_configure_error():
+    log = []
+    devs = [
+        SlowConfigDevice('Clamp', delay=0.05, error=True, before=['DAQ'], log=log),
+        SlowConfigDevice('Camera', delay=0.1, before=['DAQ'], log=log),
+        SlowConfigDevice('DAQ', delay=0, concurrent=False, log=log),
+    ]
+    task = makeTask(devs)
+    with pytest.raises(ValueError):
+        task.execute(block=False)
+    events = [(ev, name) for ev, name, thread in log]
+    # dependents of the failed device are never configured, and running configuration is allowed to finish
+    assert ('start', 'DAQ') not in events
+    assert ('end', 'Camera') in events
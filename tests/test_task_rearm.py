@@ -0,0 +1,37 @@
+import time
+
+from acq4.Manager import Task
+from _fake_devices import FakeDevice, FakeManager
+
+
+def run(task):
+    task.execute(block=False)
+    while not task.isDone():
+        time.sleep(1e-3)
+    return task.getResult()
+
+
+def test_rearm_skips_configure():
+    daq = FakeDevice('DAQ')
+    clamp = FakeDevice('Clamp')
+    task = Task(FakeManager([daq, clamp]), {'protocol': {'duration': 0}, 'DAQ': {}, 'Clamp': {}})
+
+    # cannot rearm before the task has been configured
+    assert not task.canRearm()
+    assert not task.rearm()
+
+    assert run(task)['DAQ'] == 1
+    for i in range(3):
+        assert task.rearm()
+        result = run(task)
+        assert result['DAQ'] == result['Clamp'] == i + 2
+    assert daq.calls == ['configure', 'start'] + ['rearm', 'start'] * 3
+
+
+def test_rearm_requires_all_devices():
+    daq = FakeDevice('DAQ')
+    camera = FakeDevice('Camera', rearmable=False)
+    task = Task(FakeManager([daq, camera]), {'protocol': {'duration': 0}, 'DAQ': {}, 'Camera': {}})
+    run(task)
+    assert not task.rearm()
+    assert task.result is not None  # task left unchanged
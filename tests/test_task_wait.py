@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from acq4.Manager import Task
+from acq4.util import executor
+from acq4.util.future import Future
+from _fake_devices import FakeDevice, FakeDeviceTask, FakeManager
+
+
+class SlowDevice(FakeDevice):
+    """Device whose tasks finish when *finished* is set, rather than immediately."""
+
+    def __init__(self, name):
+        FakeDevice.__init__(self, name)
+        self.finished = threading.Event()
+
+    def createTask(self, cmd, parentTask):
+        return SlowDeviceTask(self, cmd, parentTask)
+
+
+class SlowDeviceTask(FakeDeviceTask):
+    def isDone(self):
+        return self.dev.finished.is_set()
+
+    def waitUntilDone(self, timeout=None):
+        return self.dev.finished.wait(timeout)
+
+
+def test_wait_returns_when_device_finishes():
+    dev = SlowDevice('DAQ')
+    task = Task(FakeManager([dev]), {'protocol': {'duration': 0}, 'DAQ': {}})
+    task.execute(block=False)
+    assert not task.wait(timeout=0.05)
+
+    threading.Timer(0.05, dev.finished.set).start()
+    start = time.perf_counter()
+    assert task.wait(timeout=5)
+    assert time.perf_counter() - start < 1
+    assert task.getResult()['DAQ'] == 1
+
+
+def test_interrupt_wait():
+    dev = SlowDevice('DAQ')
+    task = Task(FakeManager([dev]), {'protocol': {'duration': 10}, 'DAQ': {}})
+    task.execute(block=False)
+    threading.Timer(0.05, task.interruptWait).start()
+    start = time.perf_counter()
+    assert not task.wait()
+    assert time.perf_counter() - start < 1
+    task.stop(abort=True)
+
+
+def test_task_future():
+    dev = SlowDevice('DAQ')
+    task = Task(FakeManager([dev]), {'protocol': {'duration': 0}, 'DAQ': {}})
+    task.execute(block=False)
+    fut = task.asFuture()
+    assert not fut.isDone()
+    dev.finished.set()
+    assert fut.getResult(timeout=5)['DAQ'] == 1
+
+    # stopping the future aborts the task
+    dev.finished.clear()
+    task = Task(FakeManager([dev]), {'protocol': {'duration': 10}, 'DAQ': {}})
+    task.execute(block=False)
+    fut = task.asFuture()
+    fut.stop()
+    with pytest.raises(Future.Stopped):
+        fut.wait(timeout=5)
+    assert task.stopped
+
+
+def test_task_futures_do_not_starve_io_pool():
+    pool = executor.getPool('io')
+    maxWorkers = pool.maxWorkers
+    pool.setMaxWorkers(2)
+    dev = SlowDevice('DAQ')
+    try:
+        futures = []
+        for i in range(4):
+            task = Task(FakeManager([dev]), {'protocol': {'duration': 0}, 'DAQ': {}})
+            task.execute(block=False)
+            futures.append(task.asFuture())
+        # other jobs still run while every future is waiting on its task
+        ran = threading.Event()
+        executor.submit('io', ran.set)
+        assert ran.wait(timeout=2)
+    finally:
+        dev.finished.set()
+        pool.setMaxWorkers(maxWorkers)
+    for fut in futures:
+        assert fut.getResult(timeout=5)['DAQ'] == 1
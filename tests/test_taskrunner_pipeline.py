@@ -0,0 +1,94 @@
+import pyqtgraph as pg
+import pytest
+
+from acq4.Manager import Task
+from acq4.modules.TaskRunner.TaskRunner import TaskThread
+from _fake_devices import FakeDevice, FakeManager
+
+pg.mkQApp()
+
+
+class RecordingManager(FakeManager):
+    def __init__(self, devices, log, failAt=None):
+        FakeManager.__init__(self, devices)
+        self.log = log
+        self.failAt = failAt
+
+    def createTask(self, cmd):
+        self.log.append(('create', cmd['DAQ']['point']))
+        if cmd['DAQ']['point'] == self.failAt:
+            raise ValueError("bad command")
+        return RecordingTask(self, cmd)
+
+
+class RecordingTask(Task):
+    def execute(self, block=True, processEvents=True):
+        self.dm.log.append(('execute', self.command['DAQ']['point']))
+        Task.execute(self, block=block, processEvents=processEvents)
+
+    def getResult(self):
+        self.dm.log.append(('result', self.command['DAQ']['point']))
+        return Task.getResult(self)
+
+
+class Commands:
+    """Stands in for the array of command structures generated by TaskRunner."""
+
+    def __getitem__(self, sl):
+        return {'protocol': {'duration': 0, 'cycleTime': 0}, 'DAQ': {'point': sl.stop}}
+
+
+class FakeUi:
+    _reduceMemoryUsage = False
+
+    def __init__(self, manager, pipeline):
+        self.manager = manager
+        self._pipelineSequence = pipeline
+
+
+def runSequence(pipeline, device=None):
+    log = []
+    thread = TaskThread(FakeUi(RecordingManager([device or FakeDevice('DAQ')], log), pipeline))
+    frames = []
+    thread.sigNewFrame.connect(frames.append, pg.QtCore.Qt.DirectConnection)
+    future = thread.startTask(Commands(), {('DAQ', 'point'): [0, 1, 2]})
+    future.wait(timeout=10)
+    assert [frame['params'][('DAQ', 'point')] for frame in frames] == [0, 1, 2]
+    return log
+
+
+def test_pipelined_sequence():
+    # each task is created while the previous one runs
+    assert runSequence(True) == [
+        ('create', 0), ('execute', 0), ('create', 1), ('result', 0),
+        ('execute', 1), ('create', 2), ('result', 1),
+        ('execute', 2), ('result', 2),
+    ]
+
+
+def test_unpipelined_sequence():
+    assert runSequence(False) == [
+        ('create', 0), ('execute', 0), ('result', 0),
+        ('create', 1), ('execute', 1), ('result', 1),
+        ('create', 2), ('execute', 2), ('result', 2),
+    ]
+
+
+def test_device_without_early_creation():
+    device = FakeDevice('DAQ')
+    device.allowEarlyTaskCreation = False
+    assert runSequence(True, device) == [
+        ('create', 0), ('execute', 0), ('result', 0),
+        ('create', 1), ('execute', 1), ('result', 1),
+        ('create', 2), ('execute', 2), ('result', 2),
+    ]
+
+
+def test_early_creation_error():
+    log = []
+    thread = TaskThread(FakeUi(RecordingManager([FakeDevice('DAQ')], log, failAt=1), True))
+    future = thread.startTask(Commands(), {('DAQ', 'point'): [0, 1, 2]})
+    with pytest.raises(Exception, match="bad command"):
+        future.wait(timeout=10)
+    # the error is raised when its point is run, after the current point finishes; it is not retried
+    assert log == [('create', 0), ('execute', 0), ('create', 1), ('result', 0)]